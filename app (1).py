@@ -1,14 +1,12 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 import json
-from datetime import datetime, timedelta
+from datetime import datetime
 import hashlib
-import uuid
-import os
+
+from gudson.metrics import span, timed
+
+# pandas, plotly et le reste du paquet gudson sont importés à la première page qui en a besoin :
+# la page de connexion s'affiche sans les charger (gudson.metrics n'utilise que la bibliothèque standard)
 
 # Configuration de la page
 st.set_page_config(
@@ -63,19 +61,55 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Fonctions utilitaires
-@st.cache_data
-def load_data():
-    """Charger toutes les données depuis les fichiers CSV"""
-    try:
-        df_fournisseurs = pd.read_csv('fournisseurs_data.csv')
-        df_acheteurs = pd.read_csv('acheteurs_data.csv')
-        df_commandes = pd.read_csv('commandes_data.csv')
-        df_historique = pd.read_csv('historique_data.csv')
+@st.cache_resource
+def get_service():
+    """Service KPI partagé par toutes les sessions du processus (données, agrégats, audit)"""
+    from gudson.service import open_service
+    return open_service('.')
+
+def get_table(table):
+    """Table de la génération de données courante de la session (lecture seule)"""
+    return st.session_state.snapshot[table]
+
+def figure(name, build, *args, **kwargs):
+    """Construire un graphique plotly (build(*args, **kwargs)), durée mesurée sous chart.<name>"""
+    with span(f"chart.{name}"):
+        return build(*args, **kwargs)
+
+def show_chart(name, fig):
+    """Afficher un graphique ; la sérialisation vers le navigateur est mesurée sous render.<name>"""
+    with span(f"render.{name}"):
+        st.plotly_chart(fig, use_container_width=True)
 
-        return df_fournisseurs, df_acheteurs, df_commandes, df_historique
-    except FileNotFoundError as e:
-        st.error(f"Fichier manquant: {e}")
-        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+def show_table(name, df, **kwargs):
+    """Afficher un tableau ; la sérialisation vers le navigateur est mesurée sous render.<name>"""
+    with span(f"render.{name}"):
+        st.dataframe(df, use_container_width=True, **kwargs)
+
+def paginated_table(key, fetch, columns, sort_by=None, ascending=True):
+    """Tableau paginé et trié côté serveur : seule la page visible est envoyée au navigateur"""
+    col1, col2, col3, col4 = st.columns([2, 2, 1, 1])
+    with col1:
+        options = [None] + list(columns)
+        sort_by = st.selectbox("Trier par", options, index=options.index(sort_by), key=f"{key}_sort",
+                               format_func=lambda col: "Ordre d'origine" if col is None else col)
+    with col2:
+        order = st.radio("Ordre", ["Croissant", "Décroissant"], index=0 if ascending else 1,
+                         horizontal=True, key=f"{key}_order")
+    with col3:
+        page_size = st.selectbox("Lignes par page", [25, 50, 100, 250], index=1, key=f"{key}_size")
+
+    page_key = f"{key}_page"
+    requested = st.session_state.get(page_key, 1)
+    page = fetch(sort_by=sort_by, ascending=order == "Croissant", page=requested, page_size=page_size)
+    # Revenir à la dernière page existante si les filtres ont réduit le résultat
+    if page.page != requested:
+        st.session_state[page_key] = page.page
+    with col4:
+        st.number_input("Page", min_value=1, max_value=page.pages, step=1, key=page_key)
+
+    show_table(f"table.{key}", page.rows[list(columns)], hide_index=True)
+    st.caption(f"Lignes {page.first:,}–{page.last:,} sur {page.total:,} · page {page.page}/{page.pages}")
 
 def load_users():
     """Charger la base de données des utilisateurs"""
@@ -103,43 +137,39 @@ def has_permission(user_data, permission):
         return permission in user_data['permissions']
     return False
 
-def log_action(user, action, table, record_id, details=""):
-    """Enregistrer une action dans l'historique"""
-    if 'df_historique' not in st.session_state:
-        return
+def log_action(user, action, table, record_id, details="", field="", old_value="", new_value=""):
+    """Enregistrer une action dans l'historique (buffer, écrit par lots)"""
+    return get_service().log(user, action, table, record_id, details, field, old_value, new_value)
 
-    new_entry = {
-        'ID_Historique': f"H{len(st.session_state.df_historique)+1:04d}",
-        'Date_Action': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-        'Utilisateur': user,
-        'Action': action,
-        'Table_Modifiee': table,
-        'ID_Enregistrement': record_id,
-        'Champ_Modifie': '',
-        'Ancienne_Valeur': '',
-        'Nouvelle_Valeur': '',
-        'Commentaire': details
-    }
+@timed('app.save_data')
+def save_data(table, upserts=None, deletes=(), expected=None):
+    """Sauvegarder uniquement les lignes modifiées et publier une nouvelle génération
 
-    new_df = pd.DataFrame([new_entry])
-    st.session_state.df_historique = pd.concat([st.session_state.df_historique, new_df], ignore_index=True)
+    expected : versions des lignes lues (voir edit_version) ; refus si une autre session les a modifiées.
+    """
+    from gudson.transaction import ConflictError
 
-def save_data():
-    """Sauvegarder les modifications dans les fichiers"""
     try:
-        if 'df_fournisseurs' in st.session_state:
-            st.session_state.df_fournisseurs.to_csv('fournisseurs_data.csv', index=False)
-        if 'df_acheteurs' in st.session_state:
-            st.session_state.df_acheteurs.to_csv('acheteurs_data.csv', index=False)
-        if 'df_commandes' in st.session_state:
-            st.session_state.df_commandes.to_csv('commandes_data.csv', index=False)
-        if 'df_historique' in st.session_state:
-            st.session_state.df_historique.to_csv('historique_data.csv', index=False)
+        st.session_state.snapshot = get_service().commit(table, upserts=upserts, deletes=deletes, expected=expected)
         return True
+    except ConflictError:
+        st.warning("⚠️ Cet enregistrement a été modifié ou supprimé par un autre utilisateur entre-temps. "
+                   "Les données ont été rechargées : vérifiez-les puis recommencez.")
+        st.session_state.snapshot = get_service().snapshot()
+        return False
     except Exception as e:
         st.error(f"Erreur sauvegarde: {e}")
         return False
 
+def edit_version(table, record_id, reset=False):
+    """Version de la ligne au moment où l'utilisateur l'a ouverte en modification"""
+    key = f"edit_version_{table}"
+    opened = st.session_state.get(key)
+    if reset or opened is None or opened[0] != record_id:
+        opened = (record_id, get_service().row_version(st.session_state.snapshot, table, record_id))
+        st.session_state[key] = opened
+    return {record_id: opened[1]}
+
 # Initialisation de la session
 def init_session():
     """Initialiser les variables de session"""
@@ -147,13 +177,11 @@ def init_session():
         st.session_state.authenticated = False
     if 'user_data' not in st.session_state:
         st.session_state.user_data = None
-    if 'data_loaded' not in st.session_state:
-        df_fournisseurs, df_acheteurs, df_commandes, df_historique = load_data()
-        st.session_state.df_fournisseurs = df_fournisseurs
-        st.session_state.df_acheteurs = df_acheteurs
-        st.session_state.df_commandes = df_commandes
-        st.session_state.df_historique = df_historique
-        st.session_state.data_loaded = True
+
+@timed('app.load_data')
+def load_snapshot():
+    """Lire la dernière génération publiée, après rechargement des seules tables modifiées sur disque"""
+    st.session_state.snapshot = get_service().snapshot()
 
 # Page de connexion
 def login_page():
@@ -223,11 +251,14 @@ def main_interface():
             menu_items.extend(["➕ Ajouter Données", "✏️ Modifier/Supprimer"])
 
         if has_permission(user_data, "gestion_utilisateurs"):
-            menu_items.append("👥 Gestion Utilisateurs")
+            menu_items.extend(["👥 Gestion Utilisateurs", "⏱️ Performances"])
 
         # Sélection du menu
         selected = st.selectbox("Navigation", menu_items)
 
+    # Données chargées après la sidebar : connexion et navigation n'en dépendent pas
+    load_snapshot()
+
     # Contenu principal selon la sélection
     if selected == "🏠 Tableau de Bord":
         dashboard_page()
@@ -243,163 +274,272 @@ def main_interface():
         analytics_page()
     elif selected == "👥 Gestion Utilisateurs":
         user_management_page()
+    elif selected == "⏱️ Performances":
+        performance_page()
 
+@timed('page.dashboard')
 def dashboard_page():
     """Page tableau de bord principal"""
+    import plotly.express as px
+    
     st.markdown('<div class="main-header"><h1>📊 Tableau de Bord GUDSON</h1></div>', unsafe_allow_html=True)
 
     # Métriques principales
     col1, col2, col3, col4 = st.columns(4)
 
-    df_fournisseurs = st.session_state.df_fournisseurs
-    df_acheteurs = st.session_state.df_acheteurs  
-    df_commandes = st.session_state.df_commandes
+    kpis = get_service().dashboard(st.session_state.snapshot)
 
     with col1:
-        total_fournisseurs = len(df_fournisseurs)
-        st.metric("🏢 Fournisseurs Actifs", total_fournisseurs)
+        st.metric("🏢 Fournisseurs Actifs", kpis.nb_fournisseurs)
 
     with col2:
-        total_acheteurs = len(df_acheteurs)
-        st.metric("👤 Acheteurs", total_acheteurs)
+        st.metric("👤 Acheteurs", kpis.nb_acheteurs)
 
     with col3:
-        ca_total = df_commandes['Montant_Total'].sum()
-        st.metric("💰 CA Total", f"{ca_total:,.0f} €")
+        st.metric("💰 CA Total", f"{kpis.ca_total:,.0f} €")
 
     with col4:
-        commandes_livrees = len(df_commandes[df_commandes['Statut'] == 'Livrée'])
-        st.metric("📦 Commandes Livrées", commandes_livrees)
+        st.metric("📦 Commandes Livrées", kpis.commandes_livrees)
 
     # Graphiques
     col1, col2 = st.columns(2)
 
     with col1:
         st.markdown("### 📈 Évolution des Commandes")
-        df_commandes['Date_Commande'] = pd.to_datetime(df_commandes['Date_Commande'])
-        monthly_orders = df_commandes.groupby(df_commandes['Date_Commande'].dt.to_period('M'))['Montant_Total'].sum()
+        monthly_orders = kpis.monthly
 
-        fig = px.line(x=monthly_orders.index.astype(str), y=monthly_orders.values,
+        fig = figure('dashboard.ca_mensuel', px.line, x=monthly_orders['Date_Commande'], y=monthly_orders['CA_Total'],
                      title="Montant des Commandes par Mois")
         fig.update_traces(line_color='#1f77b4')
-        st.plotly_chart(fig, use_container_width=True)
+        show_chart('dashboard.ca_mensuel', fig)
 
     with col2:
         st.markdown("### 🎯 Statut des Commandes")
-        status_counts = df_commandes['Statut'].value_counts()
+        status_counts = kpis.status_counts
 
-        fig = px.pie(values=status_counts.values, names=status_counts.index,
+        fig = figure('dashboard.statuts', px.pie, values=status_counts.values, names=status_counts.index,
                     title="Répartition par Statut")
         fig.update_traces(textposition='inside', textinfo='percent+label')
-        st.plotly_chart(fig, use_container_width=True)
+        show_chart('dashboard.statuts', fig)
 
+@timed('page.kpi_fournisseurs')
 def kpi_fournisseurs_page():
     """Page KPI des fournisseurs"""
+    import plotly.express as px
+    
     st.markdown('<div class="main-header"><h1>📊 KPI Fournisseurs</h1></div>', unsafe_allow_html=True)
 
-    df_fournisseurs = st.session_state.df_fournisseurs
+    service = get_service()
+    options = service.supplier_filter_options(st.session_state.snapshot)
 
     # Filtres
     col1, col2, col3 = st.columns(3)
     with col1:
-        categories = ['Tous'] + list(df_fournisseurs['Categorie'].unique())
+        categories = ['Tous'] + options['Categorie']
         cat_filter = st.selectbox("Catégorie", categories)
 
     with col2:
-        pays = ['Tous'] + list(df_fournisseurs['Pays'].unique())
+        pays = ['Tous'] + options['Pays']
         pays_filter = st.selectbox("Pays", pays)
 
     with col3:
-        statuts = ['Tous'] + list(df_fournisseurs['Statut'].unique())
+        statuts = ['Tous'] + options['Statut']
         statut_filter = st.selectbox("Statut", statuts)
 
-    # Appliquer les filtres
-    df_filtered = df_fournisseurs.copy()
-    if cat_filter != 'Tous':
-        df_filtered = df_filtered[df_filtered['Categorie'] == cat_filter]
-    if pays_filter != 'Tous':
-        df_filtered = df_filtered[df_filtered['Pays'] == pays_filter]
-    if statut_filter != 'Tous':
-        df_filtered = df_filtered[df_filtered['Statut'] == statut_filter]
+    # Appliquer les filtres par intersection d'index (sans copie de la table)
+    kpis = service.suppliers(
+        st.session_state.snapshot,
+        categorie=None if cat_filter == 'Tous' else cat_filter,
+        pays=None if pays_filter == 'Tous' else pays_filter,
+        statut=None if statut_filter == 'Tous' else statut_filter,
+    )
+    df_filtered = kpis.fournisseurs
 
     # KPI principaux
     col1, col2, col3, col4 = st.columns(4)
 
     with col1:
-        score_moyen = df_filtered['Score_Qualite'].mean()
-        st.metric("📊 Score Qualité Moyen", f"{score_moyen:.1f}/10")
+        st.metric("📊 Score Qualité Moyen", f"{kpis.score_qualite_moyen:.1f}/10")
 
     with col2:
-        delai_moyen = df_filtered['Delai_Moyen_Livraison'].mean()
-        st.metric("⏱️ Délai Moyen", f"{delai_moyen:.1f} jours")
+        st.metric("⏱️ Délai Moyen", f"{kpis.delai_moyen:.1f} jours")
 
     with col3:
-        taux_conformite = df_filtered['Taux_Conformite'].mean()
-        st.metric("✅ Taux Conformité", f"{taux_conformite:.1f}%")
+        st.metric("✅ Taux Conformité", f"{kpis.taux_conformite:.1f}%")
 
     with col4:
-        ca_moyen = df_filtered['CA_Total'].mean()
-        st.metric("💰 CA Moyen", f"{ca_moyen:,.0f} €")
+        st.metric("💰 CA Moyen", f"{kpis.ca_moyen:,.0f} €")
 
     # Graphiques détaillés
     col1, col2 = st.columns(2)
 
     with col1:
-        st.markdown("### 🏆 Top 10 Fournisseurs par Performance")
-        top_fournisseurs = df_filtered.nlargest(10, 'Note_Performance')
-
-        fig = px.bar(top_fournisseurs, x='Note_Performance', y='Nom_Fournisseur',
-                    orientation='h', title="Classement par Performance")
-        fig.update_layout(yaxis={'categoryorder':'total ascending'})
-        st.plotly_chart(fig, use_container_width=True)
+        st.markdown("### 🏆 Classement des Fournisseurs")
+        sens = st.radio("Classement", ["Meilleurs", "Moins bons"], horizontal=True, key='score_sens')
+        k = st.slider("Nombre de fournisseurs", 5, 50, 10, key='score_k')
+        # Lu dans les classements maintenus par catégorie/pays (pas de tri de la table filtrée)
+        top_fournisseurs = service.supplier_ranking(
+            st.session_state.snapshot,
+            categorie=None if cat_filter == 'Tous' else cat_filter,
+            pays=None if pays_filter == 'Tous' else pays_filter,
+            statut=None if statut_filter == 'Tous' else statut_filter,
+            k=k,
+            bottom=sens == "Moins bons",
+        )
+
+        fig = figure('fournisseurs.classement', px.bar, top_fournisseurs, x='Score_Global', y='Nom_Fournisseur', orientation='h',
+                     hover_data=['Qualite', 'Conformite', 'Livraison', 'Prix', 'Volume'],
+                     title="Classement par Score Pondéré")
+        fig.update_layout(yaxis={'categoryorder': 'total ascending' if sens == "Meilleurs" else 'total descending'})
+        show_chart('fournisseurs.classement', fig)
 
     with col2:
         st.markdown("### 📊 Distribution des Scores Qualité")
 
-        fig = px.histogram(df_filtered, x='Score_Qualite', nbins=20,
+        fig = figure('fournisseurs.scores_qualite', px.histogram, df_filtered, x='Score_Qualite', nbins=20,
                           title="Répartition des Scores Qualité")
         fig.update_traces(marker_color='#ff7f0e')
-        st.plotly_chart(fig, use_container_width=True)
+        show_chart('fournisseurs.scores_qualite', fig)
+
+    if has_permission(st.session_state.user_data, "gestion_utilisateurs"):
+        score_weights_section(service)
+
+    delivery_section(
+        service,
+        st.session_state.snapshot,
+        categorie=None if cat_filter == 'Tous' else cat_filter,
+        pays=None if pays_filter == 'Tous' else pays_filter,
+        statut=None if statut_filter == 'Tous' else statut_filter,
+    )
 
     # Tableau détaillé
     st.markdown("### 📋 Liste Détaillée des Fournisseurs")
 
     columns_to_show = [
         'Nom_Fournisseur', 'Categorie', 'Pays', 'Score_Qualite',
-        'Delai_Moyen_Livraison', 'Taux_Conformite', 'CA_Total', 'Statut'
+        'Delai_Moyen_Livraison', 'Taux_Livraison_A_Temps', 'Retard_P90',
+        'Taux_Conformite', 'CA_Total', 'Score_Global', 'Statut'
     ]
 
-    st.dataframe(
-        df_filtered[columns_to_show],
-        use_container_width=True,
-        hide_index=True
+    paginated_table(
+        'fournisseurs',
+        lambda **query: service.supplier_page(
+            st.session_state.snapshot,
+            categorie=None if cat_filter == 'Tous' else cat_filter,
+            pays=None if pays_filter == 'Tous' else pays_filter,
+            statut=None if statut_filter == 'Tous' else statut_filter,
+            **query
+        ),
+        columns_to_show
     )
 
+def score_weights_section(service):
+    """Pondération du score fournisseur (administrateurs) : partagée par toutes les sessions"""
+    from gudson.scoring import CRITERIA
+
+    labels = {'Qualite': "Qualité", 'Conformite': "Conformité", 'Livraison': "Livraison à l'heure",
+              'Prix': "Prix", 'Volume': "Volume de commandes"}
+    weights = service.score_weights()
+    with st.expander("⚖️ Pondération du score fournisseur"):
+        with st.form("score_weights"):
+            columns = st.columns(len(CRITERIA))
+            values = {}
+            for column, criterion in zip(columns, CRITERIA):
+                with column:
+                    values[criterion] = st.number_input(labels[criterion], 0.0, 1.0, round(weights[criterion], 2), 0.05)
+            if st.form_submit_button("Appliquer"):
+                try:
+                    service.set_score_weights(values)
+                except ValueError as e:
+                    st.error(f"❌ {e}")
+                else:
+                    log_action(st.session_state.username, "Pondération score", "Fournisseurs", "",
+                               ", ".join(f"{criterion}={value:.2f}" for criterion, value in values.items()))
+                    st.success("✅ Scores recalculés")
+                    st.rerun()
+
+def delivery_section(service, snapshot, **filters):
+    """Livraisons réelles : ponctualité, distribution des retards, classement et ventilations"""
+    import plotly.express as px
+
+    st.markdown("### 🚚 Performance de Livraison")
+    livraisons = service.deliveries(snapshot, **filters)
+    if livraisons.nb_livraisons == 0:
+        st.info("Aucune livraison enregistrée pour ces fournisseurs")
+        return
+
+    col1, col2, col3, col4 = st.columns(4)
+
+    with col1:
+        st.metric("🎯 Livraisons à l'heure", f"{livraisons.taux_a_temps:.1f}%")
+
+    with col2:
+        st.metric("⏱️ Délai Réel Moyen", f"{livraisons.delai_moyen:.1f} jours")
+
+    with col3:
+        st.metric("⌛ Retard Moyen", f"{livraisons.retard_moyen:.1f} jours")
+
+    with col4:
+        p = livraisons.percentiles
+        st.metric("📈 Retard P50 / P90 / P95", f"{p[50]:+.0f} / {p[90]:+.0f} / {p[95]:+.0f} j")
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        classement = livraisons.classement
+        fig = figure('livraison.ponctualite', px.bar, classement, x='Taux_Livraison_A_Temps', y='Nom_Fournisseur', orientation='h',
+                     hover_data=['Nb_Livraisons', 'Retard_P90'], title="Top 10 Ponctualité")
+        fig.update_layout(yaxis={'categoryorder': 'total ascending'})
+        show_chart('livraison.ponctualite', fig)
+
+    with col2:
+        distribution = livraisons.distribution
+        distribution = distribution[distribution > 0].reset_index(name='Livraisons')
+        fig = figure('livraison.retards', px.bar, distribution, x='Retard_Jours', y='Livraisons',
+                     title="Distribution des Retards (jours, négatif = en avance)")
+        fig.update_traces(marker_color='#2ca02c')
+        show_chart('livraison.retards', fig)
+
+    tab1, tab2, tab3 = st.tabs(["Par catégorie", "Par pays", "Par mois"])
+
+    with tab1:
+        show_table('livraison.categories', livraisons.par_categorie)
+
+    with tab2:
+        show_table('livraison.pays', livraisons.par_pays)
+
+    with tab3:
+        par_mois = livraisons.par_mois.reset_index().astype({'Mois': str})
+        fig = figure('livraison.mensuel', px.line, par_mois, x='Mois', y='Taux_A_Temps', title="Taux de Livraison à l'Heure par Mois")
+        show_chart('livraison.mensuel', fig)
+        show_table('livraison.mensuel_tableau', par_mois, hide_index=True)
+
+@timed('page.kpi_acheteurs')
 def kpi_acheteurs_page():
     """Page KPI des acheteurs - NOUVELLE FONCTIONNALITÉ"""
+    import plotly.express as px
+    import plotly.graph_objects as go
+    
     st.markdown('<div class="main-header"><h1>🛒 KPI Acheteurs</h1></div>', unsafe_allow_html=True)
 
-    df_acheteurs = st.session_state.df_acheteurs
-    df_commandes = st.session_state.df_commandes
+    service = get_service()
+    kpis = service.buyers(st.session_state.snapshot)
+    df_acheteurs = kpis.acheteurs
 
     # KPI principaux des acheteurs
     col1, col2, col3, col4 = st.columns(4)
 
     with col1:
-        budget_total = df_acheteurs['Budget_Alloue'].sum()
-        st.metric("💰 Budget Total", f"{budget_total:,.0f} €")
+        st.metric("💰 Budget Total", f"{kpis.budget_total:,.0f} €")
 
     with col2:
-        economies_totales = df_acheteurs['Economies_Realisees'].sum()
-        st.metric("💸 Économies Totales", f"{economies_totales:,.0f} €")
+        st.metric("💸 Économies Totales", f"{kpis.economies_totales:,.0f} €")
 
     with col3:
-        performance_moyenne = df_acheteurs['Score_Performance'].mean()
-        st.metric("📊 Performance Moyenne", f"{performance_moyenne:.1f}/10")
+        st.metric("📊 Performance Moyenne", f"{kpis.performance_moyenne:.1f}/10")
 
     with col4:
-        delai_moyen = df_acheteurs['Delai_Moyen_Traitement'].mean()
-        st.metric("⚡ Délai Moyen", f"{delai_moyen:.1f} jours")
+        st.metric("⚡ Délai Moyen", f"{kpis.delai_moyen:.1f} jours")
 
     # Graphiques détaillés
     col1, col2 = st.columns(2)
@@ -407,41 +547,68 @@ def kpi_acheteurs_page():
     with col1:
         st.markdown("### 🏆 Performance des Acheteurs")
 
-        fig = px.bar(df_acheteurs, x='Nom_Acheteur', y='Score_Performance',
+        fig = figure('acheteurs.performance', px.bar, df_acheteurs, x='Nom_Acheteur', y='Score_Performance',
                     title="Score de Performance par Acheteur",
                     color='Score_Performance', color_continuous_scale='Viridis')
         fig.update_layout(xaxis_tickangle=-45)
-        st.plotly_chart(fig, use_container_width=True)
+        show_chart('acheteurs.performance', fig)
 
     with col2:
         st.markdown("### 💰 Utilisation du Budget")
 
-        fig = go.Figure()
-        fig.add_trace(go.Bar(
-            name='Budget Alloué',
-            x=df_acheteurs['Nom_Acheteur'],
-            y=df_acheteurs['Budget_Alloue'],
-            marker_color='lightblue'
-        ))
-        fig.add_trace(go.Bar(
-            name='Budget Utilisé',
-            x=df_acheteurs['Nom_Acheteur'],
-            y=df_acheteurs['Budget_Utilise'],
-            marker_color='darkblue'
-        ))
-
-        fig.update_layout(title='Comparaison Budget Alloué vs Utilisé', barmode='group')
-        st.plotly_chart(fig, use_container_width=True)
+        with span('chart.acheteurs.budget'):
+            fig = go.Figure()
+            fig.add_trace(go.Bar(
+                name='Budget Alloué',
+                x=df_acheteurs['Nom_Acheteur'],
+                y=df_acheteurs['Budget_Alloue'],
+                marker_color='lightblue'
+            ))
+            fig.add_trace(go.Bar(
+                name='Budget Utilisé',
+                x=df_acheteurs['Nom_Acheteur'],
+                y=df_acheteurs['Budget_Utilise'],
+                marker_color='darkblue'
+            ))
+            fig.update_layout(title='Comparaison Budget Alloué vs Utilisé', barmode='group')
+        show_chart('acheteurs.budget', fig)
 
     # Analyse détaillée par acheteur
     st.markdown("### 🔍 Analyse Détaillée par Acheteur")
 
+    labels = service.records('acheteurs').labels(st.session_state.snapshot, 'Nom_Acheteur')
     acheteur_selected = st.selectbox(
         "Sélectionner un acheteur",
-        df_acheteurs['Nom_Acheteur'].tolist()
+        list(labels),
+        format_func=lambda key: f"{labels[key]} ({key})"
+    )
+    if acheteur_selected is not None:
+        buyer_drilldown_section(service, acheteur_selected)
+
+    # Tableau récapitulatif
+    st.markdown("### 📋 Tableau de Bord Acheteurs")
+
+    columns_acheteurs = [
+        'Nom_Acheteur', 'Departement', 'Score_Performance', 'Budget_Alloue',
+        'Budget_Utilise', 'Economies_Realisees', 'Taux_Economie', 'Statut'
+    ]
+
+    paginated_table(
+        'acheteurs',
+        lambda **query: service.buyer_page(st.session_state.snapshot, **query),
+        columns_acheteurs
     )
 
-    acheteur_data = df_acheteurs[df_acheteurs['Nom_Acheteur'] == acheteur_selected].iloc[0]
+def buyer_drilldown_section(service, id_acheteur):
+    """Fiche d'un acheteur calculée sur ses commandes : chronologie, dépense, budget et économies"""
+    import plotly.express as px
+    import plotly.graph_objects as go
+    from gudson.buyers import BURN_MONTHS
+
+    # Commandes de l'acheteur lues par tranche dans l'index par acheteur (pas de parcours de la table)
+    detail = service.buyer_drilldown(id_acheteur, st.session_state.snapshot)
+    acheteur_data = detail.acheteur
+    activite = detail.activite
 
     col1, col2, col3 = st.columns(3)
 
@@ -449,18 +616,21 @@ def kpi_acheteurs_page():
         st.markdown("#### 📊 Métriques Clés")
         st.write(f"**Département:** {acheteur_data['Departement']}")
         st.write(f"**Spécialité:** {acheteur_data['Specialite']}")
-        st.write(f"**Nombre de commandes:** {acheteur_data['Nombre_Commandes']}")
-        st.write(f"**Fournisseurs gérés:** {acheteur_data['Nombre_Fournisseurs_Geres']}")
+        st.write(f"**Nombre de commandes:** {len(activite.commandes)}")
+        st.write(f"**Fournisseurs sollicités:** {len(activite.par_fournisseur)}")
 
     with col2:
         st.markdown("#### 💰 Performance Financière")
-        taux_utilisation = (acheteur_data['Budget_Utilise'] / acheteur_data['Budget_Alloue']) * 100
-        st.write(f"**Taux d'utilisation:** {taux_utilisation:.1f}%")
-        st.write(f"**Taux d'économie:** {acheteur_data['Taux_Economie']}%")
+        st.write(f"**Dépense:** {activite.depense:,.0f} € ({detail.taux_utilisation:.1f}% du budget)")
+        st.write(f"**Rythme ({BURN_MONTHS} derniers mois):** {activite.rythme_mensuel:,.0f} €/mois")
+        if detail.budget_restant <= 0:
+            st.write(f"**Budget dépassé de:** {-detail.budget_restant:,.0f} €")
+        elif detail.mois_restants is not None:
+            st.write(f"**Budget épuisé dans:** {detail.mois_restants:.1f} mois")
 
         # Progression vers objectif
-        progression_objectif = (acheteur_data['Economies_Realisees'] / acheteur_data['Objectif_Economies']) * 100
-        st.write(f"**Progression objectif:** {progression_objectif:.1f}%")
+        st.write(f"**Économies sur commandes:** {activite.economies:,.0f} € "
+                 f"({detail.progression_objectif:.1f}% de l'objectif)")
 
     with col3:
         st.markdown("#### 🎯 Évaluation")
@@ -469,29 +639,61 @@ def kpi_acheteurs_page():
         st.write(f"**Certification:** {acheteur_data['Certification']}")
         st.write(f"**Statut:** {acheteur_data['Statut']}")
 
-    # Tableau récapitulatif
-    st.markdown("### 📋 Tableau de Bord Acheteurs")
-
-    columns_acheteurs = [
-        'Nom_Acheteur', 'Departement', 'Score_Performance', 'Budget_Alloue',
-        'Budget_Utilise', 'Economies_Realisees', 'Taux_Economie', 'Statut'
-    ]
-
-    st.dataframe(
-        df_acheteurs[columns_acheteurs],
-        use_container_width=True,
-        hide_index=True
-    )
-
+    if activite.commandes.empty:
+        st.info("Aucune commande pour cet acheteur")
+    else:
+        mensuel = activite.mensuel.reset_index().astype({'Mois': str})
+
+        col1, col2 = st.columns(2)
+
+        with col1:
+            with span('chart.acheteur.budget'):
+                fig = go.Figure()
+                fig.add_trace(go.Bar(name='Dépense du mois', x=mensuel['Mois'], y=mensuel['Montant'],
+                                     marker_color='lightblue'))
+                fig.add_trace(go.Scatter(name='Dépense cumulée', x=mensuel['Mois'], y=mensuel['Montant_Cumule'],
+                                         line_color='darkblue'))
+                fig.add_hline(y=acheteur_data['Budget_Alloue'], line_dash='dash', line_color='red',
+                              annotation_text='Budget alloué')
+                fig.update_layout(title='Consommation du Budget')
+            show_chart('acheteur.budget', fig)
+
+        with col2:
+            fig = figure('acheteur.economies', px.line, mensuel, x='Mois', y='Economies_Cumulees', title="Économies Cumulées vs Objectif")
+            fig.add_hline(y=acheteur_data['Objectif_Economies'], line_dash='dash', line_color='green',
+                          annotation_text='Objectif')
+            show_chart('acheteur.economies', fig)
+
+        col1, col2 = st.columns(2)
+
+        with col1:
+            par_fournisseur = activite.par_fournisseur.head(10).reset_index()
+            par_fournisseur['Fournisseur'] = par_fournisseur['Nom_Fournisseur'] + ' (' + par_fournisseur['ID_Fournisseur'] + ')'
+            fig = figure('acheteur.fournisseurs', px.bar, par_fournisseur, x='Montant', y='Fournisseur', orientation='h',
+                         title="Dépense par Fournisseur (top 10)")
+            fig.update_layout(yaxis={'categoryorder': 'total ascending'})
+            show_chart('acheteur.fournisseurs', fig)
+
+        with col2:
+            fig = figure('acheteur.produits', px.pie, activite.par_produit.reset_index(), values='Montant', names='Produit',
+                         title="Dépense par Produit")
+            show_chart('acheteur.produits', fig)
+
+        st.markdown("#### 🕒 Chronologie des Commandes")
+        show_table('acheteur.commandes', activite.commandes, hide_index=True)
+
+@timed('page.ajout')
 def add_data_page():
     """Page d'ajout de nouvelles données"""
     if not has_permission(st.session_state.user_data, "ecriture"):
         st.error("❌ Vous n'avez pas les permissions pour ajouter des données")
         return
 
+    import pandas as pd
+
     st.markdown('<div class="main-header"><h1>➕ Ajouter Nouvelles Données</h1></div>', unsafe_allow_html=True)
 
-    tab1, tab2, tab3 = st.tabs(["🏢 Nouveau Fournisseur", "👤 Nouvel Acheteur", "📦 Nouvelle Commande"])
+    tab1, tab2, tab3, tab4 = st.tabs(["🏢 Nouveau Fournisseur", "👤 Nouvel Acheteur", "📦 Nouvelle Commande", "📥 Import en masse"])
 
     with tab1:
         st.markdown("### 🏢 Ajouter un Nouveau Fournisseur")
@@ -519,8 +721,7 @@ def add_data_page():
 
             if submit and nom:
                 # Générer nouvel ID
-                max_id = st.session_state.df_fournisseurs['ID_Fournisseur'].str.extract('(\d+)').astype(int).max().iloc[0]
-                new_id = f"F{str(max_id + 1).zfill(3)}"
+                new_id = get_service().next_id('fournisseurs', st.session_state.snapshot)
 
                 nouveau_fournisseur = {
                     'ID_Fournisseur': new_id,
@@ -545,13 +746,10 @@ def add_data_page():
 
                 # Ajouter à la base de données
                 new_df = pd.DataFrame([nouveau_fournisseur])
-                st.session_state.df_fournisseurs = pd.concat([st.session_state.df_fournisseurs, new_df], ignore_index=True)
 
-                # Logger l'action
-                log_action(st.session_state.username, "Création fournisseur", "Fournisseurs", new_id, f"Nouveau fournisseur: {nom}")
-
-                # Sauvegarder
-                if save_data():
+                # Sauvegarder, puis tracer l'action une fois la création enregistrée
+                if save_data('fournisseurs', upserts=new_df):
+                    log_action(st.session_state.username, "Création fournisseur", "Fournisseurs", new_id, f"Nouveau fournisseur: {nom}")
                     st.success(f"✅ Fournisseur '{nom}' ajouté avec succès (ID: {new_id})")
                     st.rerun()
                 else:
@@ -583,8 +781,7 @@ def add_data_page():
 
             if submit_acheteur and nom_acheteur and email_acheteur:
                 # Générer nouvel ID
-                max_id = st.session_state.df_acheteurs['ID_Acheteur'].str.extract('(\d+)').astype(int).max().iloc[0]
-                new_id = f"A{str(max_id + 1).zfill(3)}"
+                new_id = get_service().next_id('acheteurs', st.session_state.snapshot)
 
                 nouvel_acheteur = {
                     'ID_Acheteur': new_id,
@@ -610,13 +807,10 @@ def add_data_page():
 
                 # Ajouter à la base de données
                 new_df = pd.DataFrame([nouvel_acheteur])
-                st.session_state.df_acheteurs = pd.concat([st.session_state.df_acheteurs, new_df], ignore_index=True)
-
-                # Logger l'action
-                log_action(st.session_state.username, "Création acheteur", "Acheteurs", new_id, f"Nouvel acheteur: {nom_acheteur}")
 
-                # Sauvegarder
-                if save_data():
+                # Sauvegarder, puis tracer l'action une fois la création enregistrée
+                if save_data('acheteurs', upserts=new_df):
+                    log_action(st.session_state.username, "Création acheteur", "Acheteurs", new_id, f"Nouvel acheteur: {nom_acheteur}")
                     st.success(f"✅ Acheteur '{nom_acheteur}' ajouté avec succès (ID: {new_id})")
                     st.rerun()
                 else:
@@ -624,12 +818,181 @@ def add_data_page():
             elif submit_acheteur:
                 st.error("❌ Nom et email sont obligatoires")
 
+    with tab3:
+        st.markdown("### 📦 Ajouter une Nouvelle Commande")
+
+        fournisseurs_df = get_table('fournisseurs')
+        acheteurs_df = get_table('acheteurs')
+        with st.form("add_commande"):
+            col1, col2 = st.columns(2)
+
+            with col1:
+                id_fournisseur = st.selectbox("Fournisseur *", fournisseurs_df['ID_Fournisseur'].tolist(),
+                    format_func=dict(zip(fournisseurs_df['ID_Fournisseur'], fournisseurs_df['Nom_Fournisseur'])).get)
+                id_acheteur = st.selectbox("Acheteur *", acheteurs_df['ID_Acheteur'].tolist(),
+                    format_func=dict(zip(acheteurs_df['ID_Acheteur'], acheteurs_df['Nom_Acheteur'])).get)
+                produit = st.text_input("Produit *")
+                statut_commande = st.selectbox("Statut", ["En_Cours", "Livrée", "Retard", "Annulée"])
+
+            with col2:
+                date_commande = st.date_input("Date de commande", datetime.now())
+                date_prevue = st.date_input("Livraison prévue", datetime.now())
+                quantite = st.number_input("Quantité", 1, 1000000, 1)
+                prix_unitaire = st.number_input("Prix Unitaire (€)", 0.0, 1000000.0, 0.0)
+
+            submit_commande = st.form_submit_button("Ajouter Commande", use_container_width=True)
+
+            if submit_commande:
+                from gudson.importer import validate
+
+                # Mêmes contrôles que l'import en masse
+                report = validate('commandes', pd.DataFrame([{
+                    'ID_Fournisseur': id_fournisseur,
+                    'ID_Acheteur': id_acheteur,
+                    'Date_Commande': date_commande.isoformat(),
+                    'Date_Livraison_Prevue': date_prevue.isoformat(),
+                    'Produit': produit,
+                    'Quantite': quantite,
+                    'Prix_Unitaire': prix_unitaire,
+                    'Statut': statut_commande,
+                }]), st.session_state.snapshot)
+                if report.valid:
+                    new_id = get_service().next_id('commandes', st.session_state.snapshot)
+                    new_df = report.rows.copy()
+                    new_df.insert(0, 'ID_Commande', new_id)
+
+                    if save_data('commandes', upserts=new_df):
+                        log_action(st.session_state.username, "Création commande", "Commandes", new_id, f"Nouvelle commande: {produit}")
+                        st.success(f"✅ Commande ajoutée avec succès (ID: {new_id})")
+                        st.rerun()
+                else:
+                    for error in report.errors.itertuples():
+                        st.error(f"❌ {error.Colonne} : {error.Erreur}")
+
+    with tab4:
+        import_section()
+
+def import_section():
+    """Import d'un fichier CSV/XLSX : validation de tout le lot, un seul commit et une entrée d'historique"""
+    from gudson.importer import read_upload
+
+    st.markdown("### 📥 Import en masse (extraction ERP)")
+    st.caption("L'identifiant est attribué à l'import ; une colonne d'identifiant présente dans le fichier est ignorée.")
+
+    col1, col2 = st.columns([1, 2])
+    with col1:
+        table = st.selectbox("Table", ["commandes", "fournisseurs", "acheteurs"], key="import_table",
+                             format_func=str.capitalize)
+        skip_invalid = st.checkbox("Ignorer les lignes invalides", key="import_skip")
+    with col2:
+        upload = st.file_uploader("Fichier CSV ou XLSX", type=["csv", "xlsx"], key="import_file")
+
+    if upload is None:
+        return
+    try:
+        raw = read_upload(upload)
+    except Exception as e:
+        st.error(f"❌ Fichier illisible: {e}")
+        return
+
+    service = get_service()
+    result = service.bulk_import(table, raw, st.session_state.username, upload.name,
+                                 snapshot=st.session_state.snapshot, dry_run=True)
+    report = result.report
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Lignes lues", f"{report.total:,}")
+    col2.metric("Lignes invalides", f"{report.invalid_lines:,}")
+    col3.metric("Colonnes ignorées", len(report.ignored_columns))
+    if report.ignored_columns:
+        st.caption("Colonnes ignorées : " + ", ".join(report.ignored_columns))
+    if not report.valid:
+        show_table('import.erreurs', report.errors, hide_index=True)
+    if report.valid or skip_invalid:
+        if st.button(f"Importer dans {table}", use_container_width=True, key="import_run"):
+            result = service.bulk_import(table, raw, st.session_state.username, upload.name,
+                                         snapshot=st.session_state.snapshot, skip_invalid=skip_invalid)
+            st.session_state.snapshot = result.snapshot
+            if result.imported:
+                st.success(f"✅ {result.imported:,} lignes importées ({result.ids[0]} à {result.ids[-1]})")
+            else:
+                st.warning("Aucune ligne importée")
+    else:
+        st.warning("⚠️ Corriger le fichier ou cocher « Ignorer les lignes invalides » pour importer les lignes valides")
+
+def update_record(table, record_id, changes, expected, action, audit_table, label):
+    """Modifier un enregistrement par son identifiant (contrôle optimiste comme save_data)
+
+    Chaque champ réellement modifié est tracé dans l'historique avec ses valeurs avant/après.
+    """
+    from gudson.transaction import ConflictError
+
+    records = get_service().records(table)
+    # Champ texte laissé vide : valeur absente, comme à la création
+    changes = {field: None if value == '' else value for field, value in changes.items()}
+    try:
+        diff = records.diff(record_id, changes, st.session_state.snapshot)
+        if not diff:
+            st.info("ℹ️ Aucune modification à enregistrer")
+            return False
+        # Seuls les champs réellement modifiés sont écrits
+        st.session_state.snapshot = records.update(record_id, {field: changes[field] for field in diff},
+                                                   expected=expected[record_id])
+    except (ConflictError, KeyError):
+        st.warning("⚠️ Cet enregistrement a été modifié ou supprimé par un autre utilisateur entre-temps. "
+                   "Les données ont été rechargées : vérifiez-les puis recommencez.")
+        st.session_state.snapshot = get_service().snapshot()
+        return False
+    except Exception as e:
+        st.error(f"Erreur sauvegarde: {e}")
+        return False
+    for field, (old_value, new_value) in diff.items():
+        log_action(st.session_state.username, action, audit_table, record_id, f"Modification: {label}",
+                   field, display_value(old_value), display_value(new_value))
+    return True
+
+def display_value(value):
+    """Valeur lisible pour l'historique (dates sans heure nulle, vide pour une valeur absente)"""
+    if value is None:
+        return ''
+    if hasattr(value, 'strftime'):
+        return value.strftime('%Y-%m-%d %H:%M:%S' if (value.hour, value.minute, value.second) != (0, 0, 0) else '%Y-%m-%d')
+    return str(value)
+
+def select_record(table, label_column, label):
+    """Choix d'un enregistrement par identifiant (les libellés en double restent distincts)"""
+    records = get_service().records(table)
+    labels = records.labels(st.session_state.snapshot, label_column)
+    record_id = st.selectbox(label, list(labels), format_func=lambda key: f"{labels[key]} ({key})",
+                             key=f"edit_select_{table}")
+    if record_id is None:
+        return None, None
+    return record_id, records.get(record_id, st.session_state.snapshot)
+
+def delete_section(table, record_id, name, audit_action, audit_table):
+    """Suppression confirmée d'un enregistrement, refusée s'il a changé depuis son ouverture"""
+    st.markdown("#### 🗑️ Supprimer")
+    confirm = st.checkbox(f"⚠️ Confirmer suppression de {name}", key=f"confirm_delete_{table}_{record_id}")
+    if st.button("🗑️ Supprimer", type="secondary", disabled=not confirm, key=f"delete_{table}"):
+        if has_permission(st.session_state.user_data, "suppression") or st.session_state.user_data['role'] == 'Admin':
+            expected = edit_version(table, record_id)
+            if save_data(table, deletes=[record_id], expected=expected):
+                log_action(st.session_state.username, audit_action, audit_table, record_id, f"Suppression: {name}")
+                st.success(f"✅ '{name}' supprimé")
+                st.rerun()
+            else:
+                edit_version(table, record_id, reset=True)
+        else:
+            st.error("❌ Permissions insuffisantes pour supprimer")
+
+@timed('page.modification')
 def edit_data_page():
     """Page de modification/suppression des données - NOUVELLE FONCTIONNALITÉ"""
     if not has_permission(st.session_state.user_data, "ecriture"):
         st.error("❌ Vous n'avez pas les permissions pour modifier des données")
         return
 
+    import pandas as pd
+
     st.markdown('<div class="main-header"><h1>✏️ Modifier / Supprimer Données</h1></div>', unsafe_allow_html=True)
 
     tab1, tab2, tab3 = st.tabs(["🏢 Fournisseurs", "👤 Acheteurs", "📦 Commandes"])
@@ -637,14 +1000,11 @@ def edit_data_page():
     with tab1:
         st.markdown("### ✏️ Modifier/Supprimer Fournisseurs")
 
-        df_fournisseurs = st.session_state.df_fournisseurs
-
-        # Sélection du fournisseur
-        fournisseur_names = df_fournisseurs['Nom_Fournisseur'].tolist()
-        selected_fournisseur = st.selectbox("Sélectionner un fournisseur", fournisseur_names)
+        # Sélection du fournisseur par identifiant
+        id_fournisseur, fournisseur_data = select_record('fournisseurs', 'Nom_Fournisseur', "Sélectionner un fournisseur")
 
-        if selected_fournisseur:
-            fournisseur_data = df_fournisseurs[df_fournisseurs['Nom_Fournisseur'] == selected_fournisseur].iloc[0]
+        if fournisseur_data is not None:
+            expected = edit_version('fournisseurs', id_fournisseur)
 
             col1, col2 = st.columns([3, 1])
 
@@ -668,62 +1028,161 @@ def edit_data_page():
                     submit_edit = st.form_submit_button("💾 Sauvegarder Modifications", use_container_width=True)
 
                     if submit_edit:
-                        # Mettre à jour les données
-                        index = df_fournisseurs[df_fournisseurs['Nom_Fournisseur'] == selected_fournisseur].index[0]
-
-                        st.session_state.df_fournisseurs.loc[index, 'Nom_Fournisseur'] = new_nom
-                        st.session_state.df_fournisseurs.loc[index, 'Score_Qualite'] = new_score
-                        st.session_state.df_fournisseurs.loc[index, 'Delai_Moyen_Livraison'] = new_delai
-                        st.session_state.df_fournisseurs.loc[index, 'Statut'] = new_statut
-                        st.session_state.df_fournisseurs.loc[index, 'Taux_Conformite'] = new_taux
-                        st.session_state.df_fournisseurs.loc[index, 'Note_Performance'] = new_performance
-
-                        # Logger l'action
-                        log_action(st.session_state.username, "Modification fournisseur", "Fournisseurs", 
-                                 fournisseur_data['ID_Fournisseur'], f"Modification: {selected_fournisseur}")
-
-                        # Sauvegarder
-                        if save_data():
+                        # Sauvegarder si personne n'a modifié la ligne depuis son ouverture
+                        if update_record('fournisseurs', id_fournisseur, {
+                            'Nom_Fournisseur': new_nom,
+                            'Score_Qualite': new_score,
+                            'Delai_Moyen_Livraison': new_delai,
+                            'Statut': new_statut,
+                            'Taux_Conformite': new_taux,
+                            'Note_Performance': new_performance,
+                        }, expected, "Modification fournisseur", "Fournisseurs", fournisseur_data['Nom_Fournisseur']):
+                            edit_version('fournisseurs', id_fournisseur, reset=True)
                             st.success("✅ Modifications sauvegardées")
                             st.rerun()
                         else:
-                            st.error("❌ Erreur lors de la sauvegarde")
+                            edit_version('fournisseurs', id_fournisseur, reset=True)
 
             with col2:
-                st.markdown("#### 🗑️ Supprimer")
-                st.write(f"**ID:** {fournisseur_data['ID_Fournisseur']}")
+                st.write(f"**ID:** {id_fournisseur}")
                 st.write(f"**Statut:** {fournisseur_data['Statut']}")
                 st.write(f"**CA Total:** {fournisseur_data['CA_Total']:,.0f} €")
+                delete_section('fournisseurs', id_fournisseur, fournisseur_data['Nom_Fournisseur'],
+                               "Suppression fournisseur", "Fournisseurs")
+
+    with tab2:
+        st.markdown("### ✏️ Modifier/Supprimer Acheteurs")
+
+        id_acheteur, acheteur_data = select_record('acheteurs', 'Nom_Acheteur', "Sélectionner un acheteur")
+
+        if acheteur_data is not None:
+            expected = edit_version('acheteurs', id_acheteur)
+            departements = ["Achats Généraux", "Achats IT", "Achats Production", "Achats Services"]
+            certifications = ["CIPS", "CDAF", "Aucune"]
+            statuts = ["Actif", "En Formation", "Senior"]
+
+            col1, col2 = st.columns([3, 1])
+
+            with col1:
+                st.markdown("#### ✏️ Modifier les Informations")
+
+                with st.form("edit_acheteur"):
+                    col_a, col_b = st.columns(2)
+
+                    with col_a:
+                        new_nom = st.text_input("Nom", value=acheteur_data['Nom_Acheteur'])
+                        new_email = st.text_input("Email", value=acheteur_data['Email'])
+                        new_departement = st.selectbox("Département", departements,
+                            index=departements.index(acheteur_data['Departement']) if acheteur_data['Departement'] in departements else 0)
+                        new_certification = st.selectbox("Certification", certifications,
+                            index=certifications.index(acheteur_data['Certification']) if acheteur_data['Certification'] in certifications else 2)
+
+                    with col_b:
+                        new_budget = st.number_input("Budget Alloué (€)", 0.0, 10000000.0, float(acheteur_data['Budget_Alloue']))
+                        new_objectif = st.number_input("Objectif Économies (€)", 0.0, 10000000.0, float(acheteur_data['Objectif_Economies']))
+                        new_statut = st.selectbox("Statut", statuts,
+                            index=statuts.index(acheteur_data['Statut']) if acheteur_data['Statut'] in statuts else 0)
+                        new_note = st.slider("Note Manager", 0.0, 10.0, float(acheteur_data['Note_Manager']), 0.1)
+
+                    submit_edit = st.form_submit_button("💾 Sauvegarder Modifications", use_container_width=True)
+
+                    if submit_edit:
+                        if update_record('acheteurs', id_acheteur, {
+                            'Nom_Acheteur': new_nom,
+                            'Email': new_email,
+                            'Departement': new_departement,
+                            'Certification': new_certification,
+                            'Budget_Alloue': new_budget,
+                            'Objectif_Economies': new_objectif,
+                            'Statut': new_statut,
+                            'Note_Manager': new_note,
+                        }, expected, "Modification acheteur", "Acheteurs", acheteur_data['Nom_Acheteur']):
+                            edit_version('acheteurs', id_acheteur, reset=True)
+                            st.success("✅ Modifications sauvegardées")
+                            st.rerun()
+                        else:
+                            edit_version('acheteurs', id_acheteur, reset=True)
+
+            with col2:
+                st.write(f"**ID:** {id_acheteur}")
+                st.write(f"**Département:** {acheteur_data['Departement']}")
+                st.write(f"**Budget Utilisé:** {acheteur_data['Budget_Utilise']:,.0f} €")
+                delete_section('acheteurs', id_acheteur, acheteur_data['Nom_Acheteur'],
+                               "Suppression acheteur", "Acheteurs")
+
+    with tab3:
+        st.markdown("### ✏️ Modifier/Supprimer Commandes")
+
+        id_commande, commande_data = select_record('commandes', 'Produit', "Sélectionner une commande")
+
+        if commande_data is not None:
+            expected = edit_version('commandes', id_commande)
+            statuts = ["En_Cours", "Livrée", "Retard", "Annulée"]
+            livraison = commande_data['Date_Livraison_Reelle']
+            note = commande_data['Note_Qualite']
+
+            col1, col2 = st.columns([3, 1])
+
+            with col1:
+                st.markdown("#### ✏️ Modifier les Informations")
 
-                if st.button("🗑️ Supprimer Fournisseur", type="secondary"):
-                    # Confirmation de suppression
-                    if st.checkbox(f"⚠️ Confirmer suppression de {selected_fournisseur}"):
-                        if has_permission(st.session_state.user_data, "suppression") or st.session_state.user_data['role'] == 'Admin':
-                            # Supprimer le fournisseur
-                            st.session_state.df_fournisseurs = st.session_state.df_fournisseurs[
-                                st.session_state.df_fournisseurs['Nom_Fournisseur'] != selected_fournisseur
-                            ]
-
-                            # Logger l'action
-                            log_action(st.session_state.username, "Suppression fournisseur", "Fournisseurs",
-                                     fournisseur_data['ID_Fournisseur'], f"Suppression: {selected_fournisseur}")
-
-                            # Sauvegarder
-                            if save_data():
-                                st.success(f"✅ Fournisseur '{selected_fournisseur}' supprimé")
-                                st.rerun()
-                            else:
-                                st.error("❌ Erreur lors de la suppression")
+                with st.form("edit_commande"):
+                    col_a, col_b = st.columns(2)
+
+                    with col_a:
+                        new_statut = st.selectbox("Statut", statuts,
+                            index=statuts.index(commande_data['Statut']) if commande_data['Statut'] in statuts else 0)
+                        new_quantite = st.number_input("Quantité", 1, 1000000, int(commande_data['Quantite']))
+                        new_prix = st.number_input("Prix Unitaire (€)", 0.0, 1000000.0, float(commande_data['Prix_Unitaire']))
+                        # Conformité non contrôlée (import sans la colonne) : reste vide tant qu'elle n'est pas choisie
+                        conformites = [None, "Oui", "Non"]
+                        new_conforme = st.selectbox("Conforme", conformites,
+                            index=0 if pd.isna(commande_data['Conforme']) else conformites.index(commande_data['Conforme']),
+                            format_func=lambda value: "Non renseigné" if value is None else value)
+
+                    with col_b:
+                        new_livraison = st.date_input("Livraison réelle", None if pd.isna(livraison) else livraison)
+                        sans_note = st.checkbox("Pas encore notée", value=pd.isna(note))
+                        new_note = st.slider("Note Qualité", 0.0, 10.0, 5.0 if pd.isna(note) else float(note), 0.1)
+                        new_commentaires = st.text_area("Commentaires",
+                            value="" if pd.isna(commande_data['Commentaires']) else commande_data['Commentaires'])
+
+                    submit_edit = st.form_submit_button("💾 Sauvegarder Modifications", use_container_width=True)
+
+                    if submit_edit:
+                        if update_record('commandes', id_commande, {
+                            'Statut': new_statut,
+                            'Quantite': new_quantite,
+                            'Prix_Unitaire': new_prix,
+                            'Montant_Total': round(new_quantite * new_prix, 2),
+                            'Conforme': new_conforme,
+                            'Date_Livraison_Reelle': new_livraison,
+                            'Note_Qualite': None if sans_note else new_note,
+                            'Commentaires': new_commentaires,
+                        }, expected, "Modification commande", "Commandes", commande_data['Produit']):
+                            edit_version('commandes', id_commande, reset=True)
+                            st.success("✅ Modifications sauvegardées")
+                            st.rerun()
                         else:
-                            st.error("❌ Permissions insuffisantes pour supprimer")
+                            edit_version('commandes', id_commande, reset=True)
+
+            with col2:
+                st.write(f"**ID:** {id_commande}")
+                st.write(f"**Fournisseur:** {commande_data['ID_Fournisseur']}")
+                st.write(f"**Montant:** {commande_data['Montant_Total']:,.0f} €")
+                delete_section('commandes', id_commande, f"{commande_data['Produit']} ({id_commande})",
+                               "Suppression commande", "Commandes")
 
+@timed('page.analyses')
 def analytics_page():
     """Page d'analyses avancées"""
+    import plotly.express as px
+    
     st.markdown('<div class="main-header"><h1>📈 Analyses Avancées</h1></div>', unsafe_allow_html=True)
 
-    df_fournisseurs = st.session_state.df_fournisseurs
-    df_acheteurs = st.session_state.df_acheteurs
-    df_commandes = st.session_state.df_commandes
+    service = get_service()
+    snapshot = st.session_state.snapshot
+    kpis = service.analytics(snapshot)
 
     # Analyses croisées
     st.markdown("### 🔍 Analyses Croisées")
@@ -734,104 +1193,134 @@ def analytics_page():
         st.markdown("#### 🌍 Performance par Pays")
 
         # Grouper par pays et calculer les moyennes
-        perf_pays = df_fournisseurs.groupby('Pays').agg({
-            'Score_Qualite': 'mean',
-            'Delai_Moyen_Livraison': 'mean',
-            'Taux_Conformite': 'mean',
-            'CA_Total': 'sum'
-        }).round(1)
-
-        fig = px.scatter(perf_pays.reset_index(), 
+        perf_pays = kpis.performance_pays
+
+        fig = figure('analyses.pays', px.scatter, perf_pays.reset_index(), 
                         x='Score_Qualite', y='Taux_Conformite',
                         size='CA_Total', color='Pays',
                         title="Score Qualité vs Taux Conformité par Pays",
                         hover_data=['Delai_Moyen_Livraison'])
-        st.plotly_chart(fig, use_container_width=True)
+        show_chart('analyses.pays', fig)
 
     with col2:
         st.markdown("#### 📊 Correlation Métriques")
 
         # Matrice de corrélation
-        metrics_cols = ['Score_Qualite', 'Delai_Moyen_Livraison', 'Taux_Conformite', 'Note_Performance']
-        corr_matrix = df_fournisseurs[metrics_cols].corr()
+        corr_matrix = kpis.correlations
 
-        fig = px.imshow(corr_matrix, 
+        fig = figure('analyses.correlations', px.imshow, corr_matrix, 
                        text_auto=True, aspect="auto",
                        title="Corrélations entre Métriques",
                        color_continuous_scale='RdYlBu')
-        st.plotly_chart(fig, use_container_width=True)
+        show_chart('analyses.correlations', fig)
 
     # Analyses temporelles
     st.markdown("### ⏱️ Analyses Temporelles")
+    timeseries_section(service, snapshot)
 
-    # Convertir les dates
-    df_commandes['Date_Commande'] = pd.to_datetime(df_commandes['Date_Commande'])
+    # Export des données
+    st.markdown("### 📥 Export des Données")
+    export_section(service, snapshot)
 
-    # Évolution mensuelle détaillée
-    monthly_data = df_commandes.groupby(df_commandes['Date_Commande'].dt.to_period('M')).agg({
-        'Montant_Total': ['sum', 'count', 'mean'],
-        'Note_Qualite': 'mean'
-    }).round(2)
+def timeseries_section(service, snapshot):
+    """CA et commandes par jour/semaine/mois/trimestre, cumul glissant et variations, par dimension"""
+    import plotly.express as px
+    from gudson.timeseries import GRANULARITIES
 
-    monthly_data.columns = ['CA_Total', 'Nb_Commandes', 'Montant_Moyen', 'Qualite_Moyenne']
-    monthly_data = monthly_data.reset_index()
-    monthly_data['Date_Commande'] = monthly_data['Date_Commande'].astype(str)
+    dimensions = {None: "Global", 'ID_Fournisseur': "Fournisseur", 'ID_Acheteur': "Acheteur", 'Produit': "Produit"}
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        granularity = st.selectbox("Granularité", list(GRANULARITIES), index=2, format_func=GRANULARITIES.get,
+                                   key='ts_granularity')
+    with col2:
+        dimension = st.selectbox("Ventilation", list(dimensions), format_func=dimensions.get, key='ts_dimension')
+    with col3:
+        window = st.number_input("Fenêtre glissante (périodes)", 1, 52, 3, key='ts_window')
+    with col4:
+        top = st.number_input("Top (CA)", 1, 20, 5, key='ts_top', disabled=dimension is None)
+
+    series = service.timeseries(snapshot, granularity, dimension, int(window), top=int(top) if dimension else None)
+    if series.empty:
+        st.info("Aucune commande sur la période")
+        return
+    color = None
+    if dimension in ('ID_Fournisseur', 'ID_Acheteur'):
+        table = 'fournisseurs' if dimension == 'ID_Fournisseur' else 'acheteurs'
+        labels = service.records(table).labels(snapshot, 'Nom_Fournisseur' if table == 'fournisseurs' else 'Nom_Acheteur')
+        series = series.assign(Libelle=series[dimension].map(labels).fillna(series[dimension]))
+        color = 'Libelle'
+    elif dimension:
+        color = dimension
 
     col1, col2 = st.columns(2)
 
     with col1:
-        fig = px.line(monthly_data, x='Date_Commande', y='CA_Total',
-                     title="Évolution du Chiffre d'Affaires")
-        fig.update_traces(line_color='#1f77b4')
-        st.plotly_chart(fig, use_container_width=True)
+        fig = figure('series.ca', px.line, series, x='Debut', y=['CA_Total', 'CA_Total_Glissant'] if color is None else 'CA_Total',
+                      color=color, title="Évolution du Chiffre d'Affaires")
+        show_chart('series.ca', fig)
 
     with col2:
-        fig = px.bar(monthly_data, x='Date_Commande', y='Nb_Commandes',
-                    title="Nombre de Commandes par Mois")
-        fig.update_traces(marker_color='#ff7f0e')
-        st.plotly_chart(fig, use_container_width=True)
-
-    # Export des données
-    st.markdown("### 📥 Export des Données")
-
+        fig = figure('series.commandes', px.bar, series, x='Debut', y='Nb_Commandes', color=color,
+                     title=f"Nombre de Commandes par {GRANULARITIES[granularity]}")
+        if color is None:
+            fig.update_traces(marker_color='#ff7f0e')
+        show_chart('series.commandes', fig)
+
+    # Dernières périodes : variations vs période précédente et vs même période N-1
+    columns = ['Periode'] + ([color] if color else []) + [
+        'CA_Total', 'CA_Total_Glissant', 'Var_CA_Total_Periode', 'Var_CA_Total_Annuelle',
+        'Nb_Commandes', 'Var_Nb_Commandes_Periode', 'Var_Nb_Commandes_Annuelle']
+    recent = series[series['Periode'].isin(series['Periode'].drop_duplicates().tail(6))]
+    show_table('series.recent', recent[columns].astype({'Periode': str}).iloc[::-1], hide_index=True)
+
+def export_section(service, snapshot):
+    """Export filtré d'une table ; le fichier n'est produit qu'au clic, puis réutilisé pour la même version"""
     col1, col2, col3 = st.columns(3)
 
     with col1:
-        if st.button("📊 Exporter Fournisseurs CSV"):
-            csv = df_fournisseurs.to_csv(index=False)
-            st.download_button(
-                label="⬇️ Télécharger CSV",
-                data=csv,
-                file_name=f"fournisseurs_{datetime.now().strftime('%Y%m%d')}.csv",
-                mime="text/csv"
-            )
+        labels = {'fournisseurs': "📊 Fournisseurs", 'acheteurs': "👤 Acheteurs", 'commandes': "📦 Commandes"}
+        table = st.selectbox("Table", list(labels), format_func=labels.get, key='export_table')
 
     with col2:
-        if st.button("👤 Exporter Acheteurs CSV"):
-            csv = df_acheteurs.to_csv(index=False)
-            st.download_button(
-                label="⬇️ Télécharger CSV",
-                data=csv,
-                file_name=f"acheteurs_{datetime.now().strftime('%Y%m%d')}.csv",
-                mime="text/csv"
-            )
+        fmt = st.selectbox("Format", ['csv', 'parquet', 'xlsx'], format_func=str.upper, key='export_format')
 
     with col3:
-        if st.button("📦 Exporter Commandes CSV"):
-            csv = df_commandes.to_csv(index=False)
-            st.download_button(
-                label="⬇️ Télécharger CSV",
-                data=csv,
-                file_name=f"commandes_{datetime.now().strftime('%Y%m%d')}.csv",
-                mime="text/csv"
-            )
+        compression = st.selectbox("Compression", [None, 'gzip', 'zstd'], key='export_compression',
+                                   format_func=lambda c: "Aucune" if c is None else c,
+                                   disabled=fmt != 'csv')
+        if fmt != 'csv':
+            compression = None
+
+    # Filtres de la table choisie et période
+    options = service.export_filter_options(snapshot, table)
+    filters = {}
+    columns = st.columns(len(options) + 2)
+    for col, (column, values) in zip(columns, options.items()):
+        with col:
+            value = st.selectbox(column, ['Tous'] + values, key=f"export_{table}_{column}")
+            filters[column] = None if value == 'Tous' else value
+    with columns[-2]:
+        start = st.date_input("Du", value=None, key=f"export_{table}_start")
+    with columns[-1]:
+        end = st.date_input("Au", value=None, key=f"export_{table}_end")
+
+    st.download_button(
+        label="⬇️ Télécharger",
+        data=lambda: service.export(snapshot, table, fmt, compression, filters, start, end).read(),
+        file_name=service.export_file_name(table, fmt, compression),
+        mime=service.export_mime(fmt, compression),
+        on_click='ignore'
+    )
 
+@timed('page.utilisateurs')
 def user_management_page():
     """Page de gestion des utilisateurs"""
     if not has_permission(st.session_state.user_data, "gestion_utilisateurs"):
         st.error("❌ Vous n'avez pas les permissions pour gérer les utilisateurs")
         return
 
+    import pandas as pd
+
     st.markdown('<div class="main-header"><h1>👥 Gestion des Utilisateurs</h1></div>', unsafe_allow_html=True)
 
     users_db = load_users()
@@ -842,7 +1331,7 @@ def user_management_page():
     users_list = []
     for username, data in users_db.items():
         users_list.append({
-            'Nom d'utilisateur': username,
+            "Nom d'utilisateur": username,
             'Nom complet': data['nom_complet'],
             'Email': data['email'],
             'Rôle': data['role'],
@@ -851,27 +1340,124 @@ def user_management_page():
 
     if users_list:
         df_users = pd.DataFrame(users_list)
-        st.dataframe(df_users, use_container_width=True, hide_index=True)
+        show_table('utilisateurs', df_users, hide_index=True)
 
     # Historique des actions
     st.markdown("### 📊 Historique des Actions")
 
-    df_historique = st.session_state.df_historique
+    history_section()
+
+@timed('page.performances')
+def performance_page():
+    """Page d'administration : temps par segment (p50/p95/p99), mémoire des tables, export des mesures"""
+    if not has_permission(st.session_state.user_data, "gestion_utilisateurs"):
+        st.error("❌ Vous n'avez pas les permissions pour consulter les performances")
+        return
+
+    import pandas as pd
+    from gudson.cache import derived_cache
+    from gudson.metrics import peak_rss, recorder
 
-    # Filtrer par utilisateur
-    user_filter = st.selectbox("Filtrer par utilisateur", ['Tous'] + df_historique['Utilisateur'].unique().tolist())
+    st.markdown('<div class="main-header"><h1>⏱️ Performances</h1></div>', unsafe_allow_html=True)
 
-    if user_filter != 'Tous':
-        df_hist_filtered = df_historique[df_historique['Utilisateur'] == user_filter]
+    service = get_service()
+    snapshot = st.session_state.snapshot
+
+    # Mémoire des tables de la génération courante (partagée par toutes les sessions)
+    memory = service.table_memory(snapshot)
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("🧮 Tables en mémoire", f"{memory['Memoire_Octets'].sum() / 2**20:,.2f} Mio")
+    with col2:
+        st.metric("📈 Pic mémoire du processus", f"{peak_rss() / 2**20:,.0f} Mio")
+    with col3:
+        st.metric("🗃️ Cache dérivé", f"{len(derived_cache)} entrées",
+                  f"{derived_cache.hits} succès / {derived_cache.misses} calculs", delta_color='off')
+    st.dataframe(memory.assign(Memoire_Mio=(memory['Memoire_Octets'] / 2**20).round(2)).drop(columns='Memoire_Octets'),
+                 use_container_width=True, hide_index=True)
+
+    # Segments : pages, chargements/écritures, calculs dérivés, écouteurs, construction et affichage des graphiques
+    st.markdown("### 🕒 Temps par Segment")
+    rows = pd.DataFrame(recorder.summary())
+    if rows.empty:
+        st.info("Aucune mesure pour l'instant")
     else:
-        df_hist_filtered = df_historique
+        families = sorted(rows['span'].str.split('.').str[0].unique())
+        col1, col2 = st.columns([2, 1])
+        with col1:
+            chosen = st.multiselect("Familles", families, default=families, key='perf_families')
+        with col2:
+            sort_by = st.selectbox("Trier par", ['p95', 'p99', 'p50', 'total', 'count'], key='perf_sort')
+        rows = rows[rows['span'].str.split('.').str[0].isin(chosen)].sort_values(sort_by, ascending=False)
+        seconds = ['total', 'last', 'p50', 'p95', 'p99', 'max']
+        rows[seconds] = (rows[seconds] * 1000).round(1)
+        st.dataframe(rows.rename(columns={col: f"{col} (ms)" for col in seconds}),
+                     use_container_width=True, hide_index=True)
+
+    # Export texte (format Prometheus) : téléchargement ou fichier data/metrics.prom pour un collecteur
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.download_button("📥 Télécharger les mesures", service.metrics_text(snapshot),
+                           file_name="metrics.prom", mime="text/plain")
+    with col2:
+        if st.button("💾 Écrire le fichier de mesures"):
+            st.success(f"✅ Mesures écrites dans {service.write_metrics(snapshot)}")
+    with col3:
+        if st.button("🔄 Remettre à zéro"):
+            recorder.reset()
+            st.rerun()
 
-    # Afficher les dernières actions
-    latest_actions = df_hist_filtered.head(20)[
-        ['Date_Action', 'Utilisateur', 'Action', 'Table_Modifiee', 'ID_Enregistrement', 'Commentaire']
-    ]
+def history_section():
+    """Historique filtré (utilisateur, table, enregistrement, période), paginé par curseur du plus récent au plus ancien"""
+    service = get_service()
 
-    st.dataframe(latest_actions, use_container_width=True, hide_index=True)
+    col1, col2, col3, col4 = st.columns([2, 2, 2, 3])
+    with col1:
+        user_filter = st.selectbox("Filtrer par utilisateur", ['Tous'] + service.history_users())
+    with col2:
+        table_filter = st.selectbox("Table", ['Toutes'] + service.history_tables(), key="historique_table")
+    with col3:
+        record_filter = st.text_input("ID enregistrement", key="historique_record").strip()
+    with col4:
+        period = st.date_input("Période", value=(), key="historique_period")
+
+    start = end = None
+    if len(period) >= 1:
+        start = datetime.combine(period[0], datetime.min.time())
+    if len(period) == 2:
+        end = datetime.combine(period[1], datetime.max.time())
+    query = dict(
+        utilisateur=None if user_filter == 'Tous' else user_filter,
+        table=None if table_filter == 'Toutes' else table_filter,
+        record_id=record_filter or None,
+        start=start,
+        end=end,
+    )
+    page_size = st.selectbox("Lignes par page", [25, 50, 100, 250], index=1, key="historique_size")
+
+    # Curseurs des pages déjà parcourues, oubliés quand les filtres changent
+    state = (tuple(query.items()), page_size)
+    if st.session_state.get('historique_query') != state:
+        st.session_state.historique_query = state
+        st.session_state.historique_cursors = [None]
+    cursors = st.session_state.historique_cursors
+
+    page = service.history_page(limit=page_size, cursor=cursors[-1], **query)
+    show_table('historique', page.rows[['Date_Action', 'Utilisateur', 'Action', 'Table_Modifiee', 'ID_Enregistrement',
+                                        'Champ_Modifie', 'Ancienne_Valeur', 'Nouvelle_Valeur', 'Commentaire']],
+               hide_index=True)
+
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        if st.button("⬅️ Plus récentes", disabled=len(cursors) == 1, key="historique_newer"):
+            cursors.pop()
+            st.rerun()
+    with col2:
+        st.caption(f"Page {len(cursors)} · {len(page.rows):,} action(s)")
+    with col3:
+        if st.button("Plus anciennes ➡️", disabled=not page.has_more, key="historique_older"):
+            cursors.append(page.cursor)
+            st.rerun()
 
 # Point d'entrée principal
 def main():
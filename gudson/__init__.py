@@ -0,0 +1 @@
+"""GUDSON KPI - couche données et calculs (sans Streamlit)"""
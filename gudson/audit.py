@@ -0,0 +1,179 @@
+"""Journal d'audit : écriture bufferisée, IDs monotones, segments mensuels"""
+import atexit
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from .journal import _json_default, to_records
+from .schema import HISTORIQUE, coerce
+from .sequence import Sequence
+from .storage import atomic_write, file_token
+
+_SEGMENT = re.compile(r'^(\d{4}-\d{2})\.(jsonl|arrow)$')
+
+
+class AuditLog:
+    """Historique des actions, partitionné par mois (segment ouvert JSONL, segments scellés Arrow)"""
+
+    def __init__(self, root, batch_size=100, flush_interval=2.0):
+        self.root = root
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        os.makedirs(root, exist_ok=True)
+        self.ids = Sequence(os.path.join(root, 'sequence'), block=100)
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        threading.Thread(target=self._flusher, name='gudson-audit-flush', daemon=True).start()
+        atexit.register(self.flush)
+
+    def _segment_path(self, month, kind):
+        return os.path.join(self.root, f"{month}.{kind}")
+
+    def months(self):
+        """Mois disponibles, du plus ancien au plus récent"""
+        found = {m.group(1) for m in map(_SEGMENT.match, os.listdir(self.root)) if m}
+        return sorted(found)
+
+    def version(self):
+        """Jeton changeant à chaque écriture du journal (y compris par un autre processus)"""
+        self.flush()
+        return tuple(
+            (month, file_token(self._segment_path(month, 'jsonl'), self._segment_path(month, 'arrow')))
+            for month in self.months()
+        )
+
+    def log(self, user, action, table, record_id, details='', field='', old_value='', new_value=''):
+        """Ajouter une entrée au buffer et renvoyer son identifiant"""
+        entry = {
+            'ID_Historique': f"H{self.ids.next():04d}",
+            'Date_Action': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'Utilisateur': user,
+            'Action': action,
+            'Table_Modifiee': table,
+            'ID_Enregistrement': record_id,
+            'Champ_Modifie': field,
+            'Ancienne_Valeur': old_value,
+            'Nouvelle_Valeur': new_value,
+            'Commentaire': details,
+        }
+        with self._lock:
+            self._buffer.append(entry)
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self.flush()
+        else:
+            self._wakeup.set()
+        return entry['ID_Historique']
+
+    def _flusher(self):
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self):
+        """Écrire le buffer dans les segments mensuels (un append fsync par mois)"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._buffer = self._buffer, []
+            if not batch:
+                return
+            by_month = {}
+            for entry in batch:
+                by_month.setdefault(str(entry['Date_Action'])[:7], []).append(entry)
+            for month, entries in sorted(by_month.items()):
+                self._append(month, entries)
+            self._rotate(max(by_month))
+
+    def _append(self, month, entries):
+        lines = ''.join(json.dumps(e, ensure_ascii=False, default=_json_default) + '\n' for e in entries)
+        with open(self._segment_path(month, 'jsonl'), 'a', encoding='utf-8') as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _rotate(self, current):
+        """Sceller en Arrow les segments ouverts des mois révolus"""
+        for month in self.months():
+            if month < current and os.path.exists(self._segment_path(month, 'jsonl')):
+                self.seal(month)
+
+    def _read_jsonl(self, path):
+        if not os.path.exists(path):
+            return pd.DataFrame(columns=HISTORIQUE.names)
+        with open(path, 'r', encoding='utf-8') as f:
+            rows = [json.loads(line) for line in f if line.endswith('\n')]
+        return pd.DataFrame(rows, columns=HISTORIQUE.names)
+
+    def read_month(self, month):
+        """Charger un segment mensuel (partie scellée + partie ouverte)"""
+        frames = []
+        arrow_path = self._segment_path(month, 'arrow')
+        if os.path.exists(arrow_path):
+            frames.append(feather.read_table(arrow_path, memory_map=True).to_pandas())
+        frames.append(coerce(self._read_jsonl(self._segment_path(month, 'jsonl')), HISTORIQUE))
+        frames = [f for f in frames if len(f)]
+        if not frames:
+            return coerce(pd.DataFrame(columns=HISTORIQUE.names), HISTORIQUE)
+        df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+        return df.drop_duplicates('ID_Historique', keep='last')
+
+    def seal(self, month):
+        """Fusionner le segment ouvert d'un mois dans son fichier Arrow"""
+        df = self.read_month(month)
+        table = pa.Table.from_pandas(coerce(df, HISTORIQUE), schema=HISTORIQUE.arrow_schema(), preserve_index=False)
+        atomic_write(
+            self._segment_path(month, 'arrow'),
+            lambda p: feather.write_feather(table, p, compression='uncompressed'),
+        )
+        jsonl_path = self._segment_path(month, 'jsonl')
+        if os.path.exists(jsonl_path):
+            os.remove(jsonl_path)
+
+    def read(self, months=None):
+        """Historique complet (ou restreint à certains mois), trié par date"""
+        self.flush()
+        months = self.months() if months is None else months
+        frames = [self.read_month(month) for month in months]
+        frames = [f for f in frames if len(f)]
+        if not frames:
+            return coerce(pd.DataFrame(columns=HISTORIQUE.names), HISTORIQUE)
+        return pd.concat(frames, ignore_index=True).sort_values('Date_Action', kind='stable', ignore_index=True)
+
+    def import_frame(self, df):
+        """Importer un historique existant dans les segments mensuels"""
+        records = to_records(df, HISTORIQUE)
+        by_month = {}
+        for record in records:
+            if record['Date_Action'] is not None:
+                by_month.setdefault(str(record['Date_Action'])[:7], []).append(record)
+        for month, entries in sorted(by_month.items()):
+            self._append(month, entries)
+        for month in sorted(by_month)[:-1]:
+            self.seal(month)
+
+
+def open_audit_log(root='.', storage=None):
+    """Ouvrir le journal d'audit sous data/historique, en important l'historique existant"""
+    audit_root = os.path.join(root, 'data', 'historique')
+    is_new = not os.path.exists(os.path.join(audit_root, 'sequence'))
+    audit = AuditLog(audit_root)
+    if is_new:
+        last_id = 0
+        if storage is not None and storage.exists('historique'):
+            df = storage.load('historique')
+            audit.import_frame(df)
+            numbers = df['ID_Historique'].str.extract(r'(\d+)', expand=False).dropna()
+            last_id = int(numbers.astype(int).max()) if len(numbers) else 0
+        audit.ids.seed(last_id)
+    return audit
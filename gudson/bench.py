@@ -0,0 +1,352 @@
+"""Banc de mesure des chemins de données de chaque page, sur jeux synthétiques"""
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import tempfile
+import time
+from datetime import datetime
+
+from .cache import derived_cache
+from .schema import TABLES
+from .service import open_service
+from .snapshot import SharedData
+from .storage import open_storage
+from .synthetic import generate, write
+from .transaction import ConflictError, row_versions
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """Enregistrer une mesure : fn(contexte) exécutée à chaque répétition"""
+    def decorator(fn):
+        BENCHMARKS[name] = fn
+        return fn
+    return decorator
+
+
+class Context:
+    """Jeu de données écrit dans un répertoire temporaire et service ouvert dessus"""
+
+    def __init__(self, root, backend):
+        self.root = root
+        self.backend = backend
+        self.service = open_service(root, backend)
+        self.iteration = 0
+
+    @property
+    def snapshot(self):
+        return self.service.snapshot()
+
+
+@benchmark('load_data')
+def _load_data(ctx):
+    SharedData(open_storage(ctx.root, ctx.backend))
+
+
+@benchmark('save_data')
+def _save_data(ctx):
+    commandes = ctx.snapshot['commandes']
+    row = commandes.iloc[[ctx.iteration % len(commandes)]].astype(object)
+    row['Note_Qualite'] = float(ctx.iteration % 10)
+    ctx.service.commit('commandes', upserts=row)
+
+
+@benchmark('records.update')
+def _records_update(ctx):
+    # Édition d'une commande par identifiant, avec contrôle de version comme la page de modification
+    records = ctx.service.records('commandes')
+    key = ctx.snapshot['commandes']['ID_Commande'].iloc[ctx.iteration % 100]
+    records.update(key, {'Note_Qualite': float(ctx.iteration % 10)}, expected=records.version(key))
+
+
+@benchmark('timeseries')
+def _timeseries(ctx):
+    # Une nouvelle version à chaque répétition : mesure le calcul, pas le cache
+    _save_data(ctx)
+    for granularity in ('D', 'W', 'M', 'Q'):
+        ctx.service.timeseries(ctx.snapshot, granularity, 'ID_Fournisseur', window=4)
+
+
+@benchmark('log_action')
+def _log_action(ctx):
+    # 100 actions puis écriture du lot, comme un pic d'activité
+    for i in range(100):
+        ctx.service.log('bench', 'Modification commande', 'Commandes', f"C{i:04d}", 'Banc de mesure')
+    ctx.service.audit.flush()
+
+
+@benchmark('history.latest')
+def _history_latest(ctx):
+    ctx.service.latest_actions(50)
+
+
+@benchmark('history.record')
+def _history_record(ctx):
+    ctx.service.record_history('Commandes', f"C{ctx.iteration % 100 + 1:04d}")
+
+
+@benchmark('ids.allocate')
+def _ids_allocate(ctx):
+    # 100 créations unitaires puis un lot d'import
+    for _ in range(100):
+        ctx.service.next_id('commandes')
+    ctx.service.next_ids('commandes', 10000)
+
+
+@benchmark('rollups.rebuild')
+def _rollups_rebuild(ctx):
+    ctx.service.rollups.rebuild(ctx.snapshot['commandes'])
+
+
+@benchmark('page.dashboard')
+def _dashboard(ctx):
+    derived_cache.invalidate()
+    ctx.service.dashboard(ctx.snapshot)
+
+
+@benchmark('delivery.rebuild')
+def _delivery_rebuild(ctx):
+    ctx.service.delivery_engine.rebuild(ctx.snapshot['commandes'])
+
+
+@benchmark('scoring.ranking')
+def _scoring_ranking(ctx):
+    # Classements lus dans les structures maintenues : général, par pays, avec filtre de statut
+    snapshot = ctx.snapshot
+    ctx.service.supplier_ranking(snapshot, k=10)
+    ctx.service.supplier_ranking(snapshot, pays='France', statut='Actif', k=10)
+    ctx.service.supplier_ranking(snapshot, categorie='Électronique', k=50, bottom=True)
+
+
+@benchmark('page.kpi_fournisseurs')
+def _suppliers(ctx):
+    derived_cache.invalidate()
+    snapshot = ctx.snapshot
+    ctx.service.suppliers(snapshot)
+    ctx.service.suppliers(snapshot, pays='France', statut='Actif')
+    ctx.service.deliveries(snapshot)
+    ctx.service.deliveries(snapshot, pays='France', statut='Actif')
+
+
+@benchmark('page.kpi_acheteurs')
+def _buyers(ctx):
+    derived_cache.invalidate()
+    kpis = ctx.service.buyers(ctx.snapshot)
+    ctx.service.buyer_detail(kpis.acheteurs['Nom_Acheteur'].iloc[0], ctx.snapshot)
+
+
+@benchmark('buyers.drilldown')
+def _buyers_drilldown(ctx):
+    # Regroupement par acheteur une fois par version, puis une sélection par acheteur
+    derived_cache.invalidate()
+    for buyer in ctx.snapshot['acheteurs']['ID_Acheteur'].iloc[:5]:
+        ctx.service.buyer_drilldown(buyer, ctx.snapshot)
+
+
+@benchmark('page.analytics')
+def _analytics(ctx):
+    derived_cache.invalidate()
+    ctx.service.analytics(ctx.snapshot)
+
+
+def _export(ctx, fmt, compression=None):
+    ctx.service.exports.clear()
+    snapshot = ctx.snapshot
+    for table in ('fournisseurs', 'acheteurs', 'commandes'):
+        export = ctx.service.export(snapshot, table, fmt, compression)
+        if fmt == 'parquet' and table != 'commandes':
+            _check_parquet(export, ctx.service.export_source(snapshot, table)[0])
+
+
+def _check_parquet(export, df):
+    """Tables enrichies (KPI calculés) : le fichier relu a toutes les colonnes et toutes les lignes"""
+    import io
+
+    import pyarrow.parquet as pq
+
+    metadata = pq.read_metadata(io.BytesIO(export.read()))
+    if metadata.schema.names != list(df.columns) or metadata.num_rows != len(df):
+        raise AssertionError(f"Export Parquet incomplet : {metadata.schema.names} ({metadata.num_rows} lignes)")
+
+
+@benchmark('export.csv')
+def _export_csv(ctx):
+    _export(ctx, 'csv')
+
+
+@benchmark('export.csv.zstd')
+def _export_csv_zstd(ctx):
+    _export(ctx, 'csv', 'zstd')
+
+
+@benchmark('export.parquet')
+def _export_parquet(ctx):
+    _export(ctx, 'parquet')
+
+
+def _measure(fn, ctx, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(ctx)
+        timings.append(time.perf_counter() - start)
+        ctx.iteration += 1
+    return {
+        'min': min(timings),
+        'median': statistics.median(timings),
+        'max': max(timings),
+        'repeat': repeat,
+    }
+
+
+def run(scales=(1000, 10000, 100000), repeat=5, seed=42, backend='arrow', names=None):
+    """Mesurer chaque banc sur chaque volume de commandes ; durées en secondes"""
+    results = {}
+    for orders in scales:
+        with tempfile.TemporaryDirectory(prefix='gudson-bench-') as root:
+            write(generate(orders, seed), root, backend)
+            ctx = Context(root, backend)
+            results[str(orders)] = {
+                name: _measure(fn, ctx, repeat)
+                for name, fn in BENCHMARKS.items()
+                if names is None or name in names
+            }
+            ctx.service.audit.flush()
+    return {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'seed': seed,
+        'backend': backend,
+        'machine': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'processor': platform.machine(),
+            'cpus': os.cpu_count(),
+        },
+        'results': results,
+    }
+
+
+def compare(current, baseline, tolerance=0.25, min_delta=0.005):
+    """Régressions : médiane dépassant celle de la référence de plus de `tolerance`
+
+    Les écarts inférieurs à `min_delta` secondes sont ignorés (bruit de mesure). Un banc
+    absent de la référence est signalé (`baseline` à None) : il ne serait jamais contrôlé
+    """
+    regressions = []
+    for scale, benches in current['results'].items():
+        for name, stats in benches.items():
+            reference = baseline.get('results', {}).get(scale, {}).get(name)
+            if not reference:
+                regressions.append({
+                    'orders': int(scale),
+                    'benchmark': name,
+                    'baseline': None,
+                    'current': stats['median'],
+                    'ratio': None,
+                })
+                continue
+            limit = max(reference['median'] * (1 + tolerance), reference['median'] + min_delta)
+            if stats['median'] > limit:
+                regressions.append({
+                    'orders': int(scale),
+                    'benchmark': name,
+                    'baseline': reference['median'],
+                    'current': stats['median'],
+                    'ratio': stats['median'] / reference['median'],
+                })
+    return regressions
+
+
+def _writer(root, backend, keys, updates, seed, check):
+    """Un rédacteur simulé : lecture, +1 sur Quantite d'une ligne chaude, enregistrement (réessai si conflit)
+
+    La couche transactionnelle est mesurée seule (SharedData sans écouteurs KPI).
+    """
+    import random
+
+    data = SharedData(open_storage(root, backend), tables=('commandes',))
+    schema = TABLES['commandes']
+    rng = random.Random(seed)
+    commits = conflicts = 0
+    start = time.perf_counter()
+    for _ in range(updates):
+        key = rng.choice(keys)
+        while True:
+            commandes = data.refresh()['commandes']
+            row = commandes[commandes['ID_Commande'] == key].astype(object)
+            expected = row_versions(commandes, schema, [key]) if check else None
+            row['Quantite'] = row['Quantite'] + 1
+            try:
+                data.commit('commandes', upserts=row, expected=expected)
+            except ConflictError:
+                conflicts += 1
+                continue
+            commits += 1
+            break
+    return commits, conflicts, time.perf_counter() - start
+
+
+def contention(writers=8, updates=50, rows=4, orders=1000, seed=42, backend='arrow', check=True):
+    """Plusieurs processus modifient les mêmes lignes : débit, conflits et mises à jour perdues
+
+    Chaque commit ajoute 1 à Quantite ; sans perte, la somme finale augmente exactement
+    du nombre de commits. check=False désactive le contrôle optimiste (dernier écrivain gagnant).
+    """
+    with tempfile.TemporaryDirectory(prefix='gudson-contention-') as root:
+        write(generate(orders, seed), root, backend)
+        commandes = open_service(root, backend).snapshot()['commandes']
+        keys = commandes['ID_Commande'].iloc[:rows].tolist()
+        initial = int(commandes['Quantite'].iloc[:rows].sum())
+        args = [(root, backend, keys, updates, seed + i, check) for i in range(writers)]
+        start = time.perf_counter()
+        with multiprocessing.get_context('spawn').Pool(writers) as pool:
+            results = pool.starmap(_writer, args)
+        elapsed = time.perf_counter() - start
+        final = open_service(root, backend).snapshot()['commandes']
+        total = int(final.loc[final['ID_Commande'].isin(keys), 'Quantite'].sum())
+    commits = sum(r[0] for r in results)
+    return {
+        'writers': writers,
+        'updates': updates,
+        'rows': rows,
+        'check': check,
+        'commits': commits,
+        'conflicts': sum(r[1] for r in results),
+        'lost_updates': commits - (total - initial),
+        'seconds': elapsed,
+        'commits_per_second': commits / elapsed,
+    }
+
+
+def format_contention(report):
+    mode = "contrôle optimiste" if report['check'] else "sans contrôle"
+    return '\n'.join([
+        f"{report['writers']} rédacteurs × {report['updates']} mises à jour sur {report['rows']} lignes ({mode})",
+        f"    commits              {report['commits']:>8,}   ({report['commits_per_second']:.0f}/s)",
+        f"    conflits rejoués     {report['conflicts']:>8,}",
+        f"    mises à jour perdues {report['lost_updates']:>8,}",
+    ])
+
+
+def load_baseline(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_baseline(report, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def format_report(report):
+    lines = []
+    for scale, benches in report['results'].items():
+        lines.append(f"{int(scale):>10,} commandes")
+        for name, stats in benches.items():
+            lines.append(f"    {name:<24} médiane {stats['median'] * 1000:10.2f} ms   min {stats['min'] * 1000:10.2f} ms")
+    return '\n'.join(lines)
@@ -0,0 +1,128 @@
+"""Analyse des commandes d'un acheteur : commandes groupées par acheteur une fois par version, lues par tranche"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+# Mois calendaires, jusqu'au mois en cours inclus, pris en compte pour le rythme de consommation du budget
+BURN_MONTHS = 3
+TIMELINE_COLUMNS = ['ID_Commande', 'Date_Commande', 'Nom_Fournisseur', 'Produit', 'Quantite',
+                    'Prix_Unitaire', 'Montant_Total', 'Economie', 'Statut', 'Date_Livraison_Reelle']
+
+
+@dataclass(frozen=True)
+class BuyerActivity:
+    """Commandes d'un acheteur et leurs agrégats"""
+    commandes: pd.DataFrame
+    par_fournisseur: pd.DataFrame
+    par_produit: pd.DataFrame
+    mensuel: pd.DataFrame
+    depense: float
+    economies: float
+    rythme_mensuel: float
+
+
+class BuyerOrders:
+    """Positions des commandes triées par (acheteur, date), avec la jointure fournisseurs et prix de référence
+
+    Construit une fois par version des commandes et des fournisseurs : tri, positions des
+    fournisseurs et prix de référence de chaque ligne. Les commandes d'un acheteur forment
+    alors une tranche contiguë, bornée par ses deux positions ; une requête coûte
+    O(commandes de l'acheteur), sans parcourir la table.
+    """
+
+    def __init__(self, commandes, fournisseurs, supplier_index):
+        self.commandes = commandes
+        self.fournisseurs = fournisseurs
+        codes, self.buyers = pd.factorize(commandes['ID_Acheteur'], sort=True)
+        self.buyers = pd.Index(self.buyers)
+        dates = commandes['Date_Commande'].to_numpy(dtype='datetime64[ns]').astype('int64')
+        # Acheteurs inconnus écartés ; dans chaque tranche, ordre chronologique (dates manquantes en tête)
+        order = np.lexsort((dates, codes))
+        order = order[codes[order] >= 0]
+        self.order = order
+        self.bounds = np.searchsorted(codes[order], np.arange(len(self.buyers) + 1))
+        # Jointures par codes : une recherche par fournisseur et par produit distincts, pas par ligne
+        supplier_codes, supplier_ids = pd.factorize(commandes['ID_Fournisseur'])
+        supplier_positions = np.append(supplier_index.positions(supplier_ids), -1)
+        self.suppliers = supplier_positions[supplier_codes[order]]
+        # Prix unitaire moyen pondéré de chaque produit, tous acheteurs confondus : base des économies
+        product_codes, products = pd.factorize(commandes['Produit'])
+        quantite = commandes['Quantite'].to_numpy(dtype='float64')
+        prix = commandes['Prix_Unitaire'].to_numpy(dtype='float64')
+        valid = ~(np.isnan(quantite) | np.isnan(prix)) & (quantite > 0) & (product_codes >= 0)
+        valeur = np.bincount(product_codes[valid], weights=(quantite * prix)[valid], minlength=len(products))
+        volume = np.bincount(product_codes[valid], weights=quantite[valid], minlength=len(products))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            reference = np.append(np.where(volume > 0, valeur / volume, np.nan), np.nan)
+        self.reference = reference[product_codes[order]]
+
+    def positions(self, buyer):
+        """Tranche du tableau trié correspondant à l'acheteur (vide s'il n'a pas de commande)"""
+        code = self.buyers.get_indexer([str(buyer)])[0]
+        if code < 0:
+            return slice(0, 0)
+        return slice(self.bounds[code], self.bounds[code + 1])
+
+    def orders(self, buyer):
+        """Commandes de l'acheteur, par date croissante, avec le fournisseur et l'économie réalisée
+
+        Economie : (prix de référence du produit - prix payé) × quantité ; négative si payé plus cher.
+        """
+        span = self.positions(buyer)
+        columns = [column for column in self.commandes.columns if column in TIMELINE_COLUMNS or column == 'ID_Fournisseur']
+        rows = self.commandes[columns].take(self.order[span]).reset_index(drop=True)
+        suppliers = self.suppliers[span]
+        names = rows['ID_Fournisseur'].to_numpy(dtype=object)
+        known = suppliers >= 0
+        # Fournisseur supprimé depuis : son identifiant tient lieu de nom
+        names[known] = self.fournisseurs['Nom_Fournisseur'].to_numpy(dtype=object)[suppliers[known]]
+        rows['Nom_Fournisseur'] = names
+        economie = (self.reference[span] - rows['Prix_Unitaire'].to_numpy(dtype='float64')) * rows['Quantite'].to_numpy(dtype='float64')
+        rows['Economie'] = np.nan_to_num(economie).round(2)
+        return rows
+
+    def activity(self, buyer, today=None):
+        """Commandes, dépense par fournisseur et produit, consommation mensuelle et rythme récent
+
+        Rythme : dépense des BURN_MONTHS derniers mois calendaires (mois en cours inclus, mois
+        sans commande comptés à zéro) divisée par BURN_MONTHS ; nul si l'acheteur ne commande plus.
+        """
+        rows = self.orders(buyer)
+        montant = rows['Montant_Total'].fillna(0.0)
+        rows = rows.assign(Montant_Total=montant)
+
+        def spend(by):
+            out = rows.groupby(by, observed=True, dropna=False).agg(
+                Montant=('Montant_Total', 'sum'), Nb_Commandes=('ID_Commande', 'size'), Economies=('Economie', 'sum'))
+            total = out['Montant'].sum()
+            out['Part'] = (100 * out['Montant'] / total).round(1) if total else 0.0
+            return out.sort_values('Montant', ascending=False).round(2)
+
+        # Par identifiant : deux fournisseurs homonymes restent distincts ; le nom est ajouté pour l'affichage
+        par_fournisseur = spend('ID_Fournisseur')
+        par_fournisseur.insert(0, 'Nom_Fournisseur',
+                               rows.groupby('ID_Fournisseur')['Nom_Fournisseur'].first().reindex(par_fournisseur.index))
+
+        dated = rows[rows['Date_Commande'].notna()]
+        monthly = dated.groupby(dated['Date_Commande'].dt.to_period('M')).agg(
+            Montant=('Montant_Total', 'sum'), Nb_Commandes=('ID_Commande', 'size'), Economies=('Economie', 'sum'))
+        if len(monthly):
+            # Mois sans commande inclus : le cumul et le rythme comptent en mois calendaires
+            monthly = monthly.reindex(pd.period_range(monthly.index.min(), monthly.index.max(), freq='M', name='Mois'),
+                                      fill_value=0)
+        monthly = monthly.rename_axis('Mois')
+        monthly['Montant_Cumule'] = monthly['Montant'].cumsum()
+        monthly['Economies_Cumulees'] = monthly['Economies'].cumsum()
+        current = pd.Timestamp(today or pd.Timestamp.now()).to_period('M')
+        recent = dated['Date_Commande'].dt.to_period('M') > current - BURN_MONTHS
+        recent &= dated['Date_Commande'].dt.to_period('M') <= current
+        return BuyerActivity(
+            commandes=rows.iloc[::-1][TIMELINE_COLUMNS].reset_index(drop=True),
+            par_fournisseur=par_fournisseur,
+            par_produit=spend('Produit'),
+            mensuel=monthly.round(2),
+            depense=float(montant.sum()),
+            economies=float(rows['Economie'].sum()),
+            rythme_mensuel=float(dated.loc[recent, 'Montant_Total'].sum()) / BURN_MONTHS,
+        )
@@ -0,0 +1,56 @@
+"""Cache LRU des résultats dérivés, indexé par la version des tables sources"""
+import functools
+import threading
+from collections import OrderedDict
+
+
+class DerivedCache:
+    """Cache borné : une entrée reste valide tant que ses tables sources n'ont pas changé"""
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_or_compute(self, key, tables, compute):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][1]
+        value = compute()
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = (tables, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, table=None):
+        """Supprimer les entrées dépendant d'une table (ou tout le cache)"""
+        with self._lock:
+            if table is None:
+                self._entries.clear()
+                return
+            for key in [k for k, (tables, _) in self._entries.items() if table in tables]:
+                del self._entries[key]
+
+    def cached(self, *tables):
+        """Décorateur pour fn(snapshot, *args) dépendant uniquement des tables indiquées"""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(snapshot, *args):
+                versions = tuple(snapshot.versions[table] for table in tables)
+                key = (fn.__module__, fn.__qualname__, args, versions)
+                return self.get_or_compute(key, tables, lambda: fn(snapshot, *args))
+            return wrapper
+        return decorator
+
+
+derived_cache = DerivedCache()
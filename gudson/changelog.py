@@ -0,0 +1,248 @@
+"""Historique des valeurs : deltas champ par champ de chaque commit et photos périodiques des tables"""
+import json
+import math
+import os
+import re
+import threading
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from .journal import _json_default, replay, to_records
+from .schema import TABLES, coerce
+from .storage import Storage, atomic_write
+
+# Taille du segment ouvert (JSONL) au-delà de laquelle il est scellé en Arrow
+SEGMENT_BYTES = 1 << 20
+# Segments scellés entre deux photos complètes : borne le nombre de deltas à rejouer
+PHOTO_EVERY = 8
+
+DELTA_SCHEMA = pa.schema([
+    ('ts', pa.timestamp('ns')),
+    ('op', pa.dictionary(pa.int8(), pa.string())),
+    ('key', pa.string()),
+    ('field', pa.dictionary(pa.int32(), pa.string())),
+    ('old', pa.string()),
+    ('new', pa.string()),
+])
+DELTA_COLUMNS = DELTA_SCHEMA.names
+
+_PHOTO = re.compile(r'^photo-(\d+)\.arrow$')
+_SEGMENT = re.compile(r'^deltas-(\d+)-(\d+)\.arrow$')
+
+
+def _dump(value):
+    return json.dumps(value, ensure_ascii=False, default=_json_default)
+
+
+def _load(value):
+    """Valeur d'un delta ; un champ vidé est enregistré "null" (absent dans les anciens deltas)"""
+    return None if value is None or (isinstance(value, float) and math.isnan(value)) else json.loads(value)
+
+
+def deltas(schema, before, entry):
+    """Deltas d'une entrée de journal : 'i' ligne créée, 'u' un champ modifié, 'd' ligne supprimée
+
+    before : {clé: enregistrement avant le commit (None si absent)}, au format to_records.
+    Une création ou une suppression garde l'enregistrement complet (JSON) dans new ou old.
+    """
+    key = schema.key
+    current = dict(before)
+    rows = []
+    for record in entry.get('upserts', []):
+        record_id = record[key]
+        old = current.get(record_id)
+        if old is None:
+            rows.append(('i', record_id, '', None, _dump(record)))
+        else:
+            for field in schema.names:
+                old_value, new_value = _dump(old.get(field)), _dump(record.get(field))
+                if old_value != new_value:
+                    rows.append(('u', record_id, field, old_value, new_value))
+        current[record_id] = record
+    for record_id in entry.get('deletes', []):
+        if current.get(record_id) is not None:
+            rows.append(('d', record_id, '', _dump(current[record_id]), None))
+            current[record_id] = None
+    return rows
+
+
+class ChangeLog:
+    """Deltas et photos d'une table par répertoire : data/changes/<table>/
+
+    Les deltas sont ajoutés sous le verrou d'écriture de la table (ordre des commits
+    entre processus) dans un segment JSONL, scellé en Arrow colonnaire au-delà de
+    SEGMENT_BYTES. Une photo complète de la table est écrite tous les PHOTO_EVERY
+    segments : l'état à une date se reconstruit depuis la dernière photo antérieure,
+    en rejouant au plus PHOTO_EVERY segments, quelle que soit la longueur de l'historique.
+    """
+
+    def __init__(self, root, segment_bytes=SEGMENT_BYTES, photo_every=PHOTO_EVERY):
+        self.root = root
+        self.segment_bytes = segment_bytes
+        self.photo_every = photo_every
+        self._last_stamp = 0
+        self._baselines = set()
+        self._lock = threading.Lock()
+
+    def _dir(self, table):
+        path = os.path.join(self.root, table)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def _open_path(self, table):
+        return os.path.join(self._dir(table), 'open.jsonl')
+
+    def stamp(self):
+        """Horodatage (ns, heure locale comme l'historique), strictement croissant dans le processus"""
+        with self._lock:
+            self._last_stamp = max(pd.Timestamp.now().value, self._last_stamp + 1)
+            return self._last_stamp
+
+    def photos(self, table):
+        names = (_PHOTO.match(name) for name in os.listdir(self._dir(table)))
+        return sorted(int(m.group(1)) for m in names if m)
+
+    def segments(self, table):
+        """Segments scellés : (premier horodatage, dernier horodatage), dans l'ordre"""
+        names = (_SEGMENT.match(name) for name in os.listdir(self._dir(table)))
+        return sorted((int(m.group(1)), int(m.group(2))) for m in names if m)
+
+    def has_baseline(self, table):
+        if table not in self._baselines and self.photos(table):
+            self._baselines.add(table)
+        return table in self._baselines
+
+    def photograph(self, table, df, stamp):
+        """Écrire l'état complet de la table à l'instant stamp"""
+        schema = TABLES[table]
+        arrow_table = pa.Table.from_pandas(coerce(df, schema), schema=schema.arrow_schema(), preserve_index=False)
+        path = os.path.join(self._dir(table), f"photo-{stamp}.arrow")
+        atomic_write(path, lambda p: feather.write_feather(arrow_table, p, compression='zstd'))
+        self._baselines.add(table)
+
+    def record(self, table, before, entry):
+        """Ajouter les deltas d'un commit (appelé sous le verrou d'écriture de la table)
+
+        Renvoie (horodatage, photo à prendre) : une photo est due quand PHOTO_EVERY segments
+        ont été scellés depuis la dernière.
+        """
+        rows = deltas(TABLES[table], before, entry)
+        if not rows:
+            return None, False
+        stamp = self.stamp()
+        lines = ''.join(json.dumps([stamp, *row], ensure_ascii=False) + '\n' for row in rows)
+        path = self._open_path(table)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.getsize(path) < self.segment_bytes:
+            return stamp, False
+        self._seal(table)
+        photos = self.photos(table)
+        since = [segment for segment in self.segments(table) if not photos or segment[0] > photos[-1]]
+        return stamp, len(since) >= self.photo_every
+
+    def _read_open(self, table):
+        path = self._open_path(table)
+        if not os.path.exists(path):
+            return pd.DataFrame(columns=DELTA_COLUMNS)
+        with open(path, 'r', encoding='utf-8') as f:
+            rows = [json.loads(line) for line in f if line.endswith('\n')]
+        df = pd.DataFrame(rows, columns=DELTA_COLUMNS)
+        df['ts'] = pd.to_datetime(df['ts'].astype('int64'), unit='ns')
+        return df
+
+    def _seal(self, table):
+        df = self._read_open(table)
+        if len(df):
+            arrow_table = pa.Table.from_pandas(df, schema=DELTA_SCHEMA, preserve_index=False)
+            first, last = df['ts'].iloc[0].value, df['ts'].iloc[-1].value
+            path = os.path.join(self._dir(table), f"deltas-{first}-{last}.arrow")
+            atomic_write(path, lambda p: feather.write_feather(arrow_table, p, compression='zstd'))
+        os.remove(self._open_path(table))
+
+    def read(self, table, after=None, until=None):
+        """Deltas d'horodatage dans ]after, until], dans l'ordre des commits (seuls les segments utiles sont lus)"""
+        frames = []
+        for first, last in self.segments(table):
+            if (after is not None and last <= after) or (until is not None and first > until):
+                continue
+            path = os.path.join(self._dir(table), f"deltas-{first}-{last}.arrow")
+            frames.append(feather.read_table(path).to_pandas())
+        frames.append(self._read_open(table))
+        frames = [frame for frame in frames if len(frame)]
+        if not frames:
+            return pd.DataFrame(columns=DELTA_COLUMNS)
+        df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+        stamps = df['ts'].astype('int64')
+        keep = pd.Series(True, index=df.index)
+        if after is not None:
+            keep &= stamps > after
+        if until is not None:
+            keep &= stamps <= until
+        return df[keep].reset_index(drop=True)
+
+    def table_as_of(self, table, when):
+        """Table telle qu'elle était à la date when (dernière photo antérieure + deltas suivants)"""
+        schema = TABLES[table]
+        until = pd.Timestamp(when).value
+        photos = [stamp for stamp in self.photos(table) if stamp <= until]
+        if not photos:
+            raise ValueError(f"Aucun état de {table} enregistré avant le {pd.Timestamp(when)}")
+        path = os.path.join(self._dir(table), f"photo-{photos[-1]}.arrow")
+        df = coerce(feather.read_table(path).to_pandas(), schema)
+        changes = self.read(table, after=photos[-1], until=until)
+        if changes.empty:
+            return df
+        # État final des seules lignes touchées, puis un rejeu vectorisé sur la photo
+        touched = list(dict.fromkeys(changes['key']))
+        state = {record[schema.key]: record for record in to_records(df[df[schema.key].isin(touched)], schema)}
+        for op, key, field, new in changes[['op', 'key', 'field', 'new']].itertuples(index=False, name=None):
+            if op == 'i':
+                state[key] = _load(new)
+            elif op == 'd':
+                state[key] = None
+            elif state.get(key) is not None:
+                state[key] = {**state[key], field: _load(new)}
+        entry = {
+            'upserts': [state[key] for key in touched if state.get(key) is not None],
+            'deletes': [key for key in touched if state.get(key) is None],
+        }
+        return replay(df, [entry], schema)
+
+    def reset(self):
+        """Oublier tout l'historique des valeurs (données remplacées)"""
+        with self._lock:
+            self._baselines.clear()
+        if os.path.isdir(self.root):
+            for table in os.listdir(self.root):
+                directory = os.path.join(self.root, table)
+                for name in os.listdir(directory):
+                    os.remove(os.path.join(directory, name))
+
+
+class FrozenStorage(Storage):
+    """Tables reconstruites à une date, en lecture seule (calcul des KPI à cette date)"""
+
+    def __init__(self, root, tables):
+        self.root = root
+        self.tables = tables
+
+    def exists(self, table):
+        return table in self.tables
+
+    def version(self, table):
+        return (0,)
+
+    def load(self, table, columns=None):
+        df = self.tables[table]
+        return df if columns is None else df[columns]
+
+    def save(self, table, df):
+        raise PermissionError("Données reconstruites : lecture seule")
+
+    def commit(self, table, upserts=None, deletes=()):
+        raise PermissionError("Données reconstruites : lecture seule")
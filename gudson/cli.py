@@ -0,0 +1,256 @@
+"""Ligne de commande : KPI GUDSON en batch, sans serveur web
+
+    python -m gudson kpi fournisseurs --categorie Électronique --format csv -o fournisseurs.csv
+    python -m gudson kpi dashboard --as-of 2025-06-30T23:59:59
+    python -m gudson --root /tmp/gudson-1m generate --orders 1000000
+    python -m gudson bench --orders 1000 100000 --compare benchmarks/baseline.json
+    python -m gudson contention --writers 16 --updates 50
+    python -m gudson export commandes --format parquet --from 2025-01-01 -o commandes.parquet
+    python -m gudson import commandes commandes_erp.csv --user admin --dry-run
+    python -m gudson startup "app (1).py"
+    python -m gudson migrate
+    python -m gudson --backend sqlite aggregate commandes --by Statut --measure CA=sum:Montant_Total
+"""
+import argparse
+import dataclasses
+import json
+import os
+import sys
+from datetime import date
+
+import pandas as pd
+
+from .journal import _json_default
+
+# Tableau principal de chaque section, pour l'export CSV
+MAIN_TABLES = {
+    'dashboard': 'monthly',
+    'fournisseurs': 'fournisseurs',
+    'acheteurs': 'acheteurs',
+    'analytics': 'performance_pays',
+}
+
+
+def _plain(value):
+    """Convertir un résultat du service en structure sérialisable JSON"""
+    if isinstance(value, pd.DataFrame):
+        if value.index.name is not None or not pd.api.types.is_integer_dtype(value.index):
+            value = value.reset_index()
+        return json.loads(value.to_json(orient='records', date_format='iso', force_ascii=False))
+    if isinstance(value, pd.Series):
+        return json.loads(value.to_json(date_format='iso', force_ascii=False))
+    return value
+
+
+def compute(service, section, args):
+    snapshot = service.snapshot()
+    if section == 'dashboard':
+        return service.dashboard(snapshot)
+    if section == 'fournisseurs':
+        return service.suppliers(snapshot, categorie=args.categorie, pays=args.pays, statut=args.statut)
+    if section == 'acheteurs':
+        return service.buyers(snapshot)
+    return service.analytics(snapshot)
+
+
+def write_result(result, section, fmt, out):
+    if fmt == 'csv':
+        getattr(result, MAIN_TABLES[section]).to_csv(out, index=section == 'analytics')
+        return
+    payload = {field.name: _plain(getattr(result, field.name)) for field in dataclasses.fields(result)}
+    json.dump(payload, out, ensure_ascii=False, indent=2, default=_json_default)
+    out.write('\n')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='gudson', description="KPI GUDSON sans interface web")
+    parser.add_argument('--root', default='.', help="répertoire des données (CSV d'origine et data/)")
+    parser.add_argument('--backend', choices=('arrow', 'csv', 'sqlite'), help="moteur de stockage (défaut : GUDSON_STORAGE ou arrow)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    kpi = commands.add_parser('kpi', help="calculer les KPI d'une section")
+    kpi.add_argument('section', choices=sorted(MAIN_TABLES))
+    kpi.add_argument('--format', choices=('json', 'csv'), default='json')
+    kpi.add_argument('-o', '--output', help="fichier de sortie (défaut : sortie standard)")
+    kpi.add_argument('--categorie')
+    kpi.add_argument('--pays')
+    kpi.add_argument('--statut')
+    kpi.add_argument('--as-of', help="KPI à une date passée (ex. fin de trimestre : 2025-06-30T23:59:59)")
+
+    commands.add_parser('migrate', help="convertir les CSV en stockage Arrow (ou SQLite avec --backend sqlite)")
+
+    agg = commands.add_parser('aggregate', help="agrégat groupé (calculé en SQL avec --backend sqlite)")
+    agg.add_argument('table', choices=('fournisseurs', 'acheteurs', 'commandes'))
+    agg.add_argument('--by', nargs='*', default=[], help="colonnes de regroupement")
+    agg.add_argument('--measure', action='append', default=[], metavar='NOM=FONCTION:COLONNE',
+                     help="ex. CA=sum:Montant_Total (fonctions : count, sum, avg, min, max)")
+    agg.add_argument('--filter', action='append', default=[], metavar='COLONNE=VALEUR')
+    agg.add_argument('--from', dest='start', type=date.fromisoformat, help="début de la période (colonne de date de la table)")
+    agg.add_argument('--to', dest='end', type=date.fromisoformat, help="fin incluse")
+    agg.add_argument('-o', '--output', help="fichier CSV (défaut : sortie standard)")
+
+    gen = commands.add_parser('generate', help="écrire un jeu de données synthétique sous --root")
+    gen.add_argument('--orders', type=int, default=1000, help="nombre de commandes (1k à 10M)")
+    gen.add_argument('--seed', type=int, default=42)
+    gen.add_argument('--force', action='store_true', help="écraser les données déjà présentes sous --root")
+
+    bench = commands.add_parser('bench', help="mesurer les chemins de données sur des jeux synthétiques")
+    bench.add_argument('--orders', type=int, nargs='+', default=[1000, 10000, 100000])
+    bench.add_argument('--repeat', type=int, default=5)
+    bench.add_argument('--seed', type=int, default=42)
+    bench.add_argument('--only', nargs='+', help="restreindre à certains bancs")
+    bench.add_argument('-o', '--output', help="écrire le rapport JSON (nouvelle référence)")
+    bench.add_argument('--compare', help="rapport JSON de référence")
+    bench.add_argument('--tolerance', type=float, default=0.25, help="dégradation tolérée de la médiane")
+
+    contention = commands.add_parser('contention', help="banc d'écritures concurrentes (débit, conflits, pertes)")
+    contention.add_argument('--writers', type=int, default=8, help="nombre de processus rédacteurs")
+    contention.add_argument('--updates', type=int, default=50, help="mises à jour par rédacteur")
+    contention.add_argument('--rows', type=int, default=4, help="nombre de lignes disputées")
+    contention.add_argument('--orders', type=int, default=1000)
+    contention.add_argument('--no-check', action='store_true', help="sans contrôle optimiste (pour comparaison)")
+    contention.add_argument('--json', action='store_true', help="rapport JSON")
+
+    export = commands.add_parser('export', help="exporter une table filtrée (CSV, Parquet, XLSX)")
+    export.add_argument('table', choices=('fournisseurs', 'acheteurs', 'commandes'))
+    export.add_argument('--format', choices=('csv', 'parquet', 'xlsx'), default='csv')
+    export.add_argument('--compression', choices=('gzip', 'zstd'))
+    export.add_argument('--filter', action='append', default=[], metavar='COLONNE=VALEUR')
+    export.add_argument('--from', dest='start', type=date.fromisoformat, help="date de début (AAAA-MM-JJ)")
+    export.add_argument('--to', dest='end', type=date.fromisoformat, help="date de fin incluse")
+    export.add_argument('-o', '--output', help="fichier de sortie (défaut : nom daté dans le répertoire courant)")
+
+    imp = commands.add_parser('import', help="importer un lot CSV/XLSX après validation complète")
+    imp.add_argument('table', choices=('fournisseurs', 'acheteurs', 'commandes'))
+    imp.add_argument('file', help="fichier CSV ou XLSX")
+    imp.add_argument('--user', default='import', help="utilisateur inscrit dans l'historique")
+    imp.add_argument('--skip-invalid', action='store_true', help="importer les lignes valides et ignorer les autres")
+    imp.add_argument('--dry-run', action='store_true', help="valider sans rien écrire")
+
+    startup = commands.add_parser('startup', help="mesurer le démarrage à froid de la page de connexion")
+    startup.add_argument('app', help="script Streamlit de l'application")
+    startup.add_argument('--json', action='store_true', help="rapport JSON")
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'migrate':
+        from .storage import migrate_csv
+        target = None
+        if args.backend == 'sqlite':
+            from .sqlite import SqliteStorage
+            target = SqliteStorage(os.path.join(args.root, 'data'))
+        tables = migrate_csv(args.root, os.path.join(args.root, 'data'), overwrite=True, target=target)
+        print(f"✅ Tables migrées vers {'SQLite' if target else 'Arrow'}: {', '.join(tables) or 'aucune'}")
+        return 0
+
+    if args.command == 'generate':
+        from .synthetic import generate, write
+        if os.path.isdir(args.root) and os.listdir(args.root) and not args.force:
+            print(f"❌ {os.path.abspath(args.root)} n'est pas vide : choisir un --root vide (ex. "
+                  f"python -m gudson --root /tmp/gudson-1m generate) ou ajouter --force pour écraser ses données",
+                  file=sys.stderr)
+            return 1
+        tables = generate(args.orders, args.seed)
+        write(tables, args.root, args.backend or 'arrow')
+        print(f"✅ Jeu généré dans {args.root}: " + ', '.join(f"{t} {len(df):,}" for t, df in tables.items()))
+        return 0
+
+    if args.command == 'bench':
+        return run_bench(args)
+
+    if args.command == 'contention':
+        from .bench import contention, format_contention
+        report = contention(args.writers, args.updates, args.rows, args.orders,
+                            backend=args.backend or 'arrow', check=not args.no_check)
+        print(json.dumps(report, indent=2) if args.json else format_contention(report))
+        return 1 if report['check'] and report['lost_updates'] else 0
+
+    if args.command == 'startup':
+        from .startup import cold_start, format_report
+        report = cold_start(args.app)
+        print(json.dumps(report, indent=2) if args.json else format_report(report))
+        return 1 if report['exception'] or report['loaded'] else 0
+
+    from .service import open_service
+    service = open_service(args.root, args.backend)
+
+    if args.command == 'export':
+        filters = dict(item.split('=', 1) for item in args.filter)
+        result = service.export(service.snapshot(), args.table, args.format, args.compression, filters, args.start, args.end)
+        with open(args.output or result.file_name, 'wb') as f:
+            result.copy_to(f)
+        print(f"✅ {result.rows:,} lignes exportées dans {args.output or result.file_name}")
+        return 0
+    if args.command == 'import':
+        return run_import(service, args)
+    if args.command == 'aggregate':
+        return run_aggregate(service, args)
+    if args.as_of:
+        try:
+            service = service.as_of(args.as_of)
+        except ValueError as e:
+            print(f"❌ {e}", file=sys.stderr)
+            return 1
+    result = compute(service, args.section, args)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8', newline='') as f:
+            write_result(result, args.section, args.format, f)
+    else:
+        write_result(result, args.section, args.format, sys.stdout)
+    return 0
+
+
+def run_bench(args):
+    from . import bench
+
+    report = bench.run(args.orders, args.repeat, args.seed, args.backend or 'arrow', args.only)
+    print(bench.format_report(report))
+    if args.output:
+        bench.save_baseline(report, args.output)
+    if not args.compare:
+        return 0
+    regressions = bench.compare(report, bench.load_baseline(args.compare), args.tolerance)
+    for r in regressions:
+        if r['baseline'] is None:
+            print(f"❌ {r['benchmark']} ({r['orders']:,} commandes): absent de la référence, "
+                  f"la régénérer avec -o {args.compare}")
+            continue
+        print(f"❌ {r['benchmark']} ({r['orders']:,} commandes): "
+              f"{r['baseline'] * 1000:.2f} ms -> {r['current'] * 1000:.2f} ms (x{r['ratio']:.2f})")
+    return 1 if regressions else 0
+
+
+def run_import(service, args):
+    from .importer import read_upload
+
+    result = service.bulk_import(args.table, read_upload(args.file), args.user, os.path.basename(args.file),
+                                 skip_invalid=args.skip_invalid, dry_run=args.dry_run)
+    report = result.report
+    if report.ignored_columns:
+        print(f"ℹ️ Colonnes ignorées : {', '.join(report.ignored_columns)}")
+    if not report.valid:
+        print(report.errors.to_string(index=False))
+        print(f"❌ {report.invalid_lines:,} lignes invalides sur {report.total:,}")
+    if args.dry_run:
+        return 0 if report.valid else 1
+    if result.imported:
+        print(f"✅ {result.imported:,} lignes importées ({result.ids[0]} à {result.ids[-1]})")
+    else:
+        print("Aucune ligne importée")
+    return 0 if report.valid or (args.skip_invalid and result.imported) else 1
+
+
+def run_aggregate(service, args):
+    from .service import EXPORT_DATES
+
+    measures = {}
+    for item in args.measure:
+        name, spec = item.split('=', 1)
+        fn, _, col = spec.partition(':')
+        measures[name] = (fn, col or None)
+    where = dict(item.split('=', 1) for item in args.filter)
+    if args.start or args.end:
+        where[EXPORT_DATES[args.table]] = slice(args.start, args.end)
+    result = service.aggregate(args.table, args.by, measures or None, where)
+    result.to_csv(args.output or sys.stdout, index=False)
+    return 0
@@ -0,0 +1,168 @@
+"""Performance de livraison : ponctualité, distribution des retards et délais réels, maintenus incrémentalement"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from .rollups import Accumulator, changed_orders
+
+# Retard = livraison réelle - livraison prévue, en jours ; compté jour par jour dans
+# [RETARD_MIN, RETARD_MAX] (au-delà, borné) : les percentiles se lisent sur ces comptes additifs
+RETARD_MIN, RETARD_MAX = -30, 60
+BUCKETS = [f"J{day:+d}" for day in range(RETARD_MIN, RETARD_MAX + 1)]
+PERCENTILES = (50, 90, 95)
+# Livraisons minimales pour figurer au classement de ponctualité
+RANKING_MIN = 5
+
+
+def delivery_measures(commandes, by, histogram=True):
+    """Contributions additives des commandes livrées (dates prévue et réelle connues), groupées par by
+
+    by : colonnes de commandes, 'Mois' désignant le mois de livraison réelle.
+    """
+    reelle, prevue = commandes['Date_Livraison_Reelle'], commandes['Date_Livraison_Prevue']
+    livree = (reelle.notna() & prevue.notna()).to_numpy()
+    for column in by:
+        if column != 'Mois':
+            livree = livree & commandes[column].notna().to_numpy()
+    rows = commandes[livree]
+    reelle, prevue = rows['Date_Livraison_Reelle'], rows['Date_Livraison_Prevue']
+    keys = [reelle.dt.to_period('M') if column == 'Mois' else rows[column] for column in by]
+    # Codes de chaque clé combinés en un entier (pas de tuples) : groupes triés comme l'index de l'état
+    codes, uniques = zip(*(pd.factorize(key, sort=True) for key in keys))
+    combined = np.ravel_multi_index(codes, [len(values) for values in uniques]) if codes[0].size else codes[0]
+    present, codes = np.unique(combined, return_inverse=True)
+    positions = np.unravel_index(present, [len(values) for values in uniques])
+    if len(keys) == 1:
+        groups = pd.Index(uniques[0].take(positions[0]), name=by[0])
+    else:
+        groups = pd.MultiIndex.from_arrays([values.take(p) for values, p in zip(uniques, positions)], names=list(by))
+    size = len(groups)
+
+    retard = (reelle - prevue).dt.days.to_numpy(dtype='int64')
+    delai = (reelle - rows['Date_Commande']).dt.days.to_numpy(dtype='float64')
+    has_delai = ~np.isnan(delai)
+    columns = {
+        'Nb_Livrees': np.bincount(codes, minlength=size),
+        'Nb_A_Temps': np.bincount(codes, weights=retard <= 0, minlength=size),
+        'Somme_Retard': np.bincount(codes, weights=np.clip(retard, 0, None), minlength=size),
+        'Nb_Delais': np.bincount(codes, weights=has_delai, minlength=size),
+        'Somme_Delai': np.bincount(codes, weights=np.where(has_delai, delai, 0.0), minlength=size),
+    }
+    out = pd.DataFrame(columns, index=groups)
+    if histogram:
+        bucket = np.clip(retard, RETARD_MIN, RETARD_MAX) - RETARD_MIN
+        counts = np.bincount(codes * len(BUCKETS) + bucket, minlength=size * len(BUCKETS))
+        out = pd.concat([out, pd.DataFrame(counts.reshape(size, len(BUCKETS)), index=groups, columns=BUCKETS)], axis=1)
+    return out
+
+
+def percentiles(counts, q):
+    """Percentile q (rang le plus proche) de chaque ligne d'une matrice de comptes par jour de retard"""
+    cumulative = np.cumsum(counts, axis=1)
+    total = cumulative[:, -1]
+    rank = (cumulative < (q / 100 * total)[:, None]).sum(axis=1)
+    return np.where(total > 0, rank + RETARD_MIN, np.nan)
+
+
+def summarize(state):
+    """Indicateurs lisibles depuis des sommes additives : taux à l'heure, retards, délai réel"""
+    nb = state['Nb_Livrees'].to_numpy(dtype='float64')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out = pd.DataFrame({
+            'Nb_Livrees': nb.astype('int64'),
+            'Taux_A_Temps': np.where(nb > 0, 100 * state['Nb_A_Temps'] / nb, np.nan).round(1),
+            'Retard_Moyen': np.where(nb > 0, state['Somme_Retard'] / nb, np.nan).round(2),
+            'Delai_Reel_Moyen': np.where(state['Nb_Delais'] > 0, state['Somme_Delai'] / state['Nb_Delais'], np.nan).round(1),
+        }, index=state.index)
+    if set(BUCKETS) <= set(state.columns):
+        counts = state[BUCKETS].to_numpy()
+        for q in PERCENTILES:
+            out[f"Retard_P{q}"] = percentiles(counts, q)
+    return out
+
+
+class DeliveryEngine:
+    """Sommes de livraison par fournisseur (avec distribution des retards) et par fournisseur × mois
+
+    Catégories et pays sont des attributs fournisseur : leurs indicateurs s'obtiennent en
+    sommant les états des fournisseurs concernés, sans relire les commandes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._suppliers = None
+        self._months = None
+
+    def rebuild(self, commandes):
+        suppliers = Accumulator(delivery_measures(commandes, ('ID_Fournisseur',)), 'Nb_Livrees')
+        months = Accumulator(delivery_measures(commandes, ('ID_Fournisseur', 'Mois'), histogram=False), 'Nb_Livrees')
+        with self._lock:
+            self._suppliers, self._months = suppliers, months
+
+    def apply(self, old_rows, new_rows):
+        """Mise à jour delta : retirer les anciennes lignes, ajouter les nouvelles"""
+        with self._lock:
+            self._suppliers.apply(added=delivery_measures(new_rows, ('ID_Fournisseur',)),
+                                  removed=delivery_measures(old_rows, ('ID_Fournisseur',)))
+            self._months.apply(added=delivery_measures(new_rows, ('ID_Fournisseur', 'Mois'), histogram=False),
+                               removed=delivery_measures(old_rows, ('ID_Fournisseur', 'Mois'), histogram=False))
+
+    def on_commit(self, table, old, new, entry):
+        """Écouteur SharedData sur la table des commandes"""
+        if table != 'commandes':
+            return
+        if old is None or entry is None:
+            self.rebuild(new)
+        else:
+            self.apply(*changed_orders(old, new, entry))
+
+    def state(self, ids=None):
+        """Sommes par fournisseur (ids : fournisseurs retenus, None pour tous)"""
+        with self._lock:
+            state = self._suppliers.state
+        return state if ids is None else state[state.index.isin(ids)]
+
+    def suppliers(self, df_fournisseurs):
+        """Table fournisseurs avec ponctualité, retards et délai de livraison réels"""
+        stats = summarize(self.state()).reindex(df_fournisseurs['ID_Fournisseur'])
+        nb = stats['Nb_Livrees'].fillna(0).to_numpy().astype('int64')
+        return df_fournisseurs.assign(
+            # Sans livraison, le délai saisi à la création est conservé
+            Delai_Moyen_Livraison=df_fournisseurs['Delai_Moyen_Livraison'].where(nb == 0, stats['Delai_Reel_Moyen'].to_numpy()),
+            Nb_Livraisons=nb,
+            Taux_Livraison_A_Temps=stats['Taux_A_Temps'].to_numpy(),
+            Retard_Moyen=stats['Retard_Moyen'].to_numpy(),
+            Retard_P90=stats['Retard_P90'].to_numpy(),
+        )
+
+    def totals(self, ids=None):
+        """Indicateurs globaux des fournisseurs retenus"""
+        state = self.state(ids)
+        return summarize(state.sum().to_frame().T).iloc[0]
+
+    def distribution(self, ids=None):
+        """Nombre de livraisons par jour de retard (bornes incluant les valeurs au-delà)"""
+        counts = self.state(ids)[BUCKETS].sum()
+        counts.index = pd.RangeIndex(RETARD_MIN, RETARD_MAX + 1, name='Retard_Jours')
+        return counts.astype('int64')
+
+    def by_group(self, attribute, ids=None):
+        """Indicateurs par valeur d'un attribut fournisseur (Series ID_Fournisseur -> catégorie, pays...)"""
+        state = self.state(ids)
+        groups = attribute.reindex(state.index).to_numpy()
+        return summarize(state.groupby(groups).sum().rename_axis(attribute.name))
+
+    def by_month(self, ids=None):
+        """Indicateurs par mois de livraison réelle"""
+        with self._lock:
+            state = self._months.state
+        if ids is not None:
+            state = state[state.index.get_level_values('ID_Fournisseur').isin(ids)]
+        return summarize(state.groupby(level='Mois').sum())
+
+    def ranking(self, df_fournisseurs, n=10, minimum=RANKING_MIN):
+        """Fournisseurs les plus ponctuels (au moins minimum livraisons) : taux à l'heure, puis P90 et retard moyen"""
+        df = df_fournisseurs[df_fournisseurs['Nb_Livraisons'] >= minimum]
+        return df.sort_values(['Taux_Livraison_A_Temps', 'Retard_P90', 'Retard_Moyen'],
+                              ascending=[False, True, True], kind='stable').head(n)
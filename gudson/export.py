@@ -0,0 +1,205 @@
+"""Exports CSV, Parquet et XLSX écrits par blocs dans un fichier temporaire"""
+import io
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+FORMATS = ('csv', 'parquet', 'xlsx')
+COMPRESSIONS = (None, 'gzip', 'zstd')
+MIME_TYPES = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+EXTENSIONS = {'gzip': '.gz', 'zstd': '.zst'}
+COMPRESSED_MIME_TYPES = {'gzip': 'application/gzip', 'zstd': 'application/zstd'}
+CHUNK_ROWS = 50_000
+# Au-delà, le fichier temporaire passe de la mémoire au disque
+SPOOL_BYTES = 8 * 1024 * 1024
+XLSX_MAX_ROWS = 1_048_575
+
+
+@dataclass
+class Export:
+    """Fichier exporté (en mémoire s'il est petit, sinon sur disque)"""
+    file: tempfile.SpooledTemporaryFile
+    file_name: str
+    mime: str
+    rows: int
+    size: int
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def read(self):
+        with self._lock:
+            self.file.seek(0)
+            return self.file.read()
+
+    def copy_to(self, target):
+        """Recopier le fichier par blocs dans un autre fichier ouvert en binaire"""
+        with self._lock:
+            self.file.seek(0)
+            shutil.copyfileobj(self.file, target)
+
+    def close(self):
+        with self._lock:
+            self.file.close()
+
+
+class _KeepOpen(io.RawIOBase):
+    """Fermer le flux compressé sans fermer le fichier temporaire sous-jacent"""
+
+    def __init__(self, raw):
+        self.raw = raw
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        return self.raw.write(data)
+
+
+def _chunks(df, positions, chunk_rows):
+    if not len(df) or (positions is not None and not len(positions)):
+        # Aucune ligne : un bloc vide pour écrire au moins l'en-tête
+        yield df.iloc[:0]
+    elif positions is None:
+        for start in range(0, len(df), chunk_rows):
+            yield df.iloc[start:start + chunk_rows]
+    else:
+        for start in range(0, len(positions), chunk_rows):
+            yield df.take(positions[start:start + chunk_rows])
+
+
+def _write_csv(sink, chunks, compression):
+    stream = pa.CompressedOutputStream(_KeepOpen(sink), compression) if compression else sink
+    header = True
+    for chunk in chunks:
+        stream.write(chunk.to_csv(index=False, header=header).encode('utf-8'))
+        header = False
+    if compression:
+        stream.close()
+
+
+def parquet_schema(df, schema=None):
+    """Schéma Arrow de l'export : types du schéma de table, types inférés pour les colonnes calculées (KPI...)
+
+    Une colonne entière du schéma recalculée en décimal (délai de livraison réel moyen) garde son type inféré.
+    """
+    if schema is None:
+        return None
+    inferred = pa.Schema.from_pandas(df.head(0), preserve_index=False)
+    fields = []
+    for col in df.columns:
+        field = inferred.field(col)
+        if col in schema.types:
+            declared = schema.arrow_schema([col]).field(col)
+            if not (pa.types.is_integer(declared.type) and pa.types.is_floating(field.type)):
+                field = declared
+        fields.append(field)
+    return pa.schema(fields)
+
+
+def _write_parquet(sink, chunks, compression, schema):
+    writer = None
+    for chunk in chunks:
+        table = pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(_KeepOpen(sink), table.schema, compression=compression or 'snappy')
+        writer.write_table(table)
+    writer.close()
+
+
+def _write_xlsx(sink, chunks, sheet):
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet(sheet[:31])
+    header = True
+    for chunk in chunks:
+        if header:
+            worksheet.append(list(chunk.columns))
+            header = False
+        values = chunk.astype(object).where(chunk.notna(), None)
+        for row in values.itertuples(index=False, name=None):
+            worksheet.append(row)
+    workbook.save(sink)
+
+
+def export_file_name(name, fmt, compression=None):
+    if fmt == 'csv':
+        return f"{name}.csv{EXTENSIONS.get(compression, '')}"
+    return f"{name}.{fmt}"
+
+
+def mime_type(fmt, compression=None):
+    if fmt == 'csv' and compression:
+        return COMPRESSED_MIME_TYPES[compression]
+    return MIME_TYPES[fmt]
+
+
+def export_frame(df, fmt='csv', compression=None, positions=None, name='export', schema=None, chunk_rows=CHUNK_ROWS):
+    """Écrire les lignes retenues bloc par bloc, sans construire le fichier complet en mémoire"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Format d'export inconnu: {fmt}")
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Compression inconnue: {compression}")
+    rows = len(df) if positions is None else len(positions)
+    if fmt == 'xlsx' and rows > XLSX_MAX_ROWS:
+        raise ValueError(f"Trop de lignes pour un fichier Excel ({rows:,}) : utiliser CSV ou Parquet")
+    sink = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+    chunks = _chunks(df, positions, chunk_rows)
+    if fmt == 'csv':
+        _write_csv(sink, chunks, compression)
+    elif fmt == 'parquet':
+        _write_parquet(sink, chunks, compression, parquet_schema(df, schema))
+    else:
+        _write_xlsx(sink, chunks, name)
+    size = sink.tell()
+    sink.seek(0)
+    return Export(sink, export_file_name(name, fmt, compression), mime_type(fmt, compression), rows, size)
+
+
+def date_positions(series, start=None, end=None, positions=None):
+    """Positions dont la date est comprise entre start et end inclus (None = borne ouverte)"""
+    values = series.to_numpy() if positions is None else series.to_numpy()[positions]
+    mask = np.ones(len(values), dtype=bool)
+    if start is not None:
+        mask &= values >= np.datetime64(start)
+    if end is not None:
+        mask &= values < np.datetime64(end) + np.timedelta64(1, 'D')
+    selected = np.flatnonzero(mask)
+    return selected if positions is None else positions[selected]
+
+
+class ExportCache:
+    """Derniers exports produits, réutilisés tant que la version des données n'a pas changé"""
+
+    def __init__(self, maxsize=8):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_create(self, key, create):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        export = create()
+        with self._lock:
+            self._entries[key] = export
+            while len(self._entries) > self.maxsize:
+                _, evicted = self._entries.popitem(last=False)
+                evicted.close()
+        return export
+
+    def clear(self):
+        with self._lock:
+            entries, self._entries = self._entries, OrderedDict()
+        for export in entries.values():
+            export.close()
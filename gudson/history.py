@@ -0,0 +1,189 @@
+"""Requêtes sur l'historique d'audit : index par partition mensuelle, élagage des mois et pagination par curseur"""
+import json
+import os
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from .indexes import FilterIndex
+from .schema import HISTORIQUE, coerce
+from .storage import atomic_write, file_token
+
+# Colonnes indexées dans chaque partition (et résumées dans son fichier .keys.json une fois scellée)
+INDEXED = ('Utilisateur', 'Table_Modifiee', 'ID_Enregistrement')
+
+
+@dataclass(frozen=True)
+class HistoryPage:
+    """Lignes d'une page, des plus récentes aux plus anciennes, et curseur de la page suivante"""
+    rows: pd.DataFrame
+    cursor: str = None
+
+    @property
+    def has_more(self):
+        return self.cursor is not None
+
+
+def _sequence(ids):
+    """Numéro d'ordre des identifiants H0001... (départage les actions de même seconde)"""
+    return pd.to_numeric(ids.astype(str).str.extract(r'(\d+)', expand=False), errors='coerce').fillna(-1).astype('int64').to_numpy()
+
+
+def encode_cursor(date, sequence):
+    return f"{pd.Timestamp(date).strftime('%Y-%m-%dT%H:%M:%S')}|{int(sequence)}"
+
+
+def decode_cursor(cursor):
+    date, sequence = cursor.rsplit('|', 1)
+    return pd.Timestamp(date), int(sequence)
+
+
+class _Partition:
+    """Un mois d'historique trié du plus récent au plus ancien, avec ses index de filtrage"""
+
+    def __init__(self, df):
+        sequence = _sequence(df['ID_Historique'])
+        dates = df['Date_Action'].to_numpy(dtype='datetime64[ns]')
+        # Tri décroissant sur (date, numéro) ; les dates manquantes en dernier
+        order = np.lexsort((-sequence, -dates.astype('int64')))
+        order = np.concatenate([order[~np.isnat(dates[order])], order[np.isnat(dates[order])]])
+        self.df = df.take(order).reset_index(drop=True)
+        self.dates = dates[order]
+        self.sequence = sequence[order]
+        self.index = FilterIndex(self.df, INDEXED)
+
+    def keys(self):
+        return {column: [str(value) for value in self.index.options(column)] for column in INDEXED}
+
+    def positions(self, filters, start=None, end=None, cursor=None):
+        """Positions retenues, dans l'ordre décroissant des dates"""
+        positions = self.index.positions(**filters)
+        dates = self.dates[positions]
+        keep = ~np.isnat(dates) if (start is not None or end is not None or cursor is not None) else None
+        if start is not None:
+            keep &= dates >= np.datetime64(start, 'ns')
+        if end is not None:
+            keep &= dates <= np.datetime64(end, 'ns')
+        if cursor is not None:
+            date, sequence = np.datetime64(cursor[0], 'ns'), cursor[1]
+            keep &= (dates < date) | ((dates == date) & (self.sequence[positions] < sequence))
+        return positions if keep is None else positions[keep]
+
+
+class HistoryEngine:
+    """Requêtes « N dernières actions », par période et par enregistrement sur les segments mensuels du journal
+
+    Seuls les mois utiles sont lus : la période et le curseur bornent les mois parcourus,
+    le résumé des valeurs indexées d'un mois scellé permet de l'écarter sans le charger,
+    et le parcours s'arrête dès que la page est complète.
+    """
+
+    def __init__(self, audit):
+        self.audit = audit
+        self._partitions = {}
+        self._lock = threading.Lock()
+
+    def _keys_path(self, month):
+        return os.path.join(self.audit.root, f"{month}.keys.json")
+
+    def _sealed(self, month):
+        return not os.path.exists(self.audit._segment_path(month, 'jsonl'))
+
+    def _token(self, month):
+        return file_token(self.audit._segment_path(month, 'jsonl'), self.audit._segment_path(month, 'arrow'))
+
+    def partition(self, month):
+        """Partition d'un mois, rechargée seulement si son segment a changé"""
+        token = self._token(month)
+        with self._lock:
+            cached = self._partitions.get(month)
+        if cached is not None and cached[0] == token:
+            return cached[1]
+        partition = _Partition(self.audit.read_month(month))
+        with self._lock:
+            self._partitions[month] = (token, partition)
+        if self._sealed(month):
+            self._write_keys(month, partition, token)
+        return partition
+
+    def _write_keys(self, month, partition, token):
+        path = self._keys_path(month)
+        content = {'token': list(token[1]) if token[1] else None, 'keys': partition.keys()}
+        atomic_write(path, lambda p: _dump(p, content))
+
+    def _month_keys(self, month):
+        """Valeurs indexées présentes dans un mois scellé (None : inconnues, le mois doit être lu)"""
+        if not self._sealed(month):
+            return None
+        try:
+            with open(self._keys_path(month), 'r', encoding='utf-8') as f:
+                content = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        arrow_token = self._token(month)[1]
+        if content.get('token') != (list(arrow_token) if arrow_token else None):
+            return None
+        return content['keys']
+
+    def _months(self, filters, start, end, cursor):
+        """Mois à parcourir, du plus récent au plus ancien"""
+        low = None if start is None else pd.Timestamp(start).strftime('%Y-%m')
+        high = [pd.Timestamp(bound).strftime('%Y-%m') for bound in (end, cursor and cursor[0]) if bound is not None]
+        high = min(high) if high else None
+        for month in reversed(self.audit.months()):
+            if (low is not None and month < low) or (high is not None and month > high):
+                continue
+            keys = self._month_keys(month) if filters else None
+            if keys is not None and any(str(value) not in keys[column] for column, value in filters.items()):
+                continue
+            yield month
+
+    def query(self, utilisateur=None, table=None, record_id=None, start=None, end=None, limit=50, cursor=None):
+        """Actions filtrées, des plus récentes aux plus anciennes, par pages de limit lignes
+
+        cursor : curseur renvoyé par la page précédente (None pour la première page).
+        """
+        self.audit.flush()
+        filters = {column: value for column, value in zip(INDEXED, (utilisateur, table, record_id)) if value is not None}
+        position = None if cursor is None else decode_cursor(cursor)
+        frames, found = [], 0
+        for month in self._months(filters, start, end, position):
+            partition = self.partition(month)
+            positions = partition.positions(filters, start, end, position)[:limit - found + 1]
+            if len(positions):
+                frames.append(partition.df.take(positions))
+                found += len(positions)
+            if found > limit:
+                break
+        if not frames:
+            return HistoryPage(coerce(pd.DataFrame(columns=HISTORIQUE.names), HISTORIQUE))
+        rows = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0].reset_index(drop=True)
+        if found <= limit:
+            return HistoryPage(rows)
+        # Une ligne de plus que demandé : il reste des pages, le curseur pointe sur la dernière ligne servie
+        rows = rows.iloc[:limit]
+        last = rows.iloc[-1:]
+        return HistoryPage(rows, encode_cursor(last['Date_Action'].iloc[0], _sequence(last['ID_Historique'])[0]))
+
+    def latest(self, n=20, **filters):
+        """Les n actions les plus récentes"""
+        return self.query(limit=n, **filters).rows
+
+    def record(self, table, record_id, limit=1000):
+        """Historique d'un enregistrement, du plus récent au plus ancien"""
+        return self.query(table=table, record_id=record_id, limit=limit).rows
+
+    def options(self, column):
+        """Valeurs présentes d'une colonne indexée, tous mois confondus"""
+        values = set()
+        for month in self.audit.months():
+            keys = self._month_keys(month)
+            values.update(keys[column] if keys is not None else self.partition(month).keys()[column])
+        return sorted(values)
+
+
+def _dump(path, content):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(content, f, ensure_ascii=False)
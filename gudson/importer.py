@@ -0,0 +1,189 @@
+"""Import en masse (CSV/XLSX) avec validation vectorisée de tout le lot"""
+import os
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from .schema import TABLES, coerce
+
+# Colonnes obligatoires dans le fichier importé (l'identifiant est toujours attribué à l'import)
+REQUIRED = {
+    'fournisseurs': ('Nom_Fournisseur', 'Categorie', 'Pays'),
+    'acheteurs': ('Nom_Acheteur', 'Email', 'Departement', 'Specialite', 'Budget_Alloue'),
+    'commandes': ('ID_Fournisseur', 'ID_Acheteur', 'Date_Commande', 'Date_Livraison_Prevue',
+                  'Produit', 'Quantite', 'Prix_Unitaire', 'Statut'),
+}
+
+# Valeurs par défaut des colonnes facultatives (mêmes valeurs que les formulaires d'ajout)
+DEFAULTS = {
+    'fournisseurs': {
+        'Score_Qualite': 8.0, 'Delai_Moyen_Livraison': 7, 'Taux_Conformite': 95.0,
+        'Prix_Moyen_Commande': 0.0, 'Nombre_Commandes': 0, 'CA_Total': 0.0,
+        'Statut': 'En_Evaluation', 'Note_Performance': 8.0, 'Certification_ISO': 'Non',
+        'Delai_Paiement': 30,
+    },
+    'acheteurs': {
+        'Budget_Utilise': 0.0, 'Nombre_Commandes': 0, 'Valeur_Commandes': 0.0,
+        'Economies_Realisees': 0.0, 'Taux_Economie': 0.0, 'Delai_Moyen_Traitement': 5,
+        'Score_Performance': 8.0, 'Objectif_Economies': 0.0, 'Statut': 'Actif',
+        'Certification': 'Aucune', 'Nombre_Fournisseurs_Geres': 0, 'Note_Manager': 8.0,
+    },
+    # Commentaires et Conforme restent vides (None) : pas de valeur implicite
+    'commandes': {},
+}
+
+# Colonne de date renseignée à la date du jour si absente
+CREATION_DATES = {'fournisseurs': 'Date_Creation', 'acheteurs': 'Date_Embauche'}
+
+# Valeurs autorisées des colonnes à domaine fermé
+ALLOWED = {
+    'fournisseurs': {
+        'Statut': ('Actif', 'En_Evaluation', 'Suspendu'),
+        'Certification_ISO': ('Oui', 'Non'),
+    },
+    'acheteurs': {
+        'Statut': ('Actif', 'En Formation', 'Senior'),
+        'Certification': ('CIPS', 'CDAF', 'Aucune'),
+    },
+    'commandes': {
+        'Statut': ('Livrée', 'En_Cours', 'Retard', 'Annulée'),
+        'Conforme': ('Oui', 'Non'),
+    },
+}
+
+# Écart toléré entre Montant_Total et Quantite × Prix_Unitaire (arrondis de l'ERP)
+AMOUNT_TOLERANCE = 0.01
+
+
+@dataclass
+class ImportReport:
+    """Résultat de la validation d'un lot : lignes prêtes à insérer et erreurs par ligne"""
+    table: str
+    rows: pd.DataFrame
+    errors: pd.DataFrame
+    total: int
+    ignored_columns: list = field(default_factory=list)
+
+    @property
+    def valid(self):
+        return self.errors.empty
+
+    @property
+    def invalid_lines(self):
+        return self.errors['Ligne'].nunique() if len(self.errors) else 0
+
+
+def read_upload(file, file_name=None):
+    """Lire un fichier CSV ou XLSX en texte brut (les types sont validés ensuite)"""
+    file_name = file_name or getattr(file, 'name', '') or str(file)
+    if os.path.splitext(file_name)[1].lower() in ('.xlsx', '.xlsm'):
+        return pd.read_excel(file, dtype=str, engine='openpyxl')
+    return pd.read_csv(file, dtype=str, keep_default_na=False, na_values=[''], sep=None, engine='python')
+
+
+def _blank(series):
+    return series.isna() | (series.astype(str).str.strip() == '')
+
+
+class _Checks:
+    """Accumulateur d'erreurs : une condition vectorisée par contrôle"""
+
+    def __init__(self, index):
+        self.index = index
+        self.frames = []
+
+    def add(self, mask, column, message):
+        # Les comparaisons sur valeurs manquantes (NA) ne sont pas des erreurs
+        mask = np.asarray(pd.Series(mask).fillna(False), dtype=bool)
+        if mask.any():
+            lines = self.index[mask]
+            self.frames.append(pd.DataFrame({'Ligne': lines, 'Colonne': column, 'Erreur': message}))
+
+    def add_header(self, column, message):
+        """Erreur sur l'en-tête du fichier (ligne 1)"""
+        self.frames.append(pd.DataFrame({'Ligne': [1], 'Colonne': [column], 'Erreur': [message]}))
+
+    def result(self):
+        if not self.frames:
+            return pd.DataFrame(columns=['Ligne', 'Colonne', 'Erreur'])
+        return pd.concat(self.frames, ignore_index=True).sort_values(['Ligne', 'Colonne'], ignore_index=True)
+
+
+def validate(table, raw, snapshot, today=None):
+    """Valider tout un lot : colonnes, types, dates, clés étrangères, cohérence des montants"""
+    schema = TABLES[table]
+    types = schema.types
+    raw = raw.rename(columns=lambda col: str(col).strip())
+    ignored = [col for col in raw.columns if col not in types or col == schema.key]
+    df = raw.drop(columns=ignored).reset_index(drop=True).astype('string')
+    # Numéro de ligne dans le fichier (en-tête = ligne 1)
+    checks = _Checks(np.arange(len(df)) + 2)
+
+    missing = [col for col in REQUIRED[table] if col not in df.columns]
+    if missing:
+        checks.add_header(', '.join(missing), "Colonne obligatoire absente")
+        return ImportReport(table, df.iloc[:0], checks.result(), len(df), ignored)
+
+    for col in REQUIRED[table]:
+        checks.add(_blank(df[col]), col, "Valeur obligatoire manquante")
+
+    typed = pd.DataFrame(index=df.index)
+    for col, kind in schema.columns:
+        if col == schema.key or col not in df.columns:
+            continue
+        values = df[col]
+        blank = _blank(values)
+        if kind in ('int', 'float'):
+            parsed = pd.to_numeric(values.str.replace(',', '.', regex=False).str.strip(), errors='coerce').astype('float64')
+            checks.add(parsed.isna() & ~blank, col, "Nombre invalide")
+            if kind == 'int':
+                checks.add(parsed.notna() & (parsed != parsed.round()), col, "Nombre entier attendu")
+        elif kind in ('date', 'datetime'):
+            parsed = pd.to_datetime(values.str.strip(), format='ISO8601', errors='coerce')
+            checks.add(parsed.isna() & ~blank, col, "Date invalide (AAAA-MM-JJ attendu)")
+        else:
+            parsed = values.str.strip().where(~blank)
+        typed[col] = parsed
+
+    for col, allowed in ALLOWED[table].items():
+        if col in typed:
+            checks.add(typed[col].notna() & ~typed[col].isin(allowed), col, f"Valeur hors liste ({', '.join(allowed)})")
+
+    if table == 'commandes':
+        for col, parent in (('ID_Fournisseur', 'fournisseurs'), ('ID_Acheteur', 'acheteurs')):
+            known = snapshot[parent][TABLES[parent].key]
+            checks.add(typed[col].notna() & ~typed[col].isin(known), col, f"Identifiant inconnu dans {parent}")
+        checks.add(typed['Quantite'] <= 0, 'Quantite', "Quantité strictement positive attendue")
+        checks.add(typed['Prix_Unitaire'] < 0, 'Prix_Unitaire', "Prix négatif")
+        checks.add(typed['Date_Livraison_Prevue'] < typed['Date_Commande'], 'Date_Livraison_Prevue',
+                   "Livraison prévue avant la date de commande")
+        if 'Date_Livraison_Reelle' in typed:
+            checks.add(typed['Date_Livraison_Reelle'] < typed['Date_Commande'], 'Date_Livraison_Reelle',
+                       "Livraison réelle avant la date de commande")
+        expected = (typed['Quantite'] * typed['Prix_Unitaire']).round(2)
+        if 'Montant_Total' in typed:
+            gap = (typed['Montant_Total'] - expected).abs()
+            checks.add(gap > AMOUNT_TOLERANCE, 'Montant_Total', "Montant_Total différent de Quantite × Prix_Unitaire")
+            typed['Montant_Total'] = typed['Montant_Total'].fillna(expected)
+        else:
+            typed['Montant_Total'] = expected
+        if 'Note_Qualite' in typed:
+            checks.add((typed['Note_Qualite'] < 0) | (typed['Note_Qualite'] > 10), 'Note_Qualite', "Note entre 0 et 10 attendue")
+
+    for col, value in DEFAULTS[table].items():
+        typed[col] = typed[col].fillna(value) if col in typed else value
+    if table in CREATION_DATES:
+        col = CREATION_DATES[table]
+        today = pd.Timestamp(today or pd.Timestamp.now()).normalize()
+        typed[col] = typed[col].fillna(today) if col in typed else today
+
+    rows = typed.reindex(columns=[col for col in schema.names if col != schema.key])
+    return ImportReport(table, rows, checks.result(), len(df), ignored)
+
+
+def assign_ids(rows, schema, ids):
+    """Insérer les identifiants attribués en tête du lot et typer selon le schéma"""
+    rows = rows.copy()
+    rows.insert(0, schema.key, list(ids))
+    return coerce(rows, schema)
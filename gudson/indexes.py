@@ -0,0 +1,174 @@
+"""Index de filtrage par valeur et de tri, pagination côté serveur"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+
+class ValueIndex:
+    """Codes d'une colonne et positions (triées) des lignes pour chaque valeur présente"""
+
+    def __init__(self, series):
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            codes = series.cat.codes.to_numpy()
+            categories = series.cat.categories
+        else:
+            codes, categories = pd.factorize(series, sort=True)
+        order = np.argsort(codes, kind='stable')
+        counts = np.bincount(codes[codes >= 0], minlength=len(categories))
+        bounds = np.cumsum(counts)
+        # Les valeurs manquantes (code -1) sont en tête après le tri
+        start = int((codes < 0).sum())
+        self.codes = codes
+        self.positions = {}
+        for code, value in enumerate(categories):
+            if counts[code]:
+                self.positions[value] = order[start + bounds[code] - counts[code]:start + bounds[code]]
+        self._code_of = {value: code for code, value in enumerate(categories)}
+
+    @property
+    def values(self):
+        """Valeurs présentes, dans l'ordre des catégories"""
+        return list(self.positions)
+
+    def matches(self, value, positions):
+        """Sous-ensemble de positions dont la valeur vaut value"""
+        code = self._code_of.get(value, -2)
+        return positions[self.codes[positions] == code]
+
+
+class FilterIndex:
+    """Résolution de filtres d'égalité combinés par intersection d'index, sans copier la table"""
+
+    def __init__(self, df, columns):
+        self.size = len(df)
+        self.indexes = {col: ValueIndex(df[col]) for col in columns}
+
+    def options(self, column):
+        return self.indexes[column].values
+
+    def positions(self, **filters):
+        """Positions des lignes vérifiant tous les filtres (None = pas de filtre)"""
+        active = {col: value for col, value in filters.items() if value is not None}
+        if not active:
+            return np.arange(self.size)
+        empty = np.array([], dtype=np.intp)
+        # Partir de la valeur la plus sélective puis vérifier les autres colonnes par leurs codes
+        candidates = {col: self.indexes[col].positions.get(value, empty) for col, value in active.items()}
+        first = min(candidates, key=lambda col: len(candidates[col]))
+        positions = candidates[first]
+        for col, value in active.items():
+            if col != first:
+                positions = self.indexes[col].matches(value, positions)
+        return positions
+
+    def select(self, df, **filters):
+        """Lignes filtrées ; la table elle-même si aucun filtre n'est actif"""
+        if all(value is None for value in filters.values()):
+            return df
+        return df.take(self.positions(**filters))
+
+
+class KeyIndex:
+    """Position de chaque ligne par clé primaire (table de hachage), reportée d'une version à l'autre si possible"""
+
+    def __init__(self, keys):
+        self.keys = pd.Index(keys)
+
+    def __contains__(self, key):
+        return key in self.keys
+
+    def positions(self, keys):
+        """Positions des clés demandées (-1 si absente)"""
+        return self.keys.get_indexer(pd.Index(list(keys)))
+
+    def position(self, key):
+        return int(self.positions([key])[0])
+
+    def after(self, entry, key, size):
+        """Index de la version suivante : inchangé après des mises à jour, prolongé après des ajouts
+
+        None après une suppression (positions décalées) : l'index sera reconstruit au premier usage.
+        """
+        if entry.get('deletes'):
+            return None
+        added = [k for k in dict.fromkeys(record[key] for record in entry.get('upserts', [])) if k not in self.keys]
+        if len(self.keys) + len(added) != size:
+            return None
+        if not added:
+            return self
+        return KeyIndex(self.keys.append(pd.Index(added)))
+
+
+class SortIndex:
+    """Ordres de tri précalculés par colonne (valeurs manquantes en fin), pour paginer sans trier la table"""
+
+    def __init__(self, df, columns):
+        self.df = df
+        self.columns = tuple(columns)
+        self._orders = {}
+        self._ranks = {}
+
+    def order(self, column, ascending=True):
+        """Positions de toutes les lignes dans l'ordre de tri (calculé au premier usage)"""
+        key = (column, ascending)
+        if key not in self._orders:
+            if column not in self.columns:
+                raise KeyError(f"Colonne non triable: {column}")
+            values = self.df[column].reset_index(drop=True)
+            self._orders[key] = values.sort_values(ascending=ascending, kind='stable', na_position='last').index.to_numpy()
+        return self._orders[key]
+
+    def rank(self, column, ascending=True):
+        """Rang de chaque ligne dans l'ordre de tri"""
+        key = (column, ascending)
+        if key not in self._ranks:
+            order = self.order(column, ascending)
+            rank = np.empty(len(order), dtype=np.intp)
+            rank[order] = np.arange(len(order))
+            self._ranks[key] = rank
+        return self._ranks[key]
+
+
+@dataclass(frozen=True)
+class Page:
+    """Une page de résultats et le nombre total de lignes correspondantes"""
+    rows: pd.DataFrame
+    total: int
+    page: int
+    page_size: int
+
+    @property
+    def pages(self):
+        return max(1, -(-self.total // self.page_size))
+
+    @property
+    def first(self):
+        """Rang (à partir de 1) de la première ligne de la page"""
+        return (self.page - 1) * self.page_size + 1 if self.total else 0
+
+    @property
+    def last(self):
+        return min(self.page * self.page_size, self.total)
+
+
+def paginate(df, sort_index, positions=None, sort_by=None, ascending=True, page=1, page_size=50):
+    """Extraire une page triée des lignes retenues, sans matérialiser le résultat complet"""
+    total = len(df) if positions is None else len(positions)
+    page = min(max(1, page), max(1, -(-total // page_size)))
+    start = (page - 1) * page_size
+    if sort_by is None:
+        window = np.arange(start, min(start + page_size, total)) if positions is None else positions[start:start + page_size]
+    elif positions is None:
+        window = sort_index.order(sort_by, ascending)[start:start + page_size]
+    else:
+        ranks = sort_index.rank(sort_by, ascending)[positions]
+        end = min(start + page_size, total)
+        if end <= start:
+            window = positions[:0]
+        else:
+            # Sélection partielle : seuls les rangs de la page sont triés
+            candidates = np.argpartition(ranks, end - 1)[:end] if end < total else np.arange(total)
+            candidates = candidates[np.argsort(ranks[candidates], kind='stable')]
+            window = positions[candidates[start:end]]
+    return Page(df.take(window), total, page, page_size)
@@ -0,0 +1,298 @@
+"""Journal append-only par table, rejoué au chargement et compacté en arrière-plan"""
+import fcntl
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from .schema import TABLES, align_categories, coerce
+from .storage import Storage, file_token
+
+
+def _json_default(value):
+    """Sérialiser les scalaires pandas/numpy dans le journal"""
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat(sep=' ')
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+def to_records(df, schema):
+    """Convertir des lignes typées en dictionnaires JSON-sérialisables"""
+    df = coerce(df, schema)
+    return df.astype(object).where(df.notna(), None).to_dict('records')
+
+
+def make_entry(schema, upserts=None, deletes=()):
+    """Construire une entrée de journal à partir des lignes modifiées et des clés supprimées"""
+    entry = {}
+    if upserts is not None and len(upserts):
+        entry['upserts'] = to_records(upserts, schema)
+    if len(deletes):
+        entry['deletes'] = [str(record_id) for record_id in deletes]
+    return entry
+
+
+def merge_entries(entries):
+    """Regrouper plusieurs entrées successives (pour notifier une seule fois les écouteurs)"""
+    if len(entries) == 1:
+        return entries[0]
+    merged = {'upserts': [], 'deletes': []}
+    for entry in entries:
+        merged['upserts'] += entry.get('upserts', [])
+        merged['deletes'] += entry.get('deletes', [])
+    return {kind: items for kind, items in merged.items() if items}
+
+
+def replay(df, entries, schema, index=None):
+    """Appliquer une suite d'entrées de journal (upserts/suppressions) à une table
+
+    index : KeyIndex de df ; sans suppression, les lignes modifiées sont retrouvées par clé
+    au lieu de parcourir toute la colonne.
+    """
+    if not entries:
+        return df
+    key = schema.key
+    rows, ops = [], []
+    for entry in entries:
+        for record in entry.get('upserts', []):
+            ops.append((record[key], len(rows)))
+            rows.append(record)
+        for record_id in entry.get('deletes', []):
+            ops.append((record_id, -1))
+
+    # Dernière opération par clé : -1 = suppression, sinon position dans rows
+    last_op = pd.Series(dict(ops), dtype='int64')
+    survivors = last_op[last_op >= 0]
+    deleted = last_op[last_op < 0].index
+    if len(deleted):
+        df = df[~df[key].isin(deleted)]
+        index = None
+    if survivors.empty:
+        return df.reset_index(drop=True)
+    upserted = coerce(pd.DataFrame([rows[i] for i in survivors.to_numpy()]), schema, list(df.columns))
+    upserted.index = upserted[key]
+
+    # Les lignes existantes sont mises à jour sur place, les nouvelles ajoutées en fin
+    df = df.reset_index(drop=True)
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col], upserted[col] = align_categories(df[col], upserted[col])
+    if index is not None:
+        # Mise à jour en place par position : O(lignes modifiées) par colonne
+        positions = index.positions(upserted.index)
+        found = positions >= 0
+        if found.any():
+            targets = positions[found]
+            for j, col in enumerate(df.columns):
+                df.iloc[targets, j] = upserted[col].to_numpy()[found]
+        added = upserted[~found]
+    else:
+        existing = df[key].isin(upserted.index)
+        if existing.any():
+            targets = df.loc[existing, key]
+            for col in df.columns:
+                df.loc[existing, col] = upserted[col].reindex(targets).to_numpy()
+        added = upserted[~upserted.index.isin(df[key])]
+    return pd.concat([df, added.reset_index(drop=True)], ignore_index=True)
+
+
+class FileLock:
+    """Verrou d'écriture réentrant : threads du processus (RLock) puis autres processus (flock)"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._file = None
+
+    def __enter__(self):
+        self._lock.acquire()
+        if self._depth == 0:
+            try:
+                self._file = open(self.path, 'a')
+                fcntl.flock(self._file, fcntl.LOCK_EX)
+            except BaseException:
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                self._lock.release()
+                raise
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        self._depth -= 1
+        if self._depth == 0:
+            # Fermer le descripteur libère le verrou flock
+            self._file.close()
+            self._file = None
+        self._lock.release()
+
+
+class JournaledStorage(Storage):
+    """Écritures incrémentales : seules les lignes modifiées sont ajoutées au journal"""
+
+    def __init__(self, base, root, compact_bytes=4 * 1024 * 1024):
+        self.base = base
+        self.root = root
+        self.compact_bytes = compact_bytes
+        os.makedirs(root, exist_ok=True)
+        self._locks = {table: FileLock(os.path.join(root, f"{table}.lock")) for table in TABLES}
+        self._compacting = set()
+
+    def journal_path(self, table):
+        return os.path.join(self.root, f"{table}.journal.jsonl")
+
+    def compacting_path(self, table):
+        return os.path.join(self.root, f"{table}.journal.compacting.jsonl")
+
+    def exists(self, table):
+        return self.base.exists(table)
+
+    def locked(self, table):
+        """Verrou exclusif d'écriture de la table, partagé avec les autres processus"""
+        return self._locks[table]
+
+    def version(self, table):
+        return self.base.version(table) + file_token(self.compacting_path(table), self.journal_path(table))
+
+    def _read_entries(self, path):
+        entries = []
+        if not os.path.exists(path):
+            return entries
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                # Une ligne sans saut final = écriture interrompue, ignorée
+                if not line.endswith('\n'):
+                    break
+                entries.append(json.loads(line))
+        return entries
+
+    def entries_since(self, table, token):
+        """Entrées ajoutées au journal depuis le jeton donné, ou None si un rechargement complet s'impose
+
+        Le rattrapage n'est possible que si seule la fin du journal a changé (ni compaction,
+        ni réécriture de la base, ni troncature) et que l'ancienne taille tombe en fin de ligne.
+        """
+        current = self.version(table)
+        if token is None or current[:-1] != token[:-1]:
+            return None
+        old, new = token[-1], current[-1]
+        if old == new:
+            return []
+        offset = old[0] if old else 0
+        if new is None or new[0] < offset:
+            return None
+        with open(self.journal_path(table), 'rb') as f:
+            if offset:
+                f.seek(offset - 1)
+                if f.read(1) != b'\n':
+                    return None
+            # Lire jusqu'à la taille du jeton courant, pas au-delà
+            lines = f.read(new[0] - offset).split(b'\n')
+        if lines[-1]:
+            # Dernière ligne incomplète : le jeton courant ne correspond pas à une fin de ligne
+            return None
+        return [json.loads(line) for line in lines[:-1]]
+
+    def pending_entries(self, table):
+        """Entrées non encore compactées dans la base"""
+        return self._read_entries(self.compacting_path(table)) + self._read_entries(self.journal_path(table))
+
+    def load(self, table, columns=None):
+        schema = TABLES[table]
+        entries = self.pending_entries(table)
+        if columns and entries and schema.key not in columns:
+            df = self.base.load(table, [schema.key] + list(columns))
+            return replay(df, entries, schema)[list(columns)]
+        return replay(self.base.load(table, columns), entries, schema)
+
+    def save(self, table, df):
+        """Réécriture complète : remplace la base et vide le journal"""
+        with self._locks[table]:
+            self.base.save(table, df)
+            for path in (self.compacting_path(table), self.journal_path(table)):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def _repair(self, path):
+        """Tronquer une éventuelle dernière ligne incomplète avant d'ajouter"""
+        if not os.path.exists(path):
+            return
+        with open(path, 'rb+') as f:
+            size = f.seek(0, os.SEEK_END)
+            if size == 0:
+                return
+            f.seek(size - 1)
+            if f.read(1) == b'\n':
+                return
+            # Remonter par blocs jusqu'au dernier saut de ligne
+            end = size
+            while end > 0:
+                start = max(0, end - 65536)
+                f.seek(start)
+                chunk = f.read(end - start)
+                pos = chunk.rfind(b'\n')
+                if pos >= 0:
+                    end = start + pos + 1
+                    break
+                end = start
+            f.truncate(end)
+            os.fsync(f.fileno())
+
+    def commit(self, table, upserts=None, deletes=()):
+        """Ajouter atomiquement les lignes modifiées au journal de la table (fsync)"""
+        entry = make_entry(TABLES[table], upserts, deletes)
+        if not entry:
+            return entry
+        line = json.dumps(entry, ensure_ascii=False, default=_json_default) + '\n'
+        path = self.journal_path(table)
+        with self._locks[table]:
+            self._repair(path)
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+        self.maybe_compact(table)
+        return entry
+
+    def compact(self, table):
+        """Fusionner le journal dans la base puis le supprimer (un seul processus à la fois)"""
+        journal, compacting = self.journal_path(table), self.compacting_path(table)
+        with open(os.path.join(self.root, f"{table}.compact.lock"), 'a') as guard:
+            try:
+                fcntl.flock(guard, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # Compaction déjà en cours dans un autre processus
+                return
+            with self._locks[table]:
+                # Rotation : les nouveaux commits partent dans un journal vide
+                if os.path.exists(journal) and not os.path.exists(compacting):
+                    os.replace(journal, compacting)
+            entries = self._read_entries(compacting)
+            if not entries:
+                return
+            # Le rejeu est idempotent : un lecteur concurrent voit base + journal cohérents
+            self.base.save(table, replay(self.base.load(table), entries, TABLES[table]))
+            os.remove(compacting)
+
+    def maybe_compact(self, table):
+        """Lancer une compaction en arrière-plan si le journal dépasse le seuil"""
+        path = self.journal_path(table)
+        if table in self._compacting or not os.path.exists(path):
+            return
+        if os.path.getsize(path) < self.compact_bytes:
+            return
+        self._compacting.add(table)
+
+        def run():
+            try:
+                self.compact(table)
+            finally:
+                self._compacting.discard(table)
+
+        threading.Thread(target=run, name=f"gudson-compact-{table}", daemon=True).start()
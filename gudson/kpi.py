@@ -0,0 +1,86 @@
+"""Dérivation des KPI fournisseurs et acheteurs à partir des commandes"""
+import threading
+
+import pandas as pd
+
+from .rollups import Accumulator, changed_orders
+
+
+def supplier_measures(commandes):
+    """Contributions additives des commandes par fournisseur"""
+    return pd.DataFrame({
+        'ID_Fournisseur': commandes['ID_Fournisseur'],
+        'CA_Total': commandes['Montant_Total'].fillna(0.0),
+        'Nombre_Commandes': 1,
+        'Nb_Conformes': (commandes['Conforme'] == 'Oui').astype('int64'),
+    }).groupby('ID_Fournisseur').sum()
+
+
+def buyer_measures(commandes):
+    """Contributions additives des commandes par acheteur"""
+    return pd.DataFrame({
+        'ID_Acheteur': commandes['ID_Acheteur'],
+        'Valeur_Commandes': commandes['Montant_Total'].fillna(0.0),
+        'Nombre_Commandes': 1,
+    }).groupby('ID_Acheteur').sum()
+
+
+class KpiEngine:
+    """Sommes par fournisseur/acheteur maintenues à chaque commit, jointes à la demande"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._suppliers = None
+        self._buyers = None
+
+    def rebuild(self, commandes):
+        suppliers = Accumulator(supplier_measures(commandes), 'Nombre_Commandes')
+        buyers = Accumulator(buyer_measures(commandes), 'Nombre_Commandes')
+        with self._lock:
+            self._suppliers, self._buyers = suppliers, buyers
+
+    def apply(self, old_rows, new_rows):
+        """Mise à jour delta : retirer les anciennes lignes, ajouter les nouvelles"""
+        with self._lock:
+            self._suppliers.apply(added=supplier_measures(new_rows), removed=supplier_measures(old_rows))
+            self._buyers.apply(added=buyer_measures(new_rows), removed=buyer_measures(old_rows))
+
+    def on_commit(self, table, old, new, entry):
+        """Écouteur SharedData sur la table des commandes"""
+        if table != 'commandes':
+            return
+        if old is None or entry is None:
+            self.rebuild(new)
+        else:
+            self.apply(*changed_orders(old, new, entry))
+
+    def suppliers(self, df_fournisseurs):
+        """Table fournisseurs avec CA, nombre de commandes, prix moyen et conformité réels"""
+        with self._lock:
+            state = self._suppliers.state
+        sums = state.reindex(df_fournisseurs['ID_Fournisseur'])
+        count = sums['Nombre_Commandes'].fillna(0).to_numpy()
+        has_orders = count > 0
+        ca = sums['CA_Total'].fillna(0.0).to_numpy()
+        conformite = (100 * sums['Nb_Conformes'] / sums['Nombre_Commandes']).round(1).to_numpy()
+        return df_fournisseurs.assign(
+            CA_Total=ca.round(2),
+            Nombre_Commandes=count.astype('int64'),
+            Prix_Moyen_Commande=(ca / count.clip(min=1)).round(2),
+            # Sans commande, le taux saisi à la création est conservé
+            Taux_Conformite=df_fournisseurs['Taux_Conformite'].where(~has_orders, conformite),
+        )
+
+    def buyers(self, df_acheteurs):
+        """Table acheteurs avec budget utilisé, valeur et nombre de commandes réels"""
+        with self._lock:
+            state = self._buyers.state
+        sums = state.reindex(df_acheteurs['ID_Acheteur'])
+        valeur = sums['Valeur_Commandes'].fillna(0.0).to_numpy().round(2)
+        taux = (100 * df_acheteurs['Economies_Realisees'] / valeur).round(1)
+        return df_acheteurs.assign(
+            Budget_Utilise=valeur,
+            Valeur_Commandes=valeur,
+            Nombre_Commandes=sums['Nombre_Commandes'].fillna(0).to_numpy().astype('int64'),
+            Taux_Economie=taux.where(valeur > 0, 0.0),
+        )
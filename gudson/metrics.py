@@ -0,0 +1,131 @@
+"""Temps d'exécution par segment (chargements, écritures, pages, graphiques) : tampon circulaire et percentiles
+
+Bibliothèque standard uniquement : importé dès la page de connexion, sans pandas ni numpy.
+"""
+import functools
+import math
+import resource
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Dernières mesures gardées par segment : les percentiles portent sur cette fenêtre
+CAPACITY = 1024
+QUANTILES = (50, 95, 99)
+
+
+def quantile(ordered, q):
+    """Percentile q (rang le plus proche) d'une liste triée non vide"""
+    return ordered[max(math.ceil(q / 100 * len(ordered)) - 1, 0)]
+
+
+class Recorder:
+    """Durées par segment nommé, dans un tampon circulaire de capacity mesures, et jauges"""
+
+    def __init__(self, capacity=CAPACITY):
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._samples = {}
+        # Totaux depuis le démarrage (ou la remise à zéro), au-delà de la fenêtre
+        self._totals = {}
+        self._gauges = {}
+
+    def record(self, name, seconds):
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.capacity)
+                self._totals[name] = [0, 0.0]
+            samples.append(seconds)
+            totals = self._totals[name]
+            totals[0] += 1
+            totals[1] += seconds
+
+    @contextmanager
+    def span(self, name):
+        """Mesurer le bloc ; la durée est enregistrée même si le bloc lève une exception"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def timed(self, name=None):
+        """Décorateur : mesurer chaque appel sous name (par défaut, module.fonction)"""
+        def decorator(fn):
+            label = name or f"{fn.__module__}.{fn.__qualname__}"
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(label):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def gauge(self, name, value, **labels):
+        """Dernière valeur d'une grandeur (mémoire d'une table...)"""
+        with self._lock:
+            self._gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def summary(self):
+        """Une ligne par segment : nombre d'appels, durée totale, dernière, p50/p95/p99 et max (secondes)"""
+        with self._lock:
+            snapshot = {name: (list(samples), tuple(self._totals[name])) for name, samples in self._samples.items()}
+        rows = []
+        for name, (samples, (count, total)) in sorted(snapshot.items()):
+            ordered = sorted(samples)
+            row = {'span': name, 'count': count, 'total': total, 'last': samples[-1]}
+            row.update({f"p{q}": quantile(ordered, q) for q in QUANTILES})
+            row['max'] = ordered[-1]
+            rows.append(row)
+        return rows
+
+    def gauges(self):
+        with self._lock:
+            return [(name, dict(labels), value) for (name, labels), value in sorted(self._gauges.items())]
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._totals.clear()
+            self._gauges.clear()
+
+    def export_text(self, prefix='gudson'):
+        """Format texte Prometheus (résumés par segment et jauges), pour un collecteur de métriques"""
+        lines = [
+            f"# HELP {prefix}_span_seconds Durée des segments instrumentés (fenêtre des {self.capacity} dernières mesures)",
+            f"# TYPE {prefix}_span_seconds summary",
+        ]
+        for row in self.summary():
+            span = _label(row['span'])
+            for q in QUANTILES:
+                lines.append(f'{prefix}_span_seconds{{span="{span}",quantile="{q / 100:g}"}} {row[f"p{q}"]:.6f}')
+            lines.append(f'{prefix}_span_seconds_sum{{span="{span}"}} {row["total"]:.6f}')
+            lines.append(f'{prefix}_span_seconds_count{{span="{span}"}} {row["count"]}')
+        declared = set()
+        for name, labels, value in self.gauges():
+            if name not in declared:
+                lines.append(f"# TYPE {prefix}_{name} gauge")
+                declared.add(name)
+            rendered = ','.join(f'{key}="{_label(str(label))}"' for key, label in labels.items())
+            lines.append(f"{prefix}_{name}{{{rendered}}} {value}" if rendered else f"{prefix}_{name} {value}")
+        return '\n'.join(lines) + '\n'
+
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def peak_rss():
+    """Pic de mémoire résidente du processus, en octets"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kio sous Linux, octets sous macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+# Enregistreur du processus, partagé par toutes les sessions
+recorder = Recorder()
+span = recorder.span
+timed = recorder.timed
@@ -0,0 +1,83 @@
+"""Accès par clé primaire : lecture, modification et suppression d'un enregistrement en O(1)"""
+import pandas as pd
+
+from .journal import to_records
+from .schema import TABLES, coerce
+from .transaction import row_versions
+
+
+class RecordStore:
+    """Enregistrements d'une table adressés par identifiant (jamais par libellé, qui peut être en double)
+
+    Les lignes sont retrouvées par l'index de clé du snapshot ; une modification est un
+    upsert d'une seule ligne, une suppression une entrée de journal (tombstone), sans
+    réécrire la table.
+    """
+
+    def __init__(self, data, table):
+        self.data = data
+        self.table = table
+        self.schema = TABLES[table]
+
+    def _snapshot(self, snapshot):
+        return self.data.refresh() if snapshot is None else snapshot
+
+    def keys(self, snapshot=None):
+        return self._snapshot(snapshot)[self.table][self.schema.key]
+
+    def labels(self, snapshot, column):
+        """Libellé de chaque identifiant (listes de choix : l'identifiant reste la valeur sélectionnée)"""
+        df = self._snapshot(snapshot)[self.table]
+        return dict(zip(df[self.schema.key], df[column].astype(str)))
+
+    def get(self, key, snapshot=None):
+        """Ligne de l'enregistrement, None s'il n'existe pas (ou plus)"""
+        snapshot = self._snapshot(snapshot)
+        position = snapshot.key_index(self.table).position(str(key))
+        if position < 0:
+            return None
+        return snapshot[self.table].iloc[position]
+
+    def version(self, key, snapshot=None):
+        snapshot = self._snapshot(snapshot)
+        return row_versions(snapshot[self.table], self.schema, [key], snapshot.key_index(self.table))[str(key)]
+
+    def _updated(self, key, changes, snapshot):
+        """Ligne complète après application des champs modifiés"""
+        unknown = set(changes) - set(self.schema.names)
+        if unknown or self.schema.key in changes:
+            raise ValueError(f"Champs non modifiables dans {self.table}: {', '.join(sorted(unknown) or [self.schema.key])}")
+        current = self.get(key, snapshot)
+        if current is None:
+            raise KeyError(f"{self.table}: {key} introuvable")
+        record = current.to_dict()
+        record.update(changes)
+        return current, coerce(pd.DataFrame([record], columns=self.schema.names), self.schema)
+
+    def diff(self, key, changes, snapshot=None):
+        """Champs dont la valeur change réellement : {champ: (ancienne, nouvelle)}, valeurs typées"""
+        current, row = self._updated(key, changes, snapshot)
+        before = to_records(current.to_frame().T, self.schema)[0]
+        after = to_records(row, self.schema)[0]
+        return {field: (before[field], after[field]) for field in self.schema.names
+                if _empty(before[field]) != _empty(after[field])}
+
+    def update(self, key, changes, expected=None, snapshot=None):
+        """Modifier des champs d'un enregistrement existant ; renvoie la nouvelle génération
+
+        expected : version lue avant l'édition (contrôle optimiste, ConflictError si périmée).
+        """
+        _, row = self._updated(key, changes, snapshot)
+        return self.data.commit(self.table, upserts=row, expected=self._expected(key, expected))
+
+    def delete(self, key, expected=None):
+        """Supprimer un enregistrement par son identifiant ; renvoie la nouvelle génération"""
+        return self.data.commit(self.table, deletes=[str(key)], expected=self._expected(key, expected))
+
+    def _expected(self, key, expected):
+        return None if expected is None else {str(key): expected}
+
+
+def _empty(value):
+    """Texte vide et valeur absente confondus : '' -> None n'est pas une modification"""
+    return None if value == '' else value
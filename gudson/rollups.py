@@ -0,0 +1,262 @@
+"""Agrégats pré-calculés des commandes, maintenus incrémentalement"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Jour : base des séries temporelles (semaines, trimestres... agrégés depuis le jour) ; mois : tableau de bord
+GRANULARITIES = ('D', 'M')
+DIMENSIONS = (None, 'ID_Fournisseur', 'ID_Acheteur', 'Produit')
+# Au-delà, les lignes touchées sont lues par sélection de positions plutôt que par tranches
+SLICE_ROWS = 64
+
+
+class Accumulator:
+    """Sommes par groupe, mises à jour en ajoutant/retirant les contributions de lignes
+
+    Les sommes sont tenues dans une matrice, une ligne par groupe : une mise à jour ne
+    touche que les lignes des groupes concernés (retrouvées par clé) et ajoute en fin
+    les groupes nouveaux. La table lisible (groupes non vides, triés) est reconstruite
+    à la première lecture qui suit une mise à jour.
+    """
+
+    def __init__(self, contributions, count_column):
+        self.count_column = count_column
+        self._columns = contributions.columns
+        self._dtypes = contributions.dtypes
+        self._index = contributions.index
+        self._values = contributions.to_numpy(dtype='float64', copy=True)
+        # Groupes ajoutés depuis la dernière lecture, à la suite de _index dans la matrice
+        self._added = None
+        self._state = contributions
+
+    @property
+    def state(self):
+        """Sommes des groupes non vides, triées par groupe"""
+        if self._state is None:
+            self._state = self._materialize()
+        return self._state
+
+    def __len__(self):
+        return len(self._index) + (0 if self._added is None else len(self._added))
+
+    def apply(self, added=None, removed=None):
+        """Ajouter added et retirer removed ; une même clé peut revenir (contributions ligne à ligne)"""
+        frames = [(frame, sign) for frame, sign in ((added, 1.0), (removed, -1.0)) if frame is not None and len(frame)]
+        if not frames:
+            return
+        for frame, _ in frames:
+            unknown = frame.columns.difference(self._columns, sort=False)
+            if len(unknown):
+                self._widen(unknown, frame.dtypes[unknown])
+        keys = frames[0][0].index if len(frames) == 1 else frames[0][0].index.append(frames[1][0].index)
+        values = np.vstack([
+            sign * frame.reindex(columns=self._columns, fill_value=0).to_numpy(dtype='float64', na_value=0.0)
+            for frame, sign in frames
+        ])
+        rows = self._rows(keys)
+        new = rows < 0
+        if new.any():
+            fresh = keys[new].unique()
+            rows[new] = self._append(fresh)[fresh.get_indexer(keys[new])]
+        np.add.at(self._values, rows, values)
+        self._state = None
+
+    def select(self, keys):
+        """Sommes des groupes non vides de clé (ou de premier niveau de clé) dans keys, sans reconstruire la table"""
+        keys = pd.Index(list(dict.fromkeys(keys)))
+        if isinstance(self._index, pd.MultiIndex):
+            parts = []
+            for key in keys:
+                try:
+                    found = self._index.get_loc(key)
+                except KeyError:
+                    continue
+                # Index trié : une tranche ; sinon un masque
+                if isinstance(found, slice):
+                    parts.append(np.arange(found.start, found.stop))
+                elif isinstance(found, (int, np.integer)):
+                    parts.append(np.array([found]))
+                else:
+                    parts.append(np.flatnonzero(found))
+            if self._added is not None:
+                parts.append(len(self._index) + np.flatnonzero(self._added.get_level_values(0).isin(keys)))
+            rows = np.concatenate(parts) if parts else np.array([], dtype=np.intp)
+        else:
+            rows = self._rows(keys)
+            rows = rows[rows >= 0]
+        rows = np.sort(rows)
+        rows = rows[self._values[rows, self._columns.get_loc(self.count_column)] != 0]
+        main = rows < len(self._index)
+        index = self._index[rows[main]]
+        if not main.all():
+            index = index.append(self._added[rows[~main] - len(self._index)])
+        return pd.DataFrame(self._values[rows], index=index, columns=self._columns).astype(self._dtypes.to_dict())
+
+    def _rows(self, keys):
+        """Lignes de la matrice des groupes keys (-1 si nouveau)"""
+        rows = self._index.get_indexer(keys)
+        missing = rows < 0
+        if missing.any() and self._added is not None:
+            found = self._added.get_indexer(keys[missing])
+            rows[missing] = np.where(found >= 0, len(self._index) + found, -1)
+        return rows
+
+    def _append(self, keys):
+        start = len(self)
+        if start + len(keys) > len(self._values):
+            # Capacité doublée : ajouts en O(1) amorti
+            grown = np.zeros((max(start + len(keys), 2 * len(self._values), 16), len(self._columns)))
+            grown[:start] = self._values[:start]
+            self._values = grown
+        self._values[start:start + len(keys)] = 0.0
+        self._added = keys if self._added is None else self._added.append(keys)
+        return np.arange(start, start + len(keys))
+
+    def _widen(self, columns, dtypes):
+        """Nouvelles colonnes (statut jamais vu...), à zéro pour les groupes existants"""
+        self._values = np.hstack([self._values, np.zeros((len(self._values), len(columns)))])
+        self._columns = self._columns.append(columns)
+        self._dtypes = pd.concat([self._dtypes, dtypes])
+
+    def _materialize(self):
+        if self._added is not None:
+            self._index = self._index.append(self._added)
+            self._added = None
+            if not self._index.is_monotonic_increasing:
+                # Ordre de la matrice rétabli une fois : les lectures suivantes n'ont rien à trier
+                order = pd.Series(np.arange(len(self._index)), index=self._index).sort_index().to_numpy()
+                self._index = self._index[order]
+                self._values[:len(order)] = self._values[order]
+        values = self._values[:len(self._index)]
+        # Un groupe sans ligne restante disparaît
+        keep = values[:, self._columns.get_loc(self.count_column)] != 0
+        state = pd.DataFrame(values[keep], index=self._index[keep], columns=self._columns)
+        return state.astype(self._dtypes.to_dict())
+
+
+def rows_at(df, positions):
+    """Lignes aux positions données
+
+    Peu de lignes : une tranche par ligne (la sélection par positions d'une colonne texte
+    Arrow parcourt toute la colonne, une tranche non).
+    """
+    if len(positions) > SLICE_ROWS:
+        return df.take(positions)
+    if not len(positions):
+        return df.iloc[:0]
+    return pd.concat([df.iloc[p:p + 1] for p in positions])
+
+
+def changed_orders(old, new, entry):
+    """Anciennes et nouvelles versions des commandes touchées par une entrée de journal
+
+    Avec les positions des lignes touchées fournies par SharedData (index de clé primaire),
+    seules ces lignes sont lues, une fois par commit pour tous les écouteurs ; sinon elles
+    sont cherchées dans toute la colonne.
+    """
+    positions = entry.get('positions')
+    if positions is None:
+        upserted = [record['ID_Commande'] for record in entry.get('upserts', [])]
+        touched = upserted + entry.get('deletes', [])
+        return old[old['ID_Commande'].isin(touched)], new[new['ID_Commande'].isin(upserted)]
+    if 'rows' not in entry:
+        before, after = positions
+        entry['rows'] = rows_at(old, before), rows_at(new, after)
+    return entry['rows']
+
+
+def order_contributions(df, granularity):
+    """Période de chaque commande et ses contributions additives (CA, commande, qualité, statut)"""
+    notes = df['Note_Qualite']
+    measures = pd.DataFrame({
+        'CA_Total': df['Montant_Total'].fillna(0.0),
+        'Nb_Commandes': 1,
+        'Somme_Qualite': notes.fillna(0.0),
+        'Nb_Notes': notes.notna().astype('int64'),
+    }, index=df.index)
+    statuts = pd.get_dummies(df['Statut'], prefix='Statut', dtype='int64')
+    return df['Date_Commande'].dt.to_period(granularity), pd.concat([measures, statuts], axis=1)
+
+
+def order_measures(df, granularity, dimension=None):
+    """Contributions additives d'un ensemble de commandes, par période (et dimension)"""
+    periods, measures = order_contributions(df, granularity)
+    measures.insert(0, 'Periode', periods)
+    keys = ['Periode']
+    if dimension:
+        measures[dimension] = df[dimension]
+        keys.append(dimension)
+    return measures.groupby(keys, dropna=False, observed=True).sum()
+
+
+class OrderRollups:
+    """CA, nombre de commandes, qualité moyenne et statuts par mois/semaine et par dimension"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._accumulators = {}
+
+    def rebuild(self, commandes):
+        accumulators = {
+            (granularity, dimension): Accumulator(order_measures(commandes, granularity, dimension), 'Nb_Commandes')
+            for granularity in GRANULARITIES
+            for dimension in DIMENSIONS
+        }
+        with self._lock:
+            self._accumulators = accumulators
+
+    def apply(self, old_rows, new_rows):
+        """Retirer les anciennes versions des lignes modifiées et ajouter les nouvelles
+
+        Contributions ligne à ligne, calculées une fois par granularité et sans regroupement :
+        l'accumulateur somme lui-même les clés répétées.
+        """
+        rows = pd.concat([old_rows, new_rows], ignore_index=True)
+        sign = np.repeat([-1.0, 1.0], [len(old_rows), len(new_rows)])[:, None]
+        with self._lock:
+            for granularity in GRANULARITIES:
+                periods, measures = order_contributions(rows, granularity)
+                measures = measures * sign
+                for dimension in DIMENSIONS:
+                    keys = pd.Index(periods, name='Periode') if not dimension else pd.MultiIndex.from_arrays(
+                        [periods, rows[dimension]], names=['Periode', dimension])
+                    self._accumulators[(granularity, dimension)].apply(added=measures.set_axis(keys))
+
+    def on_commit(self, table, old, new, entry):
+        """Écouteur SharedData : mise à jour incrémentale à chaque commit de commandes"""
+        if table != 'commandes':
+            return
+        if old is None or entry is None:
+            self.rebuild(new)
+            return
+        self.apply(*changed_orders(old, new, entry))
+
+    def state(self, granularity='D', dimension=None):
+        """Sommes additives par période (triées), telles que maintenues incrémentalement"""
+        with self._lock:
+            return self._accumulators[(granularity, dimension)].state
+
+    def table(self, granularity='M', dimension=None):
+        """Agrégat lisible : CA, nombre, montant moyen, qualité moyenne et comptes par statut"""
+        with self._lock:
+            state = self._accumulators[(granularity, dimension)].state
+        out = state.drop(columns=['Somme_Qualite', 'Nb_Notes'])
+        out.insert(2, 'Montant_Moyen', state['CA_Total'] / state['Nb_Commandes'])
+        out.insert(3, 'Qualite_Moyenne', state['Somme_Qualite'] / state['Nb_Notes'].where(state['Nb_Notes'] > 0))
+        count_columns = [col for col in out.columns if col == 'Nb_Commandes' or col.startswith('Statut_')]
+        out[count_columns] = out[count_columns].astype('int64')
+        return out
+
+    def totals(self):
+        """Totaux toutes périodes confondues"""
+        return self.table('M').drop(columns=['Montant_Moyen', 'Qualite_Moyenne']).sum()
+
+    def status_counts(self):
+        """Nombre de commandes par statut, du plus fréquent au moins fréquent"""
+        totals = self.totals()
+        counts = totals[[col for col in totals.index if col.startswith('Statut_')]]
+        counts.index = [col[len('Statut_'):] for col in counts.index]
+        counts = counts[counts > 0].astype('int64').sort_values(ascending=False)
+        counts.index.name = 'Statut'
+        return counts
@@ -0,0 +1,157 @@
+"""Schémas déclarés des tables GUDSON"""
+from dataclasses import dataclass
+
+import pandas as pd
+import pyarrow as pa
+
+# Types logiques -> types Arrow sur disque
+ARROW_TYPES = {
+    'str': pa.string(),
+    'category': pa.dictionary(pa.int32(), pa.string()),
+    'float': pa.float64(),
+    'int': pa.int64(),
+    'date': pa.timestamp('s'),
+    'datetime': pa.timestamp('s'),
+}
+
+
+@dataclass(frozen=True)
+class TableSchema:
+    """Description d'une table : clé primaire, colonnes typées, fichier CSV d'origine"""
+    name: str
+    key: str
+    columns: tuple
+    csv_file: str
+
+    @property
+    def names(self):
+        return [col for col, _ in self.columns]
+
+    @property
+    def types(self):
+        return dict(self.columns)
+
+    def arrow_schema(self, columns=None):
+        """Schéma Arrow (éventuellement restreint à certaines colonnes)"""
+        types = self.types
+        names = columns or self.names
+        return pa.schema([(col, ARROW_TYPES[types[col]]) for col in names])
+
+
+FOURNISSEURS = TableSchema('fournisseurs', 'ID_Fournisseur', (
+    ('ID_Fournisseur', 'str'),
+    ('Nom_Fournisseur', 'str'),
+    ('Categorie', 'category'),
+    ('Pays', 'category'),
+    ('Date_Creation', 'date'),
+    ('Contact_Email', 'str'),
+    ('Telephone', 'str'),
+    ('Score_Qualite', 'float'),
+    ('Delai_Moyen_Livraison', 'int'),
+    ('Taux_Conformite', 'float'),
+    ('Prix_Moyen_Commande', 'float'),
+    ('Nombre_Commandes', 'int'),
+    ('CA_Total', 'float'),
+    ('Statut', 'category'),
+    ('Note_Performance', 'float'),
+    ('Certification_ISO', 'category'),
+    ('Delai_Paiement', 'int'),
+    ('Responsable_Compte', 'str'),
+), 'fournisseurs_data.csv')
+
+ACHETEURS = TableSchema('acheteurs', 'ID_Acheteur', (
+    ('ID_Acheteur', 'str'),
+    ('Nom_Acheteur', 'str'),
+    ('Email', 'str'),
+    ('Departement', 'category'),
+    ('Date_Embauche', 'date'),
+    ('Specialite', 'category'),
+    ('Budget_Alloue', 'float'),
+    ('Budget_Utilise', 'float'),
+    ('Nombre_Commandes', 'int'),
+    ('Valeur_Commandes', 'float'),
+    ('Economies_Realisees', 'float'),
+    ('Taux_Economie', 'float'),
+    ('Delai_Moyen_Traitement', 'int'),
+    ('Score_Performance', 'float'),
+    ('Objectif_Economies', 'float'),
+    ('Statut', 'category'),
+    ('Certification', 'category'),
+    ('Nombre_Fournisseurs_Geres', 'int'),
+    ('Note_Manager', 'float'),
+), 'acheteurs_data.csv')
+
+COMMANDES = TableSchema('commandes', 'ID_Commande', (
+    ('ID_Commande', 'str'),
+    ('ID_Fournisseur', 'str'),
+    ('ID_Acheteur', 'str'),
+    ('Date_Commande', 'date'),
+    ('Date_Livraison_Prevue', 'date'),
+    ('Date_Livraison_Reelle', 'date'),
+    ('Produit', 'category'),
+    ('Quantite', 'int'),
+    ('Prix_Unitaire', 'float'),
+    ('Montant_Total', 'float'),
+    ('Statut', 'category'),
+    ('Note_Qualite', 'float'),
+    ('Conforme', 'category'),
+    ('Commentaires', 'str'),
+), 'commandes_data.csv')
+
+HISTORIQUE = TableSchema('historique', 'ID_Historique', (
+    ('ID_Historique', 'str'),
+    ('Date_Action', 'datetime'),
+    ('Utilisateur', 'str'),
+    ('Action', 'str'),
+    ('Table_Modifiee', 'str'),
+    ('ID_Enregistrement', 'str'),
+    ('Champ_Modifie', 'str'),
+    ('Ancienne_Valeur', 'str'),
+    ('Nouvelle_Valeur', 'str'),
+    ('Commentaire', 'str'),
+), 'historique_data.csv')
+
+TABLES = {schema.name: schema for schema in (FOURNISSEURS, ACHETEURS, COMMANDES, HISTORIQUE)}
+
+
+def _as_category(series):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series
+    return _as_text(series).astype('category')
+
+
+def _as_text(series):
+    if pd.api.types.is_string_dtype(series):
+        return series
+    return series.astype(object).where(series.isna(), series.astype(str))
+
+
+def align_categories(left, right):
+    """Étendre les catégories de deux colonnes catégorielles à leur union (avant concat/affectation)"""
+    categories = left.cat.categories.union(right.cat.categories)
+    return left.cat.set_categories(categories), right.cat.set_categories(categories)
+
+
+def coerce(df, schema, columns=None):
+    """Aligner un DataFrame sur le schéma déclaré (ordre et types des colonnes)"""
+    types = schema.types
+    names = columns or schema.names
+    out = {}
+    for col in names:
+        if col in df.columns:
+            series = df[col]
+        else:
+            series = pd.Series([None] * len(df), index=df.index, dtype=object)
+        kind = types[col]
+        if kind == 'float':
+            series = pd.to_numeric(series, errors='coerce').astype('float64')
+        elif kind == 'int':
+            series = pd.to_numeric(series, errors='coerce').fillna(0).astype('int64')
+        elif kind in ('date', 'datetime'):
+            series = pd.to_datetime(series, errors='coerce', format='ISO8601').astype('datetime64[s]')
+        elif kind == 'category':
+            series = _as_category(series)
+        else:
+            series = _as_text(series)
+        out[col] = series
+    return pd.DataFrame(out, index=df.index)
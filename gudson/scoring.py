@@ -0,0 +1,389 @@
+"""Score fournisseur pondéré (qualité, conformité, livraison, prix, volume) et classements tenus à jour par groupe"""
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from .rollups import Accumulator, changed_orders
+from .storage import atomic_write
+
+CRITERIA = ('Qualite', 'Conformite', 'Livraison', 'Prix', 'Volume')
+DEFAULT_WEIGHTS = {'Qualite': 0.3, 'Conformite': 0.2, 'Livraison': 0.25, 'Prix': 0.1, 'Volume': 0.15}
+# Groupes classés en plus du classement général (attributs fournisseur)
+GROUPS = ('Categorie', 'Pays')
+ALL = ('Tous', None)
+# Nombre de commandes donnant un score volume de 0,5 (saturation progressive vers 1)
+VOLUME_HALF = 20
+# Dérive relative des prix de référence au-delà de laquelle tous les scores sont recalculés
+PRICE_TOLERANCE = 0.005
+
+
+def normalize_weights(weights):
+    """Poids ramenés à une somme de 1 ; ValueError si critère inconnu, poids négatif ou tous nuls"""
+    unknown = set(weights) - set(CRITERIA)
+    if unknown:
+        raise ValueError(f"Critères inconnus: {', '.join(sorted(unknown))}")
+    values = {criterion: float(weights.get(criterion, 0.0)) for criterion in CRITERIA}
+    if any(value < 0 for value in values.values()) or sum(values.values()) <= 0:
+        raise ValueError("Les poids doivent être positifs et non tous nuls")
+    total = sum(values.values())
+    return {criterion: value / total for criterion, value in values.items()}
+
+
+def scoring_contributions(commandes, sign=None):
+    """Contributions ligne à ligne (une ligne par commande, clés répétées) : par fournisseur,
+    par fournisseur × produit et par produit ; les commandes sans clé sont écartées
+
+    sign : +1 ou -1 par commande (ligne ajoutée ou retirée).
+    """
+    notes = commandes['Note_Qualite']
+    reelle, prevue = commandes['Date_Livraison_Reelle'], commandes['Date_Livraison_Prevue']
+    livree = reelle.notna() & prevue.notna()
+    valeur = (commandes['Quantite'] * commandes['Prix_Unitaire']).fillna(0.0)
+    quantite = commandes['Quantite'].where(valeur > 0, 0).fillna(0)
+    supplier, product = commandes['ID_Fournisseur'], commandes['Produit'].astype(object)
+    suppliers = pd.DataFrame({
+        'Nombre_Commandes': 1,
+        'Somme_Qualite': notes.fillna(0.0),
+        'Nb_Notes': notes.notna().astype('int64'),
+        'Nb_Conformes': (commandes['Conforme'] == 'Oui').astype('int64'),
+        'Nb_Livrees': livree.astype('int64'),
+        'Nb_A_Temps': (livree & (reelle <= prevue)).astype('int64'),
+    }, index=commandes.index)
+    prices = pd.DataFrame({'Nb_Lignes': 1, 'Quantite': quantite, 'Valeur': valeur}, index=commandes.index)
+    if sign is not None:
+        suppliers, prices = suppliers.mul(sign, axis=0), prices.mul(sign, axis=0)
+    suppliers = suppliers[supplier.notna().to_numpy()]
+    suppliers.index = pd.Index(supplier[supplier.notna()].to_numpy(), name='ID_Fournisseur')
+    both = (supplier.notna() & product.notna()).to_numpy()
+    supplier_products = prices[both].set_axis(pd.MultiIndex.from_arrays(
+        [supplier[both].to_numpy(), product[both].to_numpy()], names=['ID_Fournisseur', 'Produit']))
+    known = product.notna().to_numpy()
+    products = prices[known].set_axis(pd.Index(product[known].to_numpy(), name='Produit'))
+    return suppliers, supplier_products, products
+
+
+def scoring_measures(commandes):
+    """Contributions additives : par fournisseur, par fournisseur × produit et par produit"""
+    suppliers, supplier_products, products = scoring_contributions(commandes)
+    return (suppliers.groupby(level=0).sum(), supplier_products.groupby(level=[0, 1]).sum(),
+            products.groupby(level=0).sum())
+
+
+def references(products):
+    """Prix unitaire moyen pondéré de chaque produit, tous fournisseurs confondus"""
+    return (products['Valeur'] / products['Quantite'].where(products['Quantite'] > 0)).dropna()
+
+
+def components(sums, supplier_products, prices, weights):
+    """Critères dans [0, 1] et score global sur 100 des fournisseurs de sums
+
+    Prix : valeur achetée rapportée à sa valeur aux prix de référence (0,5 au prix moyen,
+    1 à moitié prix). Un critère sans donnée (aucune livraison, aucune note) est écarté
+    et les poids restants renormalisés.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        quality = sums['Somme_Qualite'] / sums['Nb_Notes'].where(sums['Nb_Notes'] > 0) / 10
+        conformity = sums['Nb_Conformes'] / sums['Nombre_Commandes']
+        delivery = sums['Nb_A_Temps'] / sums['Nb_Livrees'].where(sums['Nb_Livrees'] > 0)
+        reference = supplier_products['Quantite'] * prices.reindex(supplier_products.index.get_level_values('Produit')).to_numpy()
+        expected = reference.groupby(level='ID_Fournisseur').sum().reindex(sums.index)
+        actual = supplier_products['Valeur'].groupby(level='ID_Fournisseur').sum().reindex(sums.index)
+        index = actual / expected.where(expected > 0)
+    out = pd.DataFrame({
+        'Qualite': quality.clip(0, 1),
+        'Conformite': conformity,
+        'Livraison': delivery,
+        'Prix': (1.5 - index).clip(0, 1),
+        'Volume': sums['Nombre_Commandes'] / (sums['Nombre_Commandes'] + VOLUME_HALF),
+    }, index=sums.index)
+    values = out[list(CRITERIA)].to_numpy()
+    w = np.array([weights[criterion] for criterion in CRITERIA])
+    available = ~np.isnan(values)
+    total = (available * w).sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out['Score'] = np.where(total > 0, 100 * np.nansum(values * w, axis=1) / total, np.nan).round(2)
+    return out
+
+
+class Ranking:
+    """Fournisseurs d'un groupe triés par score décroissant (tableaux triés, mis à jour par dichotomie)
+
+    Un fournisseur dont le score change est déplacé sur place : seuls les rangs entre son
+    ancienne et sa nouvelle position sont décalés. Le haut comme le bas du classement se
+    lisent par tranche.
+    """
+
+    def __init__(self, ids=(), scores=()):
+        ids = np.asarray(ids, dtype=object)
+        keys = -np.asarray(scores, dtype='float64')
+        order = np.argsort(keys, kind='stable')
+        self.ids, self.keys = ids[order], keys[order]
+        self._scores = dict(zip(self.ids, -self.keys))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, supplier):
+        return supplier in self._scores
+
+    def _position(self, supplier):
+        key = -self._scores[supplier]
+        low, high = np.searchsorted(self.keys, key, side='left'), np.searchsorted(self.keys, key, side='right')
+        return low + int(np.flatnonzero(self.ids[low:high] == supplier)[0])
+
+    def _shift(self, supplier, key):
+        """Déplacer un fournisseur classé vers le rang de sa nouvelle clé (-score)"""
+        ids, keys = self.ids, self.keys
+        i = self._position(supplier)
+        if key < keys[i]:
+            j = int(np.searchsorted(keys[:i], key, side='right'))
+            ids[j + 1:i + 1], keys[j + 1:i + 1] = ids[j:i].copy(), keys[j:i].copy()
+        else:
+            j = i + int(np.searchsorted(keys[i + 1:], key, side='right'))
+            ids[i:j], keys[i:j] = ids[i + 1:j + 1].copy(), keys[i + 1:j + 1].copy()
+        ids[j], keys[j] = supplier, key
+        self._scores[supplier] = -key
+
+    def update(self, removed=(), added=None):
+        """Retirer removed, puis (ré)insérer added {fournisseur: score}
+
+        Un fournisseur déjà classé et réinséré est déplacé sur place ; seules les entrées et
+        sorties du groupe changent la taille des tableaux.
+        """
+        added = dict(added or {})
+        moved = [supplier for supplier in added if supplier in self._scores]
+        for supplier in moved:
+            self._shift(supplier, -float(added.pop(supplier)))
+        gone = [supplier for supplier in dict.fromkeys(removed) if supplier in self._scores and supplier not in moved]
+        if gone:
+            positions = [self._position(supplier) for supplier in gone]
+            self.ids, self.keys = np.delete(self.ids, positions), np.delete(self.keys, positions)
+            for supplier in gone:
+                del self._scores[supplier]
+        if added:
+            ids = np.array(list(added), dtype=object)
+            keys = -np.array(list(added.values()), dtype='float64')
+            order = np.argsort(keys, kind='stable')
+            ids, keys = ids[order], keys[order]
+            positions = np.searchsorted(self.keys, keys, side='right')
+            self.ids, self.keys = np.insert(self.ids, positions, ids), np.insert(self.keys, positions, keys)
+            self._scores.update(zip(ids, -keys))
+
+    def head(self, k, allowed=None, bottom=False):
+        """k premiers (ou derniers) identifiants ; allowed : identifiants admis (autres filtres)
+
+        Avec allowed, le classement est parcouru par tranches croissantes jusqu'à k résultats.
+        """
+        ids = self.ids[::-1] if bottom else self.ids
+        if allowed is None:
+            return list(ids[:k])
+        found, start, step = [], 0, max(4 * k, 64)
+        while len(found) < k and start < len(ids):
+            chunk = ids[start:start + step]
+            found.extend(chunk[np.isin(chunk, allowed)])
+            start, step = start + step, step * 2
+        return found[:k]
+
+
+class ScoringEngine:
+    """Scores pondérés des fournisseurs et classements général, par catégorie et par pays
+
+    Chaque commit de commandes ne recalcule que les scores des fournisseurs touchés et les
+    déplace dans leurs classements ; tout est recalculé (un tri par groupe) au chargement,
+    au changement des poids ou quand les prix de référence ont dérivé de plus de
+    PRICE_TOLERANCE. Les poids sont partagés entre sessions (fichier scoring.json, relu par
+    reload dès qu'une autre session l'a modifié).
+    """
+
+    def __init__(self, path=None, weights=None):
+        self.path = path
+        self._stamp = None
+        self.weights = normalize_weights(weights or self._read_weights() or DEFAULT_WEIGHTS)
+        self._lock = threading.Lock()
+        self._sums = self._supplier_products = self._products = None
+        self._prices = pd.Series(dtype='float64')
+        self._scores = None
+        self._attributes = None
+        self._rankings = {}
+
+    def _read_weights(self):
+        self._stamp = _stamp(self.path)
+        if self._stamp is None:
+            return None
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def reload(self):
+        """Relire les poids si scoring.json a changé depuis sa lecture ; True si les scores ont été recalculés"""
+        if self.path is None or _stamp(self.path) == self._stamp:
+            return False
+        weights = normalize_weights(self._read_weights() or DEFAULT_WEIGHTS)
+        with self._lock:
+            if weights == self.weights:
+                return False
+            self.weights = weights
+            self._rescore()
+        return True
+
+    def set_weights(self, weights):
+        """Changer (et enregistrer) les poids : tous les scores et classements sont recalculés"""
+        weights = normalize_weights(weights)
+        if self.path is not None:
+            atomic_write(self.path, lambda p: _dump(p, weights))
+        with self._lock:
+            self._stamp = _stamp(self.path)
+            self.weights = weights
+            self._rescore()
+
+    # Mise à jour
+
+    def on_commit(self, table, old, new, entry):
+        """Écouteur SharedData : commandes (scores) et fournisseurs (appartenance aux groupes)"""
+        if table == 'fournisseurs':
+            with self._lock:
+                self._on_suppliers(new, entry)
+        elif table == 'commandes':
+            with self._lock:
+                if old is None or entry is None:
+                    self._sums, self._supplier_products, self._products = (
+                        Accumulator(frame, count) for frame, count in
+                        zip(scoring_measures(new), ('Nombre_Commandes', 'Nb_Lignes', 'Nb_Lignes')))
+                    self._rescore()
+                else:
+                    self._on_orders(*changed_orders(old, new, entry))
+
+    def _on_orders(self, old_rows, new_rows):
+        # Contributions ligne à ligne, sans regroupement : l'accumulateur somme les clés répétées
+        rows = pd.concat([old_rows, new_rows], ignore_index=True)
+        sign = np.repeat([-1.0, 1.0], [len(old_rows), len(new_rows)])
+        for accumulator, added in zip((self._sums, self._supplier_products, self._products),
+                                      scoring_contributions(rows, sign)):
+            accumulator.apply(added=added)
+        # Seuls les prix des produits touchés ont pu bouger
+        prices = references(self._products.select(rows['Produit'].astype(object).dropna()))
+        previous = self._prices.reindex(prices.index)
+        if previous.isna().any() or ((prices - previous).abs() > PRICE_TOLERANCE * previous).any():
+            self._rescore()
+            return
+        touched = pd.unique(rows['ID_Fournisseur'].dropna())
+        scores = components(self._sums.select(touched), self._supplier_products.select(touched), self._prices, self.weights)
+        self._store(touched, scores)
+        self._move(touched)
+
+    def _store(self, touched, scores):
+        """Scores des fournisseurs touchés modifiés sur place ; nouveaux ajoutés, sans commande retirés"""
+        found = self._scores.index.get_indexer(scores.index) >= 0
+        if found.any():
+            self._scores.loc[scores.index[found]] = scores[found]
+        if not found.all():
+            self._scores = pd.concat([self._scores, scores[~found]])
+        gone = pd.Index(touched).difference(scores.index)
+        gone = gone[self._scores.index.get_indexer(gone) >= 0]
+        if len(gone):
+            self._scores = self._scores.drop(gone)
+
+    def _on_suppliers(self, df, entry):
+        previous = self._attributes
+        self._attributes = df.set_index('ID_Fournisseur')[list(GROUPS)]
+        if previous is None or entry is None:
+            self._rank()
+            return
+        touched = [record['ID_Fournisseur'] for record in entry.get('upserts', [])] + list(entry.get('deletes', []))
+        self._move(touched, previous)
+
+    def _rescore(self):
+        if self._sums is None:
+            return
+        self._prices = references(self._products.state)
+        self._scores = components(self._sums.state, self._supplier_products.state, self._prices, self.weights)
+        self._rank()
+
+    def _ranked(self):
+        """Scores des fournisseurs classables : connus de la table fournisseurs, avec au moins un critère"""
+        scores = self._scores['Score'].dropna()
+        return scores[scores.index.isin(self._attributes.index)]
+
+    def _rank(self):
+        """Reconstruire tous les classements (un tri par groupe)"""
+        if self._scores is None or self._attributes is None:
+            return
+        scores = self._ranked()
+        rankings = {ALL: Ranking(scores.index, scores.to_numpy())}
+        attributes = self._attributes.reindex(scores.index)
+        for column in GROUPS:
+            for value, ids in scores.groupby(attributes[column].to_numpy(), sort=False).groups.items():
+                rankings[(column, value)] = Ranking(ids, scores[ids].to_numpy())
+        self._rankings = rankings
+
+    def _groups(self, attributes, supplier):
+        if supplier not in attributes.index:
+            return []
+        row = attributes.loc[supplier]
+        return [ALL] + [(column, row[column]) for column in GROUPS if pd.notna(row[column])]
+
+    def _move(self, suppliers, previous=None):
+        """Retirer des suppliers de leurs anciens groupes et les insérer dans les nouveaux"""
+        if self._scores is None or self._attributes is None or not self._rankings:
+            self._rank()
+            return
+        previous = self._attributes if previous is None else previous
+        scores = self._scores['Score']
+        removed, added = {}, {}
+        for supplier in dict.fromkeys(suppliers):
+            for group in self._groups(previous, supplier):
+                removed.setdefault(group, []).append(supplier)
+            score = scores.get(supplier, np.nan)
+            if pd.notna(score):
+                for group in self._groups(self._attributes, supplier):
+                    added.setdefault(group, {})[supplier] = float(score)
+        for group in removed.keys() | added.keys():
+            self._rankings.setdefault(group, Ranking()).update(removed.get(group, ()), added.get(group))
+
+    # Lecture
+
+    def scores(self):
+        with self._lock:
+            # Copie légère : les mises à jour sur place suivantes ne modifient pas la table renvoyée
+            return None if self._scores is None else self._scores.copy(deep=False)
+
+    def suppliers(self, df_fournisseurs):
+        """Table fournisseurs avec le score global pondéré"""
+        scores = self.scores()
+        values = np.nan if scores is None else scores['Score'].reindex(df_fournisseurs['ID_Fournisseur']).to_numpy()
+        return df_fournisseurs.assign(Score_Global=values)
+
+    def ranking(self, k=10, group=ALL, allowed=None, bottom=False):
+        """k meilleurs (ou moins bons) fournisseurs d'un groupe, avec score et critères
+
+        group : ALL, ('Categorie', valeur) ou ('Pays', valeur) ; allowed : identifiants admis.
+        """
+        with self._lock:
+            return self._head(k, group, allowed, bottom)
+
+    def ends(self, k=10, group=ALL, allowed=None):
+        """k meilleurs et k moins bons fournisseurs d'un groupe, lus ensemble dans le même classement"""
+        with self._lock:
+            return self._head(k, group, allowed, False), self._head(k, group, allowed, True)
+
+    def _head(self, k, group, allowed, bottom):
+        if self._scores is None:
+            return pd.DataFrame(columns=['ID_Fournisseur', *CRITERIA, 'Score'])
+        ranking = self._rankings.get(group)
+        ids = [] if ranking is None else ranking.head(k, allowed, bottom)
+        return self._scores.loc[ids].rename_axis('ID_Fournisseur').reset_index()
+
+
+def _stamp(path):
+    """Date de modification et taille du fichier (None s'il n'existe pas)"""
+    if path is None or not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _dump(path, content):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(content, f, ensure_ascii=False, indent=2)
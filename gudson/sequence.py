@@ -0,0 +1,89 @@
+"""Séquences d'identifiants persistantes, partagées entre sessions et processus"""
+import fcntl
+import os
+import threading
+
+
+class Sequence:
+    """Compteur persistant (fichier verrouillé par flock) : allocation O(1), réservée par blocs
+
+    Avec block > 1, chaque processus réserve des plages d'avance ; les valeurs non
+    consommées à l'arrêt du processus sont perdues (trous dans la numérotation).
+    """
+
+    def __init__(self, path, block=1):
+        self.path = path
+        self.block = block
+        self._next = 0
+        self._end = 0
+        self._lock = threading.Lock()
+
+    def exists(self):
+        return os.path.exists(self.path) and os.path.getsize(self.path) > 0
+
+    def seed(self, value):
+        """Initialiser le compteur s'il n'existe pas encore (value = dernier identifiant attribué)"""
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path, 'a+') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            if not f.read().strip():
+                f.write(str(value))
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _reserve(self, count):
+        """Avancer le compteur partagé de count valeurs et renvoyer la première"""
+        with open(self.path, 'a+') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            start = int(f.read().strip() or 0)
+            f.seek(0)
+            f.truncate()
+            f.write(str(start + count))
+            f.flush()
+            os.fsync(f.fileno())
+        return start + 1
+
+    def take(self, count=1):
+        """Réserver count valeurs consécutives"""
+        with self._lock:
+            if self._end - self._next >= count:
+                start = self._next
+                self._next += count
+            elif count >= self.block:
+                # Gros lot : réservé tel quel, sans toucher au bloc local
+                start = self._reserve(count)
+            else:
+                self._next = self._reserve(self.block)
+                self._end = self._next + self.block
+                start = self._next
+                self._next += count
+            return range(start, start + count)
+
+    def next(self):
+        return self.take(1)[0]
+
+
+class Sequences:
+    """Une séquence par table, sous un même répertoire"""
+
+    def __init__(self, root, block=1):
+        self.root = root
+        self.block = block
+        self._sequences = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, table):
+        with self._lock:
+            if table not in self._sequences:
+                self._sequences[table] = Sequence(os.path.join(self.root, table), self.block)
+            return self._sequences[table]
+
+    def reset(self):
+        """Oublier les compteurs (données remplacées) : ils seront réinitialisés au prochain usage"""
+        with self._lock:
+            self._sequences.clear()
+        if os.path.isdir(self.root):
+            for name in os.listdir(self.root):
+                os.remove(os.path.join(self.root, name))
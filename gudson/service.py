@@ -0,0 +1,609 @@
+"""API typée des KPI GUDSON, utilisable sans Streamlit (application, CLI, traitements batch)"""
+import os
+from dataclasses import dataclass
+from datetime import datetime
+
+import pandas as pd
+
+from .audit import open_audit_log
+from .buyers import BuyerOrders
+from .cache import DerivedCache, derived_cache
+from .changelog import ChangeLog, FrozenStorage
+from .delivery import PERCENTILES, DeliveryEngine
+from .export import ExportCache, date_positions, export_file_name, export_frame, mime_type
+from .importer import ImportReport, assign_ids, validate
+from .indexes import FilterIndex, SortIndex, paginate
+from .history import HistoryEngine
+from .kpi import KpiEngine
+from .metrics import peak_rss, recorder, span
+from .records import RecordStore
+from .rollups import OrderRollups
+from .schema import TABLES
+from .scoring import ALL, GROUPS, ScoringEngine
+from .sequence import Sequences
+from .snapshot import DATA_TABLES, SharedData
+from .timeseries import GRANULARITIES, time_series
+from .transaction import row_versions
+from .storage import atomic_write, open_storage
+
+SUPPLIER_FILTERS = ('Categorie', 'Pays', 'Statut')
+SUPPLIER_METRICS = ('Score_Qualite', 'Delai_Moyen_Livraison', 'Taux_Conformite', 'Note_Performance')
+# Filtres et colonne de date proposés pour l'export de chaque table
+EXPORT_FILTERS = {
+    'fournisseurs': SUPPLIER_FILTERS,
+    'acheteurs': ('Departement', 'Statut'),
+    'commandes': ('Statut', 'Produit'),
+}
+EXPORT_DATES = {'fournisseurs': 'Date_Creation', 'acheteurs': 'Date_Embauche', 'commandes': 'Date_Commande'}
+ID_PREFIXES = {'fournisseurs': ('F', 3), 'acheteurs': ('A', 3), 'commandes': ('C', 4)}
+
+
+@dataclass(frozen=True)
+class DashboardKpis:
+    """Indicateurs du tableau de bord"""
+    nb_fournisseurs: int
+    nb_acheteurs: int
+    ca_total: float
+    commandes_livrees: int
+    monthly: pd.DataFrame
+    status_counts: pd.Series
+
+
+@dataclass(frozen=True)
+class SupplierKpis:
+    """KPI des fournisseurs retenus par les filtres"""
+    score_qualite_moyen: float
+    delai_moyen: float
+    taux_conformite: float
+    ca_moyen: float
+    top_performance: pd.DataFrame
+    bottom_performance: pd.DataFrame
+    fournisseurs: pd.DataFrame
+
+
+@dataclass(frozen=True)
+class DeliveryKpis:
+    """Performance de livraison réelle des fournisseurs retenus par les filtres"""
+    nb_livraisons: int
+    taux_a_temps: float
+    retard_moyen: float
+    delai_moyen: float
+    percentiles: dict
+    distribution: pd.Series
+    par_categorie: pd.DataFrame
+    par_pays: pd.DataFrame
+    par_mois: pd.DataFrame
+    classement: pd.DataFrame
+
+
+@dataclass(frozen=True)
+class BuyerKpis:
+    """KPI globaux des acheteurs"""
+    budget_total: float
+    economies_totales: float
+    performance_moyenne: float
+    delai_moyen: float
+    acheteurs: pd.DataFrame
+
+
+@dataclass(frozen=True)
+class BuyerDetail:
+    """Fiche détaillée d'un acheteur"""
+    acheteur: pd.Series
+    taux_utilisation: float
+    progression_objectif: float
+
+
+@dataclass(frozen=True)
+class BuyerDrilldown:
+    """Fiche d'un acheteur calculée sur ses commandes réelles"""
+    acheteur: pd.Series
+    activite: object
+    taux_utilisation: float
+    budget_restant: float
+    mois_restants: float
+    progression_objectif: float
+
+
+@dataclass(frozen=True)
+class ImportResult:
+    """Lot importé : rapport de validation, identifiants attribués et génération publiée"""
+    report: ImportReport
+    ids: list
+    snapshot: object
+
+    @property
+    def imported(self):
+        return len(self.ids)
+
+
+@dataclass(frozen=True)
+class AnalyticsKpis:
+    """Analyses croisées et temporelles"""
+    performance_pays: pd.DataFrame
+    correlations: pd.DataFrame
+    monthly: pd.DataFrame
+
+
+def _ratio(numerator, denominator):
+    return float(numerator / denominator * 100) if denominator else 0.0
+
+
+class KpiService:
+    """Point d'entrée unique : snapshot partagé, agrégats incrémentaux, KPI et journal d'audit"""
+
+    def __init__(self, storage, audit=None, changes=None, cache=None, weights=None):
+        self.storage = storage
+        self.audit = audit
+        self.changes = changes
+        # Cache des tables dérivées : global par défaut, propre à un service reconstruit (as_of)
+        self.cache = derived_cache if cache is None else cache
+        self.data = SharedData(storage, changes=changes)
+        # Libérer au plus tôt les résultats dérivés d'une table modifiée
+        self.data.subscribe(lambda table, old, new, entry: self.cache.invalidate(table))
+        self.rollups = OrderRollups()
+        self.data.subscribe(self.rollups.on_commit)
+        self.kpis = KpiEngine()
+        self.data.subscribe(self.kpis.on_commit)
+        self.delivery_engine = DeliveryEngine()
+        self.data.subscribe(self.delivery_engine.on_commit)
+        # Poids fixés : ni lecture ni écriture de scoring.json (poids partagés du fichier sinon)
+        if weights is None:
+            self.scoring = ScoringEngine(os.path.join(storage.root, 'scoring.json'))
+        else:
+            self.scoring = ScoringEngine(weights=weights)
+        self.data.subscribe(self.scoring.on_commit)
+        self.exports = ExportCache()
+        self.ids = Sequences(os.path.join(storage.root, 'sequences'))
+        self._records = {table: RecordStore(self.data, table) for table in ID_PREFIXES}
+        self.history_engine = HistoryEngine(audit) if audit is not None else None
+
+    # Accès aux données
+
+    def snapshot(self):
+        """Dernière génération, après rechargement des tables (et des poids du score) modifiés par un autre processus"""
+        if self.scoring.reload():
+            self.cache.invalidate('commandes')
+        return self.data.refresh()
+
+    def commit(self, table, upserts=None, deletes=(), expected=None):
+        """Persister les lignes modifiées et renvoyer la nouvelle génération
+
+        expected ({clé: version lue}) active le contrôle optimiste : ConflictError si une
+        ligne a été modifiée ou supprimée par une autre session depuis sa lecture.
+        """
+        return self.data.commit(table, upserts=upserts, deletes=deletes, expected=expected)
+
+    def row_version(self, snapshot, table, key):
+        """Version d'une ligne, à conserver jusqu'à l'enregistrement de sa modification"""
+        return row_versions(snapshot[table], TABLES[table], [key], snapshot.key_index(table))[str(key)]
+
+    def records(self, table):
+        """Enregistrements de la table adressés par identifiant (édition et suppression unitaires)"""
+        return self._records[table]
+
+    def log(self, user, action, table, record_id, details='', field='', old_value='', new_value=''):
+        """Enregistrer une action dans le journal d'audit (champ modifié et valeurs facultatifs)"""
+        return self.audit.log(user, action, table, record_id, details, field, old_value, new_value)
+
+    # Reconstruction à une date
+
+    def table_as_of(self, table, when):
+        """Table telle qu'elle était à la date when (ValueError si antérieure au suivi des modifications)"""
+        return self.changes.table_as_of(table, when)
+
+    def as_of(self, when):
+        """Service en lecture seule sur les tables reconstruites à la date when (ex. KPI de fin de trimestre)
+
+        Cache dérivé propre et copie des poids actuels : interroger le passé n'évince pas les
+        agrégats de la session courante et ne touche pas à scoring.json.
+        """
+        tables = {table: self.table_as_of(table, when) for table in DATA_TABLES}
+        return KpiService(FrozenStorage(self.storage.root, tables), cache=DerivedCache(), weights=self.score_weights())
+
+    def history(self):
+        return self.audit.read()
+
+    def history_users(self):
+        return self.history_engine.options('Utilisateur')
+
+    def history_tables(self):
+        return self.history_engine.options('Table_Modifiee')
+
+    def history_page(self, utilisateur=None, table=None, record_id=None, start=None, end=None, limit=50, cursor=None):
+        """Une page de l'historique, des actions les plus récentes aux plus anciennes (pagination par curseur)"""
+        return self.history_engine.query(utilisateur, table, record_id, start, end, limit, cursor)
+
+    def latest_actions(self, n=20, **filters):
+        return self.history_engine.latest(n, **filters)
+
+    def record_history(self, table, record_id):
+        """Actions enregistrées sur un enregistrement, sans lire les mois où il n'apparaît pas"""
+        return self.history_engine.record(table, record_id)
+
+    def next_id(self, table, snapshot=None):
+        """Prochain identifiant d'une table (ex. F016), sans parcourir la colonne"""
+        return self.next_ids(table, 1, snapshot)[0]
+
+    def next_ids(self, table, count, snapshot=None):
+        """Bloc d'identifiants consécutifs réservé atomiquement dans la séquence de la table"""
+        prefix, width = ID_PREFIXES[table]
+        sequence = self.ids[table]
+        if not sequence.exists():
+            # Premier usage : la séquence part du plus grand identifiant existant (seul parcours de la colonne)
+            snapshot = snapshot or self.data.current()
+            numbers = snapshot[table][TABLES[table].key].str.extract(r'(\d+)', expand=False).dropna().astype(int)
+            sequence.seed(int(numbers.max()) if len(numbers) else 0)
+        return [f"{prefix}{str(number).zfill(width)}" for number in sequence.take(count)]
+
+    def bulk_import(self, table, raw, user, source='', snapshot=None, skip_invalid=False, dry_run=False):
+        """Valider un lot complet puis l'insérer en un seul commit, avec une seule entrée d'audit
+
+        Par défaut le lot est refusé s'il contient une erreur ; skip_invalid n'insère que les lignes valides.
+        """
+        snapshot = snapshot or self.snapshot()
+        report = validate(table, raw, snapshot)
+        rows = report.rows
+        if not report.valid:
+            if not skip_invalid or (report.errors['Ligne'] == 1).any():
+                return ImportResult(report, [], snapshot)
+            rows = rows.drop(index=report.errors['Ligne'].unique() - 2)
+        if dry_run or rows.empty:
+            return ImportResult(report, [], snapshot)
+        ids = self.next_ids(table, len(rows), snapshot)
+        snapshot = self.commit(table, upserts=assign_ids(rows, TABLES[table], ids))
+        details = f"{len(ids)} lignes importées" + (f" depuis {source}" if source else "")
+        record = ids[0] if len(ids) == 1 else f"{ids[0]}..{ids[-1]}"
+        self.log(user, f"Import {table}", table.capitalize(), record, details)
+        return ImportResult(report, ids, snapshot)
+
+    # Tables dérivées, mises en cache par version des tables sources
+
+    def _cached(self, name, snapshot, tables, compute, *args):
+        key = (name, id(self), args, tuple(snapshot.versions[table] for table in tables))
+
+        def measured():
+            # Seuls les calculs sont mesurés, pas les lectures du cache
+            with span(f"derived.{name}"):
+                return compute()
+
+        return self.cache.get_or_compute(key, tables, measured)
+
+    def supplier_table(self, snapshot):
+        """Fournisseurs avec CA, nombre de commandes, prix moyen, conformité, livraisons et score calculés"""
+        return self._cached('suppliers', snapshot, ('fournisseurs', 'commandes'),
+                            lambda: self.scoring.suppliers(
+                                self.delivery_engine.suppliers(self.kpis.suppliers(snapshot['fournisseurs']))))
+
+    def buyer_table(self, snapshot):
+        """Acheteurs avec budget utilisé, valeur et nombre de commandes calculés"""
+        return self._cached('buyers', snapshot, ('acheteurs', 'commandes'),
+                            lambda: self.kpis.buyers(snapshot['acheteurs']))
+
+    def filter_index(self, snapshot, table, columns):
+        """Index de filtrage d'une table, partagé jusqu'à sa prochaine version"""
+        return self._cached('filter_index', snapshot, (table,),
+                            lambda: FilterIndex(snapshot[table], columns), table, columns)
+
+    def lookup(self, snapshot, table, column, value, df=None):
+        """Lignes dont column vaut value, via l'index de la colonne (df : table dérivée alignée)"""
+        positions = self.filter_index(snapshot, table, (column,)).positions(**{column: value})
+        return (snapshot[table] if df is None else df).take(positions)
+
+    def sort_index(self, snapshot, name, tables, df):
+        """Index de tri d'une table dérivée, partagé jusqu'à la prochaine version de ses sources"""
+        return self._cached(f"{name}_sort", snapshot, tables, lambda: SortIndex(df, df.columns))
+
+    def export_source(self, snapshot, table):
+        """Table exportée : avec les KPI calculés pour les fournisseurs et les acheteurs"""
+        if table == 'fournisseurs':
+            return self.supplier_table(snapshot), ('fournisseurs', 'commandes')
+        if table == 'acheteurs':
+            return self.buyer_table(snapshot), ('acheteurs', 'commandes')
+        return snapshot[table], (table,)
+
+    def export_filter_options(self, snapshot, table):
+        index = self.filter_index(snapshot, table, EXPORT_FILTERS[table])
+        return {column: index.options(column) for column in EXPORT_FILTERS[table]}
+
+    def export_name(self, table):
+        return f"{table}_{datetime.now().strftime('%Y%m%d')}"
+
+    def export_file_name(self, table, fmt, compression=None):
+        return export_file_name(self.export_name(table), fmt, compression)
+
+    def export_mime(self, fmt, compression=None):
+        return mime_type(fmt, compression)
+
+    def export(self, snapshot=None, table='commandes', fmt='csv', compression=None, filters=None, start=None, end=None):
+        """Exporter une table filtrée ; un même export d'une même version n'est produit qu'une fois"""
+        snapshot = snapshot or self.snapshot()
+        df, sources = self.export_source(snapshot, table)
+        filters = {col: value for col, value in (filters or {}).items() if value is not None}
+        key = (table, fmt, compression, tuple(sorted(filters.items())), start, end,
+               tuple(snapshot.versions[source] for source in sources))
+
+        def create():
+            positions = None
+            if filters:
+                positions = self.filter_index(snapshot, table, EXPORT_FILTERS[table]).positions(**filters)
+            if start is not None or end is not None:
+                positions = date_positions(df[EXPORT_DATES[table]], start, end, positions)
+            return export_frame(df, fmt, compression, positions, self.export_name(table), TABLES[table])
+
+        return self.exports.get_or_create(key, create)
+
+    def aggregate(self, table, by=(), measures=None, where=None, snapshot=None):
+        """Agrégat groupé {nom: (fonction, colonne)} : calculé par SQLite si le moteur le permet
+
+        where : {colonne: valeur, liste de valeurs ou slice(début, fin) inclus}.
+        """
+        if hasattr(self.storage, 'aggregate'):
+            return self.storage.aggregate(table, by, measures, where)
+        schema = TABLES[table]
+        df = (snapshot or self.snapshot())[table]
+        mask = pd.Series(True, index=df.index)
+        for col, value in (where or {}).items():
+            if isinstance(value, slice):
+                bound = pd.Timestamp if schema.types[col] in ('date', 'datetime') else (lambda v: v)
+                if value.start is not None:
+                    mask &= df[col] >= bound(value.start)
+                if value.stop is not None:
+                    mask &= df[col] <= bound(value.stop)
+            elif isinstance(value, (list, tuple, set)):
+                mask &= df[col].isin(list(value))
+            else:
+                mask &= df[col] == value
+        df = df[mask]
+        measures = measures or {'Nombre': ('count', None)}
+        spec = {name: (col or schema.key, 'mean' if fn == 'avg' else fn) for name, (fn, col) in measures.items()}
+        if not by:
+            return pd.DataFrame({name: [df[col].agg(fn)] for name, (col, fn) in spec.items()})
+        return df.groupby(list(by), observed=True).agg(**spec).reset_index()
+
+    def monthly_summary(self):
+        """Synthèse mensuelle : CA, nombre et montant moyen des commandes, qualité moyenne"""
+        monthly = self.rollups.table('M')[['CA_Total', 'Nb_Commandes', 'Montant_Moyen', 'Qualite_Moyenne']]
+        monthly = monthly[monthly.index.notna()].round(2).reset_index()
+        monthly = monthly.rename(columns={'Periode': 'Date_Commande'})
+        monthly['Date_Commande'] = monthly['Date_Commande'].astype(str)
+        return monthly
+
+    def timeseries(self, snapshot=None, granularity='M', dimension=None, window=3, top=None):
+        """Série temporelle des commandes (voir gudson/timeseries.py), mise en cache par version
+
+        top : ne garder que les top valeurs de la dimension par CA total.
+        """
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Granularité inconnue: {granularity}")
+        snapshot = snapshot or self.snapshot()
+        return self._cached('timeseries', snapshot, ('commandes',),
+                            lambda: time_series(self.rollups.state('D', dimension), granularity, dimension, window, top),
+                            granularity, dimension, window, top)
+
+    # Mesures
+
+    def table_memory(self, snapshot=None):
+        """Lignes et mémoire (octets) de chaque table du snapshot, calculées une fois par version"""
+        snapshot = snapshot or self.snapshot()
+        rows = []
+        for table in DATA_TABLES:
+            size = self._cached('memory', snapshot, (table,),
+                                lambda df=snapshot[table]: int(df.memory_usage(deep=True).sum()), table)
+            rows.append({'Table': table, 'Lignes': len(snapshot[table]), 'Memoire_Octets': size})
+            recorder.gauge('table_rows', len(snapshot[table]), table=table)
+            recorder.gauge('table_memory_bytes', size, table=table)
+        recorder.gauge('process_peak_rss_bytes', peak_rss())
+        return pd.DataFrame(rows)
+
+    def metrics_text(self, snapshot=None):
+        """Mesures au format texte Prometheus, avec la mémoire des tables"""
+        self.table_memory(snapshot)
+        return recorder.export_text()
+
+    def write_metrics(self, snapshot=None, path=None):
+        """Écrire les mesures dans un fichier lu par un collecteur (par défaut data/metrics.prom)"""
+        path = path or os.path.join(self.storage.root, 'metrics.prom')
+        text = self.metrics_text(snapshot)
+        atomic_write(path, lambda p: _write_text(p, text))
+        return path
+
+    # KPI par page
+
+    def dashboard(self, snapshot=None):
+        snapshot = snapshot or self.snapshot()
+        totals = self.rollups.totals()
+        return DashboardKpis(
+            nb_fournisseurs=len(snapshot['fournisseurs']),
+            nb_acheteurs=len(snapshot['acheteurs']),
+            ca_total=float(totals.get('CA_Total', 0.0)),
+            commandes_livrees=int(totals.get('Statut_Livrée', 0)),
+            monthly=self.monthly_summary(),
+            status_counts=self.rollups.status_counts(),
+        )
+
+    def suppliers(self, snapshot=None, categorie=None, pays=None, statut=None):
+        snapshot = snapshot or self.snapshot()
+        index = self.filter_index(snapshot, 'fournisseurs', SUPPLIER_FILTERS)
+        df = index.select(self.supplier_table(snapshot), Categorie=categorie, Pays=pays, Statut=statut)
+        # Haut et bas lus dans le même classement maintenu, filtres résolus une seule fois
+        top, bottom = self.scoring.ends(10, *self._ranking_scope(snapshot, categorie, pays, statut))
+        return SupplierKpis(
+            score_qualite_moyen=float(df['Score_Qualite'].mean()),
+            delai_moyen=float(df['Delai_Moyen_Livraison'].mean()),
+            taux_conformite=float(df['Taux_Conformite'].mean()),
+            ca_moyen=float(df['CA_Total'].mean()),
+            top_performance=self._ranking_rows(snapshot, top),
+            bottom_performance=self._ranking_rows(snapshot, bottom),
+            fournisseurs=df,
+        )
+
+    def supplier_ranking(self, snapshot=None, categorie=None, pays=None, statut=None, k=10, bottom=False):
+        """k meilleurs (ou moins bons) fournisseurs par score pondéré, lus dans les classements maintenus
+
+        Le classement de la catégorie (sinon du pays, sinon général) est parcouru dans l'ordre ;
+        les autres filtres ne font qu'écarter des lignes, sans re-tri.
+        """
+        snapshot = snapshot or self.snapshot()
+        ranking = self.scoring.ranking(k, *self._ranking_scope(snapshot, categorie, pays, statut), bottom)
+        return self._ranking_rows(snapshot, ranking)
+
+    def _ranking_scope(self, snapshot, categorie, pays, statut):
+        """Classement à parcourir (catégorie, sinon pays, sinon général) et identifiants admis par les autres filtres"""
+        filters = {'Categorie': categorie, 'Pays': pays, 'Statut': statut}
+        group = next(((column, filters[column]) for column in GROUPS if filters[column] is not None), ALL)
+        others = {column: value for column, value in filters.items() if value is not None and column != group[0]}
+        allowed = None
+        if others:
+            positions = self.filter_index(snapshot, 'fournisseurs', SUPPLIER_FILTERS).positions(**others)
+            allowed = snapshot['fournisseurs']['ID_Fournisseur'].to_numpy()[positions]
+        return group, allowed
+
+    def _ranking_rows(self, snapshot, ranking):
+        """Lignes fournisseurs d'un classement, dans son ordre, avec les critères du score"""
+        positions = snapshot.key_index('fournisseurs').positions(ranking['ID_Fournisseur'])
+        # Un fournisseur supprimé depuis la lecture du snapshot n'y figure plus
+        found = positions >= 0
+        suppliers = self.supplier_table(snapshot).take(positions[found]).reset_index(drop=True)
+        criteria = ranking[found].drop(columns=['ID_Fournisseur', 'Score']).reset_index(drop=True)
+        return pd.concat([suppliers, criteria], axis=1)
+
+    def score_weights(self):
+        return dict(self.scoring.weights)
+
+    def set_score_weights(self, weights):
+        """Changer les poids du score (partagés) : classements recalculés, tables dérivées invalidées"""
+        self.scoring.set_weights(weights)
+        self.cache.invalidate('commandes')
+
+    def deliveries(self, snapshot=None, categorie=None, pays=None, statut=None):
+        """Ponctualité, distribution des retards et délais réels, par catégorie, pays et mois"""
+        snapshot = snapshot or self.snapshot()
+        filters = {'Categorie': categorie, 'Pays': pays, 'Statut': statut}
+
+        def compute():
+            df = self.supplier_table(snapshot)
+            ids = None
+            if any(value is not None for value in filters.values()):
+                df = self.filter_index(snapshot, 'fournisseurs', SUPPLIER_FILTERS).select(df, **filters)
+                ids = df['ID_Fournisseur']
+            engine = self.delivery_engine
+            totals = engine.totals(ids)
+            by_id = df.set_index('ID_Fournisseur')
+            return DeliveryKpis(
+                nb_livraisons=int(totals['Nb_Livrees']),
+                taux_a_temps=float(totals['Taux_A_Temps']),
+                retard_moyen=float(totals['Retard_Moyen']),
+                delai_moyen=float(totals['Delai_Reel_Moyen']),
+                percentiles={q: float(totals[f"Retard_P{q}"]) for q in PERCENTILES},
+                distribution=engine.distribution(ids),
+                par_categorie=engine.by_group(by_id['Categorie'], ids),
+                par_pays=engine.by_group(by_id['Pays'], ids),
+                par_mois=engine.by_month(ids),
+                classement=engine.ranking(df),
+            )
+
+        return self._cached('deliveries', snapshot, ('fournisseurs', 'commandes'), compute, categorie, pays, statut)
+
+    def supplier_filter_options(self, snapshot=None):
+        """Valeurs disponibles pour chaque filtre fournisseur"""
+        snapshot = snapshot or self.snapshot()
+        index = self.filter_index(snapshot, 'fournisseurs', SUPPLIER_FILTERS)
+        return {column: index.options(column) for column in SUPPLIER_FILTERS}
+
+    def supplier_page(self, snapshot=None, categorie=None, pays=None, statut=None,
+                      sort_by=None, ascending=True, page=1, page_size=50):
+        """Une page de fournisseurs filtrés et triés côté serveur"""
+        snapshot = snapshot or self.snapshot()
+        df = self.supplier_table(snapshot)
+        filters = {'Categorie': categorie, 'Pays': pays, 'Statut': statut}
+        positions = None
+        if any(value is not None for value in filters.values()):
+            positions = self.filter_index(snapshot, 'fournisseurs', SUPPLIER_FILTERS).positions(**filters)
+        sort_index = self.sort_index(snapshot, 'suppliers', ('fournisseurs', 'commandes'), df)
+        return paginate(df, sort_index, positions, sort_by, ascending, page, page_size)
+
+    def buyers(self, snapshot=None):
+        snapshot = snapshot or self.snapshot()
+        df = self.buyer_table(snapshot)
+        return BuyerKpis(
+            budget_total=float(df['Budget_Alloue'].sum()),
+            economies_totales=float(df['Economies_Realisees'].sum()),
+            performance_moyenne=float(df['Score_Performance'].mean()),
+            delai_moyen=float(df['Delai_Moyen_Traitement'].mean()),
+            acheteurs=df,
+        )
+
+    def buyer_page(self, snapshot=None, sort_by=None, ascending=True, page=1, page_size=50):
+        """Une page d'acheteurs triés côté serveur"""
+        snapshot = snapshot or self.snapshot()
+        df = self.buyer_table(snapshot)
+        sort_index = self.sort_index(snapshot, 'buyers', ('acheteurs', 'commandes'), df)
+        return paginate(df, sort_index, None, sort_by, ascending, page, page_size)
+
+    def buyer_detail(self, nom_acheteur, snapshot=None):
+        snapshot = snapshot or self.snapshot()
+        acheteur = self.lookup(snapshot, 'acheteurs', 'Nom_Acheteur', nom_acheteur, self.buyer_table(snapshot)).iloc[0]
+        return BuyerDetail(
+            acheteur=acheteur,
+            taux_utilisation=_ratio(acheteur['Budget_Utilise'], acheteur['Budget_Alloue']),
+            progression_objectif=_ratio(acheteur['Economies_Realisees'], acheteur['Objectif_Economies']),
+        )
+
+    def buyer_orders(self, snapshot):
+        """Commandes groupées par acheteur et jointes aux fournisseurs, construites une fois par version"""
+        return self._cached('buyer_orders', snapshot, ('commandes', 'fournisseurs'),
+                            lambda: BuyerOrders(snapshot['commandes'], snapshot['fournisseurs'],
+                                                snapshot.key_index('fournisseurs')))
+
+    def buyer_drilldown(self, id_acheteur, snapshot=None):
+        """Commandes, dépense par fournisseur et produit, consommation du budget et économies d'un acheteur
+
+        Mois restants : budget restant au rythme de dépense des derniers mois (None sans dépense récente).
+        Progression : économies calculées sur les commandes rapportées à Objectif_Economies.
+        """
+        snapshot = snapshot or self.snapshot()
+        acheteur = self.records('acheteurs').get(id_acheteur, snapshot)
+        if acheteur is None:
+            raise KeyError(f"acheteurs: {id_acheteur} introuvable")
+        activite = self.buyer_orders(snapshot).activity(id_acheteur)
+        budget = float(acheteur['Budget_Alloue']) if pd.notna(acheteur['Budget_Alloue']) else 0.0
+        restant = budget - activite.depense
+        return BuyerDrilldown(
+            acheteur=acheteur,
+            activite=activite,
+            taux_utilisation=_ratio(activite.depense, budget),
+            budget_restant=restant,
+            mois_restants=max(restant, 0.0) / activite.rythme_mensuel if activite.rythme_mensuel > 0 else None,
+            progression_objectif=_ratio(activite.economies, acheteur['Objectif_Economies']),
+        )
+
+    def analytics(self, snapshot=None):
+        snapshot = snapshot or self.snapshot()
+        suppliers = self.supplier_table(snapshot)
+        performance_pays = self._cached('performance_pays', snapshot, ('fournisseurs', 'commandes'), lambda: (
+            suppliers.groupby('Pays', observed=True).agg({
+                'Score_Qualite': 'mean',
+                'Delai_Moyen_Livraison': 'mean',
+                'Taux_Conformite': 'mean',
+                'CA_Total': 'sum'
+            }).round(1)
+        ))
+        correlations = self._cached('correlations', snapshot, ('fournisseurs', 'commandes'),
+                                    lambda: suppliers[list(SUPPLIER_METRICS)].corr())
+        return AnalyticsKpis(
+            performance_pays=performance_pays,
+            correlations=correlations,
+            monthly=self.monthly_summary(),
+        )
+
+
+def _write_text(path, text):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+
+def open_service(root='.', backend=None):
+    """Ouvrir le service sur un répertoire de données (CSV d'origine et data/)"""
+    storage = open_storage(root, backend)
+    return KpiService(storage, open_audit_log(root, storage), ChangeLog(os.path.join(storage.root, 'changes')))
@@ -0,0 +1,207 @@
+"""Snapshot des tables partagé par toutes les sessions du processus"""
+import itertools
+import threading
+from dataclasses import dataclass, field
+from types import MappingProxyType
+
+import pandas as pd
+
+from .indexes import KeyIndex
+from .journal import merge_entries, replay
+from .metrics import span
+from .schema import TABLES, coerce
+from .transaction import check_versions, current_records
+
+DATA_TABLES = ('fournisseurs', 'acheteurs', 'commandes')
+
+# Compteur global : une version n'est jamais réutilisée, même si le snapshot est recréé
+_versions = itertools.count(1)
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """État cohérent et en lecture seule des tables à une génération donnée"""
+    generation: int
+    tables: MappingProxyType
+    # Version de chaque table, changée à chaque modification (clé des caches dérivés)
+    versions: MappingProxyType
+    # Index par clé primaire, construits au premier usage
+    key_indexes: dict = field(default_factory=dict, compare=False, repr=False)
+
+    def __getitem__(self, table):
+        return self.tables[table]
+
+    def key_index(self, table):
+        """Index par clé primaire de la table (reporté de génération en génération sauf suppression)"""
+        index = self.key_indexes.get(table)
+        if index is None:
+            index = self.key_indexes[table] = KeyIndex(self.tables[table][TABLES[table].key])
+        return index
+
+
+class SharedData:
+    """Une seule copie des tables en mémoire ; chaque commit publie une nouvelle génération"""
+
+    def __init__(self, storage, tables=DATA_TABLES, changes=None):
+        self.storage = storage
+        # ChangeLog optionnel : deltas champ par champ de chaque commit (reconstruction à une date)
+        self.changes = changes
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._tokens = {table: storage.version(table) for table in tables}
+        loaded = {table: self._load(table) for table in tables}
+        versions = {table: next(_versions) for table in tables}
+        self._snapshot = Snapshot(0, MappingProxyType(loaded), MappingProxyType(versions))
+        if changes is not None:
+            for table in tables:
+                if not changes.has_baseline(table):
+                    with self._lock, storage.locked(table):
+                        self._catch_up(table)
+                        self._baseline(table, [])
+
+    def _load(self, table):
+        schema = TABLES[table]
+        if not self.storage.exists(table):
+            return coerce(pd.DataFrame(columns=schema.names), schema)
+        with span(f"data.load.{table}"):
+            return self.storage.load(table)
+
+    @property
+    def generation(self):
+        return self._snapshot.generation
+
+    def current(self):
+        """Dernière génération publiée (simple lecture de référence)"""
+        return self._snapshot
+
+    def subscribe(self, listener):
+        """Être notifié des tables modifiées : listener(table, ancienne, nouvelle, entrée de journal)
+
+        L'écouteur reçoit d'abord l'état courant de chaque table (ancienne=None), puis
+        chaque modification ; l'entrée vaut None lorsque la table a été rechargée du disque.
+        L'entrée porte aussi 'positions' : positions des lignes touchées dans l'ancienne
+        table (modifiées ou supprimées) et dans la nouvelle (modifiées ou ajoutées).
+        """
+        with self._lock:
+            for table, df in self._snapshot.tables.items():
+                with span(f"listener.{_name(listener)}"):
+                    listener(table, None, df, None)
+            self._listeners.append(listener)
+
+    def _publish(self, changes, entry=None):
+        old = self._snapshot
+        if entry is not None:
+            # Index de l'ancienne version construit avant de le reporter sur la nouvelle
+            for table in changes:
+                old.key_index(table)
+        tables, versions = dict(old.tables), dict(old.versions)
+        key_indexes = {table: index for table, index in old.key_indexes.items() if table not in changes}
+        for table, df in changes.items():
+            tables[table] = df
+            versions[table] = next(_versions)
+            previous = old.key_indexes.get(table)
+            if entry is not None and previous is not None:
+                carried = previous.after(entry, TABLES[table].key, len(df))
+                if carried is not None:
+                    key_indexes[table] = carried
+        self._snapshot = Snapshot(old.generation + 1, MappingProxyType(tables), MappingProxyType(versions), key_indexes)
+        located = {table: _located(old, self._snapshot, table, entry) for table in changes}
+        for listener in self._listeners:
+            for table, df in changes.items():
+                with span(f"listener.{_name(listener)}"):
+                    listener(table, old[table], df, located[table])
+        return self._snapshot
+
+    def _catch_up(self, table):
+        """Intégrer les écritures d'un autre processus : fin du journal si possible, sinon rechargement"""
+        token = self.storage.version(table)
+        if token == self._tokens[table]:
+            return
+        entries = self.storage.entries_since(table, self._tokens[table])
+        self._tokens[table] = token
+        if entries is None:
+            self._publish({table: self._load(table)})
+        elif entries:
+            df = replay(self._snapshot[table], entries, TABLES[table], self._snapshot.key_indexes.get(table))
+            self._publish({table: df}, merge_entries(entries))
+
+    def refresh(self):
+        """Intégrer uniquement les tables modifiées sur disque par un autre processus"""
+        changed = [table for table, token in self._tokens.items() if self.storage.version(table) != token]
+        if not changed:
+            return self._snapshot
+        with self._lock, span('data.refresh'):
+            for table in changed:
+                self._catch_up(table)
+            return self._snapshot
+
+    def commit(self, table, upserts=None, deletes=(), expected=None):
+        """Persister les lignes modifiées puis publier une copie mise à jour de la table
+
+        expected ({clé: version}) : versions des lignes lues avant modification ; si l'une
+        a changé entre-temps, ConflictError est levée et rien n'est écrit.
+        """
+        with self._lock, span(f"data.commit.{table}"):
+            with self.storage.locked(table):
+                # Sous le verrou de fichier : lire les écritures des autres processus, contrôler, ajouter
+                pending = self.storage.entries_since(table, self._tokens[table])
+                if pending is None:
+                    self._tokens[table] = self.storage.version(table)
+                    self._publish({table: self._load(table)})
+                    pending = []
+                if expected:
+                    check_versions(self._snapshot[table], TABLES[table], table, expected, pending,
+                                   self._snapshot.key_index(table))
+                before = self._before(table, upserts, deletes, pending)
+                with span(f"data.save.{table}"):
+                    entry = self.storage.commit(table, upserts=upserts, deletes=deletes)
+                self._tokens[table] = self.storage.version(table)
+                stamp, photo_due = None, False
+                if before is not None and entry:
+                    stamp, photo_due = self.changes.record(table, before, entry)
+            # Rejeu et écouteurs hors du verrou de fichier : les autres processus ne les attendent pas
+            entries = pending + [entry] if entry else pending
+            if not entries:
+                return self._snapshot
+            # Copy-on-write : la table publiée n'est jamais modifiée sur place
+            df = replay(self._snapshot[table], entries, TABLES[table], self._snapshot.key_indexes.get(table))
+            snapshot = self._publish({table: df}, merge_entries(entries))
+            if photo_due:
+                # df est exactement l'état à l'instant stamp : aucun commit n'a pu s'intercaler sous le verrou
+                self.changes.photograph(table, df, stamp)
+            return snapshot
+
+    def _baseline(self, table, pending):
+        """Photo de l'état de départ, avant la première modification suivie (sous le verrou de la table)"""
+        if not self.changes.has_baseline(table):
+            self.changes.photograph(table, replay(self._snapshot[table], pending, TABLES[table]), self.changes.stamp())
+
+    def _before(self, table, upserts, deletes, pending):
+        """Lignes touchées par le commit telles qu'elles sont avant lui (None sans ChangeLog)"""
+        if self.changes is None:
+            return None
+        schema = TABLES[table]
+        self._baseline(table, pending)
+        keys = [] if upserts is None or not len(upserts) else upserts[schema.key].astype(str).tolist()
+        keys += [str(record_id) for record_id in deletes]
+        return current_records(self._snapshot[table], schema, keys, pending, self._snapshot.key_index(table))
+
+
+def _located(old, new, table, entry):
+    """Entrée complétée des positions des lignes touchées, par les index de clé primaire (None si rechargement)"""
+    if entry is None:
+        return None
+    key = TABLES[table].key
+    upserted = list(dict.fromkeys(record[key] for record in entry.get('upserts', [])))
+    touched = list(dict.fromkeys([*upserted, *entry.get('deletes', [])]))
+    before = old.key_index(table).positions(touched)
+    after = new.key_index(table).positions(upserted)
+    return {**entry, 'positions': (before[before >= 0], after[after >= 0])}
+
+
+def _name(listener):
+    """Nom court d'un écouteur pour les mesures : Classe.méthode ou fonction"""
+    owner = getattr(listener, '__self__', None)
+    if owner is not None:
+        return f"{type(owner).__name__}.{listener.__name__}"
+    return getattr(listener, '__qualname__', type(listener).__name__).replace('.<locals>', '')
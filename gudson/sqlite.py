@@ -0,0 +1,268 @@
+"""Stockage SQLite embarqué : tables indexées, commits transactionnels et agrégats calculés en SQL"""
+import contextlib
+import json
+import os
+import queue
+import sqlite3
+import threading
+
+import pandas as pd
+
+from .journal import _json_default, make_entry
+from .schema import TABLES, coerce
+from .storage import Storage
+
+SQL_TYPES = {'str': 'TEXT', 'category': 'TEXT', 'float': 'REAL', 'int': 'INTEGER', 'date': 'TEXT', 'datetime': 'TEXT'}
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Index secondaires : noms (recherches des pages), clés étrangères, dates et statuts
+INDEXES = {
+    'fournisseurs': (('Nom_Fournisseur',), ('Categorie',), ('Pays',), ('Statut',), ('Date_Creation',)),
+    'acheteurs': (('Nom_Acheteur',), ('Departement',), ('Statut',), ('Date_Embauche',)),
+    'commandes': (('ID_Fournisseur', 'Date_Commande'), ('ID_Acheteur', 'Date_Commande'),
+                  ('Date_Commande',), ('Statut',)),
+    'historique': (('Utilisateur', 'Date_Action'), ('Date_Action',), ('Table_Modifiee', 'ID_Enregistrement')),
+}
+AGGREGATES = ('count', 'sum', 'avg', 'min', 'max')
+# Entrées conservées dans le journal des modifications (rattrapage des autres processus)
+CHANGES_KEPT = 10_000
+
+
+class ConnectionPool:
+    """Connexions réutilisables entre threads (reruns Streamlit) : une connexion n'est utilisée que par un thread à la fois"""
+
+    def __init__(self, path, size=8, timeout=30.0):
+        self.path = path
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=FULL')
+        return conn
+
+    @contextlib.contextmanager
+    def connection(self):
+        self._slots.acquire()
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+            try:
+                yield conn
+            finally:
+                self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _rows(df, schema):
+    """Lignes typées -> tuples SQLite (dates en texte ISO triable, NaN -> NULL)"""
+    df = coerce(df, schema)
+    for col, kind in schema.columns:
+        if kind in ('date', 'datetime'):
+            df[col] = df[col].dt.strftime(DATE_FORMAT)
+    return list(df.astype(object).where(df.notna(), None).itertuples(index=False, name=None))
+
+
+class SqliteStorage(Storage):
+    """Une base SQLite (mode WAL) ; chaque commit est une transaction, tracée pour les autres processus"""
+
+    def __init__(self, root='data', pool_size=8):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self.path = os.path.join(root, 'gudson.sqlite')
+        self.pool = ConnectionPool(self.path, pool_size)
+        self._local = threading.local()
+        self._locks = {table: threading.RLock() for table in TABLES}
+        self._created = set()
+        with self._connection() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS _changes (seq INTEGER PRIMARY KEY AUTOINCREMENT, tbl TEXT NOT NULL, entry TEXT)')
+            conn.execute('CREATE INDEX IF NOT EXISTS _changes_tbl ON _changes (tbl, seq)')
+            conn.execute('CREATE TABLE IF NOT EXISTS _pruned (tbl TEXT PRIMARY KEY, upto INTEGER NOT NULL)')
+
+    @contextlib.contextmanager
+    def _connection(self):
+        """Connexion de la transaction en cours dans ce thread, sinon une connexion du pool"""
+        current = getattr(self._local, 'conn', None)
+        if current is not None:
+            yield current
+            return
+        with self.pool.connection() as conn:
+            yield conn
+
+    @contextlib.contextmanager
+    def locked(self, table):
+        """Transaction d'écriture (BEGIN IMMEDIATE) : exclusive entre threads et processus jusqu'à la sortie"""
+        with self._locks[table]:
+            if getattr(self._local, 'conn', None) is not None:
+                yield
+                return
+            with self.pool.connection() as conn:
+                conn.execute('BEGIN IMMEDIATE')
+                self._local.conn = conn
+                try:
+                    yield
+                except BaseException:
+                    conn.execute('ROLLBACK')
+                    raise
+                else:
+                    conn.execute('COMMIT')
+                finally:
+                    self._local.conn = None
+
+    def _create(self, conn, table):
+        if table in self._created:
+            return
+        schema = TABLES[table]
+        columns = ', '.join(
+            f"{_quote(col)} {SQL_TYPES[kind]}" + (' PRIMARY KEY' if col == schema.key else '')
+            for col, kind in schema.columns
+        )
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {_quote(table)} ({columns})")
+        for cols in INDEXES.get(table, ()):
+            name = _quote(f"{table}_{'_'.join(cols)}")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {_quote(table)} ({', '.join(map(_quote, cols))})")
+        self._created.add(table)
+
+    def exists(self, table):
+        with self._connection() as conn:
+            found = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+        return found is not None
+
+    def version(self, table):
+        with self._connection() as conn:
+            seq, = conn.execute('SELECT MAX(seq) FROM _changes WHERE tbl = ?', (table,)).fetchone()
+        return (seq or 0,)
+
+    def entries_since(self, table, token):
+        with self._connection() as conn:
+            pruned = conn.execute('SELECT upto FROM _pruned WHERE tbl = ?', (table,)).fetchone()
+            if token is None or (pruned and token[0] < pruned[0]):
+                return None
+            rows = conn.execute('SELECT entry FROM _changes WHERE tbl = ? AND seq > ? ORDER BY seq',
+                                (table, token[0])).fetchall()
+        # Entrée NULL = table réécrite entièrement
+        if any(entry is None for entry, in rows):
+            return None
+        return [json.loads(entry) for entry, in rows]
+
+    def load(self, table, columns=None):
+        schema = TABLES[table]
+        names = columns or schema.names
+        with self._connection() as conn:
+            df = pd.read_sql_query(f"SELECT {', '.join(map(_quote, names))} FROM {_quote(table)}", conn)
+        return coerce(df, schema, names)
+
+    def save(self, table, df):
+        """Réécriture complète de la table, en une transaction"""
+        schema = TABLES[table]
+        with self.locked(table), self._connection() as conn:
+            self._create(conn, table)
+            conn.execute(f"DELETE FROM {_quote(table)}")
+            self._insert(conn, schema, df)
+            conn.execute('INSERT INTO _changes (tbl, entry) VALUES (?, NULL)', (table,))
+
+    def _insert(self, conn, schema, df):
+        placeholders = ', '.join('?' * len(schema.columns))
+        names = ', '.join(map(_quote, schema.names))
+        conn.executemany(f"INSERT OR REPLACE INTO {_quote(schema.name)} ({names}) VALUES ({placeholders})",
+                         _rows(df, schema))
+
+    def commit(self, table, upserts=None, deletes=()):
+        """Appliquer les lignes modifiées en une transaction et les tracer pour les autres processus"""
+        schema = TABLES[table]
+        entry = make_entry(schema, upserts, deletes)
+        if not entry:
+            return entry
+        with self.locked(table), self._connection() as conn:
+            self._create(conn, table)
+            if upserts is not None and len(upserts):
+                self._insert(conn, schema, upserts)
+            if len(deletes):
+                conn.executemany(f"DELETE FROM {_quote(table)} WHERE {_quote(schema.key)} = ?",
+                                 [(str(record_id),) for record_id in deletes])
+            seq = conn.execute('INSERT INTO _changes (tbl, entry) VALUES (?, ?)',
+                               (table, json.dumps(entry, ensure_ascii=False, default=_json_default))).lastrowid
+            if seq % CHANGES_KEPT == 0:
+                self._prune(conn, table, seq)
+        return entry
+
+    def _prune(self, conn, table, seq):
+        upto = seq - CHANGES_KEPT
+        conn.execute('DELETE FROM _changes WHERE tbl = ? AND seq <= ?', (table, upto))
+        conn.execute('INSERT OR REPLACE INTO _pruned (tbl, upto) VALUES (?, ?)', (table, upto))
+
+    # Requêtes exécutées par SQLite : seules les lignes utiles sont lues
+
+    def _where(self, schema, where):
+        clauses, params = [], []
+        for col, value in (where or {}).items():
+            if col not in schema.types:
+                raise ValueError(f"Colonne inconnue: {col}")
+            kind = schema.types[col]
+            if isinstance(value, (list, tuple, set)):
+                values = list(value)
+                clauses.append(f"{_quote(col)} IN ({', '.join('?' * len(values))})")
+                params += [_sql_value(v, kind) for v in values]
+            elif isinstance(value, slice):
+                # Intervalle de dates ou de valeurs : slice(début, fin) bornes incluses
+                if value.start is not None:
+                    clauses.append(f"{_quote(col)} >= ?")
+                    params.append(_sql_value(value.start, kind))
+                if value.stop is not None:
+                    clauses.append(f"{_quote(col)} <= ?")
+                    params.append(_sql_value(value.stop, kind))
+            else:
+                clauses.append(f"{_quote(col)} = ?")
+                params.append(_sql_value(value, kind))
+        return (' WHERE ' + ' AND '.join(clauses) if clauses else ''), params
+
+    def select(self, table, columns=None, where=None, order_by=None, ascending=True, limit=None, offset=0):
+        """Lignes filtrées (égalité, liste de valeurs ou slice) et triées, via les index"""
+        schema = TABLES[table]
+        names = columns or schema.names
+        clause, params = self._where(schema, where)
+        sql = f"SELECT {', '.join(map(_quote, names))} FROM {_quote(table)}{clause}"
+        if order_by:
+            if order_by not in schema.types:
+                raise ValueError(f"Colonne inconnue: {order_by}")
+            sql += f" ORDER BY {_quote(order_by)} {'ASC' if ascending else 'DESC'}"
+        if limit is not None:
+            sql += ' LIMIT ? OFFSET ?'
+            params += [int(limit), int(offset)]
+        with self._connection() as conn:
+            df = pd.read_sql_query(sql, conn, params=params)
+        return coerce(df, schema, names)
+
+    def aggregate(self, table, by=(), measures=None, where=None):
+        """GROUP BY calculé par SQLite ; measures = {nom: (fonction, colonne)}, fonction parmi AGGREGATES"""
+        schema = TABLES[table]
+        by = list(by)
+        selected = [_quote(col) for col in by]
+        for name, (fn, col) in (measures or {'Nombre': ('count', None)}).items():
+            if fn not in AGGREGATES or (col is not None and col not in schema.types):
+                raise ValueError(f"Agrégat invalide: {fn}({col})")
+            selected.append(f"{fn.upper()}({_quote(col) if col else '*'}) AS {_quote(name)}")
+        for col in by:
+            if col not in schema.types:
+                raise ValueError(f"Colonne inconnue: {col}")
+        clause, params = self._where(schema, where)
+        sql = f"SELECT {', '.join(selected)} FROM {_quote(table)}{clause}"
+        if by:
+            sql += f" GROUP BY {', '.join(map(_quote, by))} ORDER BY {', '.join(map(_quote, by))}"
+        with self._connection() as conn:
+            return pd.read_sql_query(sql, conn, params=params)
+
+
+def _sql_value(value, kind):
+    if kind in ('date', 'datetime'):
+        return pd.Timestamp(value).strftime(DATE_FORMAT)
+    return value
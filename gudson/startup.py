@@ -0,0 +1,58 @@
+"""Mesure du démarrage à froid de l'application (page de connexion) dans un processus neuf"""
+import json
+import os
+import subprocess
+import sys
+
+# Modules lourds qui ne doivent pas être chargés pour afficher la page de connexion
+# (plotly.graph_objects n'y figure pas : Streamlit l'importe lui-même)
+HEAVY_MODULES = ('pandas', 'numpy', 'pyarrow', 'plotly.express', 'gudson.service')
+
+# Exécuté dans un interpréteur neuf lancé avec -X importtime
+_DRIVER = '''
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file(sys.argv[1], default_timeout=120)
+start = time.perf_counter()
+app.run()
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    'seconds': elapsed,
+    'exception': bool(app.exception),
+    'loaded': [m for m in json.loads(sys.argv[2]) if m in sys.modules],
+}))
+'''
+
+
+def parse_importtime(stderr):
+    """Durée cumulée (µs) des imports de premier niveau, à partir de la sortie de -X importtime"""
+    cumulative = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumul, name = line[len('import time:'):].split('|')
+        if not name.startswith('  '):
+            cumulative[name.strip()] = int(cumul)
+    return cumulative
+
+
+def cold_start(app_path, python=None):
+    """Afficher la page de connexion dans un processus neuf : durée, imports et modules lourds chargés"""
+    app_path = os.path.abspath(app_path)
+    driver = [python or sys.executable, '-X', 'importtime', '-c', _DRIVER, app_path, json.dumps(HEAVY_MODULES)]
+    done = subprocess.run(driver, capture_output=True, text=True, cwd=os.path.dirname(app_path), check=True)
+    report = json.loads(done.stdout.strip().splitlines()[-1])
+    imports = parse_importtime(done.stderr)
+    report['import_seconds'] = sum(imports.values()) / 1e6
+    report['slowest_imports'] = sorted(imports.items(), key=lambda item: -item[1])[:10]
+    return report
+
+
+def format_report(report):
+    lines = [
+        f"Page de connexion : {report['seconds'] * 1000:.0f} ms (imports : {report['import_seconds'] * 1000:.0f} ms)",
+        "Modules lourds chargés : " + (', '.join(report['loaded']) or 'aucun'),
+        "Imports les plus coûteux :",
+    ]
+    lines += [f"    {name:<40} {micros / 1000:8.1f} ms" for name, micros in report['slowest_imports']]
+    return '\n'.join(lines)
@@ -0,0 +1,172 @@
+"""Moteur de stockage des tables : CSV historique ou Arrow IPC colonnaire"""
+import contextlib
+import os
+import tempfile
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from .schema import TABLES, coerce
+
+
+def file_token(*paths):
+    """Jeton de version des fichiers (taille et date de modification en ns)"""
+    token = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            token.append((stat.st_size, stat.st_mtime_ns))
+        except FileNotFoundError:
+            token.append(None)
+    return tuple(token)
+
+
+def atomic_write(path, write):
+    """Écrire un fichier via un fichier temporaire puis un renommage atomique"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix=os.path.basename(path))
+    os.close(fd)
+    try:
+        write(tmp_path)
+        with open(tmp_path, 'rb') as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class Storage:
+    """Interface commune des moteurs de stockage"""
+
+    def exists(self, table):
+        raise NotImplementedError
+
+    def version(self, table):
+        """Jeton changeant à chaque écriture de la table (y compris par un autre processus)"""
+        raise NotImplementedError
+
+    def load(self, table, columns=None):
+        """Charger une table typée, éventuellement restreinte à certaines colonnes"""
+        raise NotImplementedError
+
+    def save(self, table, df):
+        """Réécrire entièrement une table"""
+        raise NotImplementedError
+
+    def locked(self, table):
+        """Verrou d'écriture de la table (aucun par défaut)"""
+        return contextlib.nullcontext()
+
+    def entries_since(self, table, token):
+        """Modifications depuis un jeton de version ; None = recharger toute la table"""
+        return None
+
+
+class CsvStorage(Storage):
+    """Stockage CSV d'origine (un fichier par table), typé via le schéma déclaré"""
+
+    def __init__(self, root='.'):
+        self.root = root
+
+    def path(self, table):
+        return os.path.join(self.root, TABLES[table].csv_file)
+
+    def exists(self, table):
+        return os.path.exists(self.path(table))
+
+    def version(self, table):
+        return file_token(self.path(table))
+
+    def load(self, table, columns=None):
+        schema = TABLES[table]
+        types = schema.types
+        names = columns or schema.names
+        df = pd.read_csv(
+            self.path(table),
+            usecols=names,
+            dtype={col: str for col in names if types[col] in ('str', 'category')},
+        )
+        return coerce(df, schema, names)
+
+    def save(self, table, df):
+        schema = TABLES[table]
+        df = coerce(df, schema)
+        atomic_write(self.path(table), lambda p: df.to_csv(p, index=False))
+
+
+class ArrowStorage(Storage):
+    """Stockage colonnaire Arrow IPC non compressé, lu par memory-map"""
+
+    def __init__(self, root='data'):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, table):
+        return os.path.join(self.root, f"{table}.arrow")
+
+    def exists(self, table):
+        return os.path.exists(self.path(table))
+
+    def version(self, table):
+        return file_token(self.path(table))
+
+    def load(self, table, columns=None):
+        arrow_table = feather.read_table(self.path(table), columns=columns, memory_map=True)
+        return arrow_table.to_pandas()
+
+    def save(self, table, df):
+        schema = TABLES[table]
+        df = coerce(df, schema)
+        arrow_table = pa.Table.from_pandas(df, schema=schema.arrow_schema(), preserve_index=False)
+        atomic_write(
+            self.path(table),
+            lambda p: feather.write_feather(arrow_table, p, compression='uncompressed'),
+        )
+
+
+def migrate_csv(csv_root='.', arrow_root='data', overwrite=False, target=None):
+    """Migration unique des fichiers CSV vers le stockage Arrow (ou vers le moteur target)"""
+    source = CsvStorage(csv_root)
+    target = target or ArrowStorage(arrow_root)
+    migrated = []
+    for table in TABLES:
+        if not source.exists(table) or (target.exists(table) and not overwrite):
+            continue
+        target.save(table, source.load(table))
+        migrated.append(table)
+    return migrated
+
+
+def open_storage(root='.', backend=None):
+    """Ouvrir le moteur configuré (GUDSON_STORAGE=arrow|csv|sqlite)
+
+    Arrow et CSV passent par le journal incrémental ; SQLite journalise lui-même ses transactions.
+    """
+    from .journal import JournaledStorage
+
+    backend = backend or os.environ.get('GUDSON_STORAGE', 'arrow')
+    data_root = os.path.join(root, 'data')
+    if backend == 'csv':
+        base = CsvStorage(root)
+    elif backend == 'arrow':
+        migrate_csv(root, data_root)
+        base = ArrowStorage(data_root)
+    elif backend == 'sqlite':
+        from .sqlite import SqliteStorage
+        storage = SqliteStorage(data_root)
+        migrate_csv(root, target=storage)
+        return storage
+    else:
+        raise ValueError(f"Moteur de stockage inconnu: {backend}")
+    return JournaledStorage(base, data_root)
+
+
+if __name__ == '__main__':
+    import sys
+
+    csv_root = sys.argv[1] if len(sys.argv) > 1 else '.'
+    tables = migrate_csv(csv_root, os.path.join(csv_root, 'data'), overwrite=True)
+    print(f"✅ Tables migrées vers Arrow: {', '.join(tables) or 'aucune'}")
@@ -0,0 +1,237 @@
+"""Générateur de données synthétiques reproductibles, au schéma des tables GUDSON"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from .changelog import ChangeLog
+from .journal import JournaledStorage
+from .schema import TABLES, coerce
+from .sequence import Sequences
+from .storage import ArrowStorage, CsvStorage
+
+NOMS_FOURNISSEURS = (
+    "TechSolutions SA", "MegaCorp Industries", "GlobalSupply Ltd",
+    "EuroTech Systems", "AfricaSupply Co", "AsiaManufacturing",
+    "AmericaTrade Inc", "QualityFirst Ltd", "SpeedLogistics",
+    "GreenSupplier Co", "InnovativeTech", "ReliableSource",
+    "PremiumGoods SA", "EfficientSupply", "ModernTech Corp",
+)
+CATEGORIES = ("Électronique", "Mécanique", "Chimique", "Textile", "Alimentaire", "Services")
+PAYS = ("France", "Allemagne", "Italie", "Espagne", "Maroc", "Tunisie", "Chine", "USA")
+PRENOMS = ("Jean", "Marie", "Paul", "Sophie", "Luc", "Claire", "Karim", "Nadia", "Hugo", "Léa")
+NOMS = ("Dupont", "Martin", "Moreau", "Bernard", "Petit", "Durand", "Benali", "Leroy", "Roux", "Fournier")
+DEPARTEMENTS = ("Achats Généraux", "Achats IT", "Achats Production", "Achats Services")
+SPECIALITES = ("Électronique", "Mécanique", "Services", "IT", "Matières Premières")
+PRODUITS = (
+    "Composants Électroniques", "Matières Premières", "Services IT",
+    "Équipements Industriels", "Fournitures Bureau", "Maintenance",
+    "Logiciels", "Matériel Informatique", "Outillage", "Consommables",
+)
+COMMENTAIRES = (
+    "Livraison parfaite", "Petit retard acceptable", "Qualité excellente",
+    "Conforme aux attentes", "À améliorer", "Très satisfait", "",
+)
+ACTIONS = (
+    "Création fournisseur", "Modification fournisseur", "Suppression fournisseur",
+    "Ajout commande", "Modification commande", "Annulation commande",
+    "Création acheteur", "Modification acheteur", "Changement statut",
+)
+UTILISATEURS = ("admin", "acheteur1", "acheteur2", "consultant1")
+CHAMPS = (
+    "Score_Qualite", "Statut", "Prix_Moyen_Commande", "Note_Performance",
+    "Montant_Total", "Date_Livraison", "Commentaires",
+)
+MOTIFS = (
+    "Mise à jour automatique", "Correction manuelle", "Validation données",
+    "Ajustement performance", "Correction erreur", "Mise à jour système",
+)
+
+
+def _ids(prefix, count, width):
+    return prefix + pd.Series(np.arange(1, count + 1)).astype(str).str.zfill(width)
+
+
+def _pick(rng, choices, size, p=None):
+    return np.array(choices, dtype=object)[rng.choice(len(choices), size=size, p=p)]
+
+
+def _days(dates, offsets):
+    return dates + pd.to_timedelta(offsets, unit='D')
+
+
+def sizes(orders):
+    """Tailles des tables pour un volume de commandes donné (mêmes proportions que le jeu d'exemple)"""
+    return {
+        'fournisseurs': max(15, orders // 200),
+        'acheteurs': max(5, orders // 2000),
+        'commandes': orders,
+        'historique': max(50, orders // 4),
+    }
+
+
+def generate_suppliers(rng, count, today):
+    noms = np.array(NOMS_FOURNISSEURS)[np.arange(count) % len(NOMS_FOURNISSEURS)]
+    suffixes = np.where(np.arange(count) < len(NOMS_FOURNISSEURS), '', ' ' + (np.arange(count) // len(NOMS_FOURNISSEURS)).astype(str))
+    noms = pd.Series(noms).str.cat(pd.Series(suffixes))
+    return pd.DataFrame({
+        'ID_Fournisseur': _ids('F', count, 3),
+        'Nom_Fournisseur': noms,
+        'Categorie': _pick(rng, CATEGORIES, count),
+        'Pays': _pick(rng, PAYS, count, p=[0.3, 0.15, 0.1, 0.1, 0.1, 0.05, 0.12, 0.08]),
+        'Date_Creation': _days(today, -rng.integers(30, 365 * 2, count)),
+        'Contact_Email': 'contact@' + noms.str.lower().str.replace(r'[ .]', '', regex=True) + '.com',
+        'Telephone': '+33 ' + pd.Series(rng.integers(100000000, 999999999, count)).astype(str),
+        'Score_Qualite': np.clip(rng.normal(8.6, 0.6, count), 5.0, 10.0).round(1),
+        'Delai_Moyen_Livraison': rng.integers(3, 15, count),
+        'Taux_Conformite': np.clip(rng.normal(92, 4, count), 60, 100).round(1),
+        'Prix_Moyen_Commande': 0.0,
+        'Nombre_Commandes': 0,
+        'CA_Total': 0.0,
+        'Statut': _pick(rng, ("Actif", "En_Evaluation", "Suspendu"), count, p=[0.8, 0.15, 0.05]),
+        'Note_Performance': np.clip(rng.normal(7.8, 0.9, count), 4.0, 10.0).round(1),
+        'Certification_ISO': _pick(rng, ("Oui", "Non"), count, p=[0.7, 0.3]),
+        'Delai_Paiement': rng.choice([30, 45, 60, 90], count),
+        'Responsable_Compte': _pick(rng, ("Jean Dupont", "Marie Martin", "Pierre Consultant"), count),
+    })
+
+
+def generate_buyers(rng, count, today, spend):
+    """Acheteurs dont le budget est proportionnel à la valeur de leurs commandes"""
+    noms = (pd.Series(np.array(PRENOMS)[rng.integers(0, len(PRENOMS), count)]) + ' '
+            + pd.Series(np.array(NOMS)[np.arange(count) % len(NOMS)]))
+    noms = noms.where(np.arange(count) < len(NOMS), noms + ' ' + pd.Series(np.arange(count) // len(NOMS)).astype(str))
+    emails = noms.str.lower().str.replace(' ', '.', n=1).str.replace(' ', '') + '@gudson.com'
+    budget = (np.maximum(spend, 50000) * rng.uniform(0.9, 1.4, count)).round(2)
+    return pd.DataFrame({
+        'ID_Acheteur': _ids('A', count, 3),
+        'Nom_Acheteur': noms,
+        'Email': emails,
+        'Departement': _pick(rng, DEPARTEMENTS, count),
+        'Date_Embauche': _days(today, -rng.integers(365, 365 * 5, count)),
+        'Specialite': _pick(rng, SPECIALITES, count),
+        'Budget_Alloue': budget,
+        'Budget_Utilise': 0.0,
+        'Nombre_Commandes': 0,
+        'Valeur_Commandes': 0.0,
+        'Economies_Realisees': (budget * rng.uniform(0.02, 0.08, count)).round(2),
+        'Taux_Economie': 0.0,
+        'Delai_Moyen_Traitement': rng.integers(2, 8, count),
+        'Score_Performance': rng.uniform(7.0, 9.5, count).round(1),
+        'Objectif_Economies': (budget * rng.uniform(0.05, 0.1, count)).round(2),
+        'Statut': _pick(rng, ("Actif", "En Formation", "Senior"), count, p=[0.6, 0.2, 0.2]),
+        'Certification': _pick(rng, ("CIPS", "CDAF", "Aucune"), count, p=[0.3, 0.3, 0.4]),
+        'Nombre_Fournisseurs_Geres': rng.integers(3, 12, count),
+        'Note_Manager': rng.uniform(7.5, 9.8, count).round(1),
+    })
+
+
+def generate_orders(rng, count, suppliers, buyer_ids, today):
+    # Quelques gros fournisseurs concentrent l'essentiel du volume (loi de Zipf)
+    weights = 1.0 / np.arange(1, len(suppliers) + 1) ** 1.1
+    supplier = rng.permutation(len(suppliers))[rng.choice(len(suppliers), count, p=weights / weights.sum())]
+    # Saisonnalité : creux en août et en fin d'année
+    day = np.arange(365)
+    month = (today - pd.to_timedelta(365 - day, unit='D')).month
+    season = np.where(month == 8, 0.4, np.where(month == 12, 0.7, 1.0))
+    offsets = rng.choice(day, count, p=season / season.sum())
+    dates = _days(today, offsets - 365)
+    quantite = rng.integers(1, 100, count)
+    prix = np.clip(rng.lognormal(5.5, 0.8, count), 10, 5000).round(2)
+    statut_codes = rng.choice(4, count, p=[0.7, 0.15, 0.1, 0.05])
+    livree = (statut_codes != 1) & (rng.random(count) > 0.1)
+    reelle = _days(dates, rng.integers(1, 20, count))
+    return pd.DataFrame({
+        'ID_Commande': _ids('C', count, 4),
+        'ID_Fournisseur': suppliers['ID_Fournisseur'].to_numpy()[supplier],
+        'ID_Acheteur': buyer_ids.to_numpy()[rng.integers(0, len(buyer_ids), count)],
+        'Date_Commande': dates,
+        'Date_Livraison_Prevue': _days(dates, rng.integers(5, 15, count)),
+        'Date_Livraison_Reelle': reelle.where(livree),
+        'Produit': _pick(rng, PRODUITS, count),
+        'Quantite': quantite,
+        'Prix_Unitaire': prix,
+        'Montant_Total': (quantite * prix).round(2),
+        'Statut': np.array(["Livrée", "En_Cours", "Retard", "Annulée"], dtype=object)[statut_codes],
+        'Note_Qualite': np.clip(rng.normal(8.0, 1.0, count), 0.0, 10.0).round(1),
+        'Conforme': _pick(rng, ("Oui", "Non"), count, p=[0.9, 0.1]),
+        'Commentaires': _pick(rng, COMMENTAIRES, count, p=[0.3, 0.2, 0.2, 0.15, 0.05, 0.05, 0.05]),
+    })
+
+
+def generate_history(rng, count, suppliers, orders, now):
+    on_supplier = rng.random(count) > 0.5
+    record = np.where(
+        on_supplier,
+        suppliers['ID_Fournisseur'].to_numpy()[rng.integers(0, len(suppliers), count)],
+        orders['ID_Commande'].to_numpy()[rng.integers(0, len(orders), count)],
+    )
+    dates = now - pd.to_timedelta(rng.integers(60, 180 * 86400, count), unit='s')
+    history = pd.DataFrame({
+        'Date_Action': dates.floor('s'),
+        'Utilisateur': _pick(rng, UTILISATEURS, count),
+        'Action': _pick(rng, ACTIONS, count),
+        'Table_Modifiee': np.where(on_supplier, 'Fournisseurs', 'Commandes'),
+        'ID_Enregistrement': record,
+        'Champ_Modifie': _pick(rng, CHAMPS, count),
+        'Ancienne_Valeur': 'Valeur_' + pd.Series(rng.integers(1, 100, count)).astype(str),
+        'Nouvelle_Valeur': 'Valeur_' + pd.Series(rng.integers(1, 100, count)).astype(str),
+        'Commentaire': _pick(rng, MOTIFS, count),
+    }).sort_values('Date_Action', ignore_index=True)
+    history.insert(0, 'ID_Historique', _ids('H', count, 4))
+    return history
+
+
+def derive_totals(suppliers, buyers, orders):
+    """Renseigner les colonnes agrégées des fournisseurs et acheteurs à partir des commandes"""
+    by_supplier = orders.groupby('ID_Fournisseur', observed=True)['Montant_Total'].agg(['sum', 'count'])
+    by_supplier = by_supplier.reindex(suppliers['ID_Fournisseur'], fill_value=0)
+    suppliers['CA_Total'] = by_supplier['sum'].round(2).to_numpy()
+    suppliers['Nombre_Commandes'] = by_supplier['count'].to_numpy()
+    suppliers['Prix_Moyen_Commande'] = (by_supplier['sum'] / by_supplier['count'].where(by_supplier['count'] > 0)).fillna(0).round(2).to_numpy()
+    by_buyer = orders.groupby('ID_Acheteur', observed=True)['Montant_Total'].agg(['sum', 'count'])
+    by_buyer = by_buyer.reindex(buyers['ID_Acheteur'], fill_value=0)
+    buyers['Valeur_Commandes'] = by_buyer['sum'].round(2).to_numpy()
+    buyers['Budget_Utilise'] = buyers['Valeur_Commandes']
+    buyers['Nombre_Commandes'] = by_buyer['count'].to_numpy()
+    valeur = buyers['Valeur_Commandes'].where(buyers['Valeur_Commandes'] > 0)
+    buyers['Taux_Economie'] = (buyers['Economies_Realisees'] / valeur * 100).fillna(0).round(1)
+
+
+def generate(orders=1000, seed=42, today=None):
+    """Jeu de données complet et typé ; même graine et même volume donnent les mêmes tables"""
+    rng = np.random.default_rng(seed)
+    counts = sizes(orders)
+    now = pd.Timestamp(today or '2025-09-25 18:00:00')
+    today = now.normalize()
+    suppliers = generate_suppliers(rng, counts['fournisseurs'], today)
+    buyer_ids = _ids('A', counts['acheteurs'], 3)
+    commandes = generate_orders(rng, counts['commandes'], suppliers, buyer_ids, today)
+    spend = commandes.groupby('ID_Acheteur')['Montant_Total'].sum().reindex(buyer_ids, fill_value=0.0)
+    buyers = generate_buyers(rng, counts['acheteurs'], today, spend.to_numpy())
+    history = generate_history(rng, counts['historique'], suppliers, commandes, now)
+    derive_totals(suppliers, buyers, commandes)
+    tables = {
+        'fournisseurs': suppliers,
+        'acheteurs': buyers,
+        'commandes': commandes,
+        'historique': history,
+    }
+    return {table: coerce(df, TABLES[table]) for table, df in tables.items()}
+
+
+def write(tables, root, backend='arrow'):
+    """Écrire un jeu généré : CSV d'origine à la racine, tables Arrow ou base SQLite sous data/"""
+    data_root = os.path.join(root, 'data')
+    if backend == 'sqlite':
+        from .sqlite import SqliteStorage
+        storage = SqliteStorage(data_root)
+    else:
+        # Via le journal : la réécriture vide les journaux existants (sinon rejoués sur le nouveau jeu)
+        storage = JournaledStorage(CsvStorage(root) if backend == 'csv' else ArrowStorage(data_root), data_root)
+    for table, df in tables.items():
+        storage.save(table, df)
+    # Les séquences d'identifiants repartiront des nouvelles données
+    Sequences(os.path.join(root, 'data', 'sequences')).reset()
+    # L'historique des valeurs ne s'applique plus aux tables réécrites
+    ChangeLog(os.path.join(root, 'data', 'changes')).reset()
@@ -0,0 +1,91 @@
+"""Séries temporelles des commandes : granularité au choix, fenêtres glissantes et variations"""
+import numpy as np
+import pandas as pd
+
+# Granularités proposées ; toutes sont agrégées depuis le cumul journalier des rollups
+GRANULARITIES = {'D': 'Jour', 'W': 'Semaine', 'M': 'Mois', 'Q': 'Trimestre'}
+ADDITIVE = ('CA_Total', 'Nb_Commandes', 'Somme_Qualite', 'Nb_Notes')
+# Mesures suivies en glissant et en variation
+TRACKED = ('CA_Total', 'Nb_Commandes')
+
+
+def dense(daily, granularity, dimension=None, top=None):
+    """Cumul journalier (index Periode[D] [, dimension]) -> matrices période × valeur de dimension
+
+    Toutes les périodes de la plage sont présentes (fenêtres et décalages comptent en
+    périodes réelles). top : ne garder que les top valeurs de la dimension par CA total.
+    """
+    days = daily.index.get_level_values('Periode')
+    keep = ~days.isna()
+    days = days[keep]
+    ordinals = days.asfreq(granularity).asi8 if granularity != 'D' else days.asi8
+    first = ordinals.min()
+    periods = pd.period_range(pd.Period(ordinal=first, freq=granularity),
+                              pd.Period(ordinal=ordinals.max(), freq=granularity), name='Periode')
+    rows = ordinals - first
+    if dimension:
+        codes, values = pd.factorize(daily.index.get_level_values(dimension)[keep], sort=True, use_na_sentinel=False)
+        values = pd.Index(values, name=dimension)
+    else:
+        codes, values = np.zeros(len(rows), dtype=np.intp), None
+    width = 1 if values is None else len(values)
+    flat = rows * width + codes
+    matrices = {
+        col: np.bincount(flat, weights=daily[col].to_numpy(dtype='float64')[keep], minlength=len(periods) * width)
+        .reshape(len(periods), width)
+        for col in ADDITIVE
+    }
+    if values is not None and top:
+        chosen = np.sort(np.argsort(-matrices['CA_Total'].sum(axis=0), kind='stable')[:top])
+        matrices = {col: matrix[:, chosen] for col, matrix in matrices.items()}
+        values = values[chosen]
+    return periods, values, matrices
+
+
+def time_series(daily, granularity='M', dimension=None, window=3, top=None):
+    """CA, commandes, moyennes, cumul glissant sur window périodes, variations vs période précédente et vs N-1"""
+    if daily.index.get_level_values('Periode').notna().sum() == 0:
+        return pd.DataFrame(columns=['Periode', 'Debut'] + ([dimension] if dimension else []) + list(TRACKED))
+    periods, values, m = dense(daily, granularity, dimension, top)
+    columns = {
+        'CA_Total': m['CA_Total'],
+        'Nb_Commandes': m['Nb_Commandes'],
+        'Montant_Moyen': _ratio(m['CA_Total'], m['Nb_Commandes']),
+        'Qualite_Moyenne': _ratio(m['Somme_Qualite'], m['Nb_Notes']),
+    }
+    # Même période un an plus tôt : décalage de date (exact quelle que soit la granularité)
+    year_ago = (periods.start_time - pd.DateOffset(years=1)).to_period(granularity).asi8 - periods.asi8[0]
+    for col in TRACKED:
+        matrix = m[col]
+        # Somme glissante par différence de cumuls : O(périodes × valeurs) quelle que soit la fenêtre
+        cumulative = np.vstack([np.zeros((1, matrix.shape[1])), np.cumsum(matrix, axis=0)])
+        ends = np.arange(1, len(periods) + 1)
+        columns[f"{col}_Glissant"] = cumulative[ends] - cumulative[np.maximum(ends - window, 0)]
+        previous = np.full(matrix.shape, np.nan)
+        previous[1:] = matrix[:-1]
+        columns[f"Var_{col}_Periode"] = _variation(matrix, previous)
+        reference = np.full(matrix.shape, np.nan)
+        found = year_ago >= 0
+        reference[found] = matrix[year_ago[found]]
+        columns[f"Var_{col}_Annuelle"] = _variation(matrix, reference)
+
+    width = 1 if values is None else len(values)
+    out = pd.DataFrame({'Periode': np.repeat(periods, width)})
+    out.insert(1, 'Debut', out['Periode'].dt.start_time)
+    if values is not None:
+        out[dimension] = np.tile(values.to_numpy(), len(periods))
+    for name, matrix in columns.items():
+        out[name] = matrix.ravel()
+    out['Nb_Commandes'] = out['Nb_Commandes'].round().astype('int64')
+    return out
+
+
+def _ratio(numerator, denominator):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(denominator > 0, numerator / denominator, np.nan)
+
+
+def _variation(current, reference):
+    """Variation en % ; indéfinie sans référence (période absente ou nulle)"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.round(np.where(reference != 0, (current - reference) / reference * 100, np.nan), 2)
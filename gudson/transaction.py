@@ -0,0 +1,62 @@
+"""Écritures concurrentes : versions de lignes et détection optimiste des conflits"""
+import hashlib
+import json
+
+from .journal import _json_default, to_records
+
+
+class ConflictError(Exception):
+    """Lignes modifiées ou supprimées par une autre session depuis leur lecture"""
+
+    def __init__(self, table, keys):
+        self.table = table
+        self.keys = list(keys)
+        super().__init__(f"Conflit sur {table}: {', '.join(self.keys)} modifié(s) entre-temps")
+
+
+def _version(record):
+    payload = json.dumps(record, ensure_ascii=False, sort_keys=True, default=_json_default)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def current_records(df, schema, keys, pending=(), index=None):
+    """Contenu actuel des lignes demandées (None si absente), sérialisé comme to_records
+
+    pending : entrées de journal d'autres processus pas encore appliquées à df.
+    index : KeyIndex de df, pour lire les lignes sans parcourir la colonne clé.
+    """
+    keys = [str(key) for key in keys]
+    if index is not None:
+        positions = index.positions(keys)
+        rows = df.take(positions[positions >= 0])
+    else:
+        rows = df[df[schema.key].isin(keys)]
+    found = {record[schema.key]: record for record in to_records(rows, schema)}
+    current = {key: found.get(key) for key in keys}
+    for entry in pending:
+        for record in entry.get('upserts', []):
+            if record[schema.key] in current:
+                current[record[schema.key]] = record
+        for record_id in entry.get('deletes', []):
+            if record_id in current:
+                current[record_id] = None
+    return current
+
+
+def row_versions(df, schema, keys, index=None):
+    """Version de chaque ligne demandée : empreinte de son contenu typé (None si absente)"""
+    current = current_records(df, schema, keys, index=index)
+    return {key: None if record is None else _version(record) for key, record in current.items()}
+
+
+def check_versions(df, schema, table, expected, pending=(), index=None):
+    """Lever ConflictError si une ligne n'a plus la version lue par l'appelant
+
+    Les lignes des entrées en attente (pending) sont sérialisées comme to_records, d'où
+    la même empreinte.
+    """
+    current = current_records(df, schema, expected, pending, index)
+    stale = [key for key, version in expected.items()
+             if (None if current[str(key)] is None else _version(current[str(key)])) != version]
+    if stale:
+        raise ConflictError(table, stale)